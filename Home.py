@@ -7,6 +7,12 @@ import base64
 # Import os if you uncomment the image code below
 # import os
 
+try:
+    from litkit.payments.stripe_client import StripeConfigurationError, initialize_stripe
+    STRIPE_MODULES_LOADED = True
+except ImportError:
+    STRIPE_MODULES_LOADED = False
+
 
 def get_base64_of_image(image_file):
     """Get the base64 string of an image file."""
@@ -24,6 +30,14 @@ def main():
         layout="centered"
     )
 
+    # Create the shared Stripe client at startup, so invalid Stripe settings
+    # are reported here rather than on the first payment
+    if STRIPE_MODULES_LOADED:
+        try:
+            initialize_stripe()
+        except StripeConfigurationError as e:
+            st.error(str(e))
+
     # Header
     st.markdown(
         """
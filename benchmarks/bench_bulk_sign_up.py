@@ -0,0 +1,127 @@
+"""
+Benchmark: bulk_sign_up versus calling sign_up in a loop.
+
+Runs a local stand-in for the Supabase auth endpoints (a minimal asyncio HTTP
+server in a separate process that waits a fixed latency per request), then
+creates the same number of accounts:
+
+- in a plain loop with the shared client's ``auth.sign_up``, the call that
+  ``litkit.auth.auth.sign_up`` makes, one request at a time
+- with ``bulk_sign_up`` at several concurrency levels
+
+The results pick the LITKIT_BULK_CONCURRENCY default: past the concurrency
+where throughput stops growing, more requests in flight only add load on
+the auth server.
+
+Usage:
+    python benchmarks/bench_bulk_sign_up.py [--users 400] [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 latency: float) -> None:
+    """Answer sign up and admin user creation requests on one keep-alive connection."""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            body = json.loads(await reader.readexactly(length)) if length else {}
+            await asyncio.sleep(latency)
+            now = "2024-01-01T00:00:00Z"
+            payload = json.dumps({
+                "id": str(uuid.uuid4()),
+                "aud": "authenticated",
+                "role": "authenticated",
+                "email": body.get("email"),
+                "app_metadata": {},
+                "user_metadata": body.get("user_metadata") or {},
+                "created_at": now,
+                "updated_at": now,
+            }).encode("utf-8")
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(payload)}\r\n\r\n".encode("ascii")
+                         + payload)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def serve(latency: float, ports: "multiprocessing.Queue") -> None:
+    """Run the stand-in until the process is terminated."""
+    async def run() -> None:
+        server = await asyncio.start_server(
+            lambda reader, writer: handle(reader, writer, latency),
+            "127.0.0.1", 0, backlog=1024)
+        ports.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds the stand-in waits per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 5, 10, 20])
+    args = parser.parse_args()
+
+    # A separate process keeps the server off the client's GIL
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(args.latency, ports), daemon=True)
+    server.start()
+    port = ports.get(timeout=10)
+
+    # Settings are read at import time
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["SUPABASE_KEY"] = "anon-key"
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "service-role-key"
+
+    from litkit.auth.async_auth import bulk_sign_up
+    from litkit.auth.client import get_supabase_client
+
+    rows = [(f"user{i}@example.com", "password123") for i in range(args.users)]
+
+    client = get_supabase_client()
+    start = time.perf_counter()
+    for email, password in rows:
+        client.auth.sign_up({"email": email, "password": password})
+    loop_seconds = time.perf_counter() - start
+
+    print(f"{args.users} users, {args.latency * 1000:.0f} ms per request")
+    print(f"{'method':<28}{'seconds':>10}{'users/s':>12}{'speedup':>10}")
+    print(f"{'sign_up loop':<28}{loop_seconds:>10.2f}"
+          f"{args.users / loop_seconds:>12.1f}{1.0:>10.1f}")
+
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        results = asyncio.run(bulk_sign_up(iter(rows), concurrency=concurrency))
+        seconds = time.perf_counter() - start
+        failures = sum(1 for result in results if not result["success"])
+        label = f"bulk_sign_up (c={concurrency})"
+        print(f"{label:<28}{seconds:>10.2f}{args.users / seconds:>12.1f}"
+              f"{loop_seconds / seconds:>10.1f}"
+              + (f"  ({failures} failed)" if failures else ""))
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark and stress test: atomic credit functions versus read-modify-write.
+
+Many threads add and use credits for a small set of users at once on the
+direct Postgres backend: credits are granted with ``payments_db.add_credits``
+(service role) and used with the ``use_credits`` function as the user, as a
+signed-in session would. The same mix then runs as the read-then-update
+sequence the functions replaced. Afterwards every balance is checked
+against the operations that reported success:
+
+- the atomic functions must never lose an update or overdraw a balance
+- read-modify-write typically does both under contention
+
+See benchmarks/local_postgres.py for how the database is provided.
+
+Usage:
+    python benchmarks/bench_credits.py [--threads 16] [--ops 2000] [--users 4]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_postgres import create_users, database_url, setup_schema  # noqa: E402
+
+INITIAL_BALANCE = 100
+
+
+def run_threads(threads: int, ops: int, worker) -> float:
+    """Split ops across threads, run worker(count, seed) in each; return seconds."""
+    per_thread = [ops // threads + (1 if i < ops % threads else 0)
+                  for i in range(threads)]
+    workers = [threading.Thread(target=worker, args=(count, seed))
+               for seed, count in enumerate(per_thread)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=4)
+    args = parser.parse_args()
+
+    url = database_url()
+    setup_schema(url, ["credits_table.sql", "credits_functions.sql"])
+
+    # Settings are read at import time
+    os.environ["LITKIT_DB_BACKEND"] = "postgres"
+    os.environ["LITKIT_DATABASE_URL"] = url
+    os.environ["LITKIT_PG_POOL_MAX_SIZE"] = str(args.threads)
+
+    from litkit.database import payments_db
+    from litkit.database import repository as repo
+    from litkit.database.postgres import get_postgres_backend
+
+    backend = get_postgres_backend()
+
+    def reset_balances():
+        users = create_users(url, args.users)
+        for user_id in users:
+            payments_db.add_credits(user_id, INITIAL_BALANCE)
+        return users
+
+    def check(label, seconds, users, expected, lock_stats):
+        with backend.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT user_id::text AS user_id, amount FROM public.credits"
+                " WHERE user_id = ANY(%s::uuid[])", (users,)).fetchall()
+        actual = {row["user_id"]: row["amount"] for row in rows}
+        lost = sum(abs(actual[u] - expected[u]) for u in users)
+        negative = sum(1 for u in users if actual[u] < 0)
+        print(f"{label:<24}{seconds:>9.2f}{args.ops / seconds:>10.0f}"
+              f"{lock_stats['rejected']:>10}{lost:>14}{negative:>10}")
+        return lost == 0 and negative == 0
+
+    print(f"{args.ops} operations, {args.threads} threads, {args.users} users")
+    print(f"{'method':<24}{'seconds':>9}{'ops/s':>10}{'rejected':>10}"
+          f"{'credits off':>14}{'negative':>10}")
+
+    # Atomic functions through the repository layer
+    users = reset_balances()
+    expected = {u: INITIAL_BALANCE for u in users}
+    stats = Counter()
+    lock = threading.Lock()
+    user_clients = {
+        u: backend.as_role({"sub": u, "role": "authenticated"}) for u in users}
+
+    def atomic_worker(count, seed):
+        rng = random.Random(seed)
+        for _ in range(count):
+            user_id = rng.choice(users)
+            amount = rng.randint(1, 5)
+            if rng.random() < 0.3:
+                ok = payments_db.add_credits(user_id, amount) >= 0
+                delta = amount
+            else:
+                ok = repo.credits.rpc(
+                    "use_credits", {"p_user_id": user_id, "p_amount": amount},
+                    client=user_clients[user_id]) is not None
+                delta = -amount
+            with lock:
+                if ok:
+                    expected[user_id] += delta
+                else:
+                    stats["rejected"] += 1
+
+    seconds = run_threads(args.threads, args.ops, atomic_worker)
+    atomic_ok = check("atomic functions", seconds, users, expected, stats)
+
+    # The previous read-then-update sequence, two round trips per operation
+    users = reset_balances()
+    expected = {u: INITIAL_BALANCE for u in users}
+    stats = Counter()
+
+    def read_modify_write_worker(count, seed):
+        rng = random.Random(seed)
+        for _ in range(count):
+            user_id = rng.choice(users)
+            amount = rng.randint(1, 5)
+            delta = amount if rng.random() < 0.3 else -amount
+            with backend.pool.connection() as conn:
+                balance = conn.execute(
+                    "SELECT amount FROM public.credits WHERE user_id = %s",
+                    (user_id,)).fetchone()["amount"]
+                ok = balance + delta >= 0
+                if ok:
+                    conn.execute(
+                        "UPDATE public.credits SET amount = %s WHERE user_id = %s",
+                        (balance + delta, user_id))
+            with lock:
+                if ok:
+                    expected[user_id] += delta
+                else:
+                    stats["rejected"] += 1
+
+    seconds = run_threads(args.threads, args.ops, read_modify_write_worker)
+    check("read-modify-write", seconds, users, expected, stats)
+
+    print("atomic functions:", "PASS" if atomic_ok else "FAIL")
+    backend.close()
+    if not atomic_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: SubscriptionRecord versus dict rows for large result sets.
+
+Builds the same subscription rows as PostgREST returns them (dicts with ISO
+timestamp strings) and as ``SubscriptionRecord`` objects, then reports:
+
+- memory held by each representation (tracemalloc)
+- the time to convert the rows into records
+- the time to check every row for an active subscription, re-parsing
+  ``current_period_end`` for dicts and comparing floats for records
+
+Usage:
+    python benchmarks/bench_models.py [--rows 100000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from litkit.database.models import SubscriptionRecord  # noqa: E402
+
+
+def make_rows(count: int) -> list:
+    """Build subscription rows the way they arrive from PostgREST (decoded JSON)."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        created = start + timedelta(minutes=i)
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "user_id": str(uuid.uuid4()),
+            "stripe_customer_id": f"cus_{i:014d}",
+            "stripe_subscription_id": f"sub_{i:014d}",
+            "status": "active" if i % 4 else "canceled",
+            "price_id": "price_1234567890abcdef",
+            "quantity": 1,
+            "cancel_at_period_end": False,
+            "current_period_start": created.isoformat(),
+            "current_period_end": (created + timedelta(days=30 + i % 900)).isoformat(),
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat(),
+        })
+    # Round-trip through JSON so strings are not shared between rows
+    return json.loads(json.dumps(rows))
+
+
+def measure(build):
+    """Return (result, bytes allocated and still held, seconds) for build()."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held, seconds
+
+
+def dict_is_active(row: dict, now: float) -> bool:
+    """The dict-based check: parse the period end on every call."""
+    if row["status"] != "active":
+        return False
+    end = row["current_period_end"]
+    if not end:
+        return True
+    return datetime.fromisoformat(end.replace("Z", "+00:00")).timestamp() > now
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows, dict_bytes, _ = measure(lambda: make_rows(args.rows))
+
+    # Records keep the row strings they point to; count them, not the dicts
+    records, record_bytes, _ = measure(
+        lambda: SubscriptionRecord.from_rows(make_rows(args.rows)))
+
+    start = time.perf_counter()
+    SubscriptionRecord.from_rows(rows)
+    convert_seconds = time.perf_counter() - start
+
+    now = time.time()
+    start = time.perf_counter()
+    dict_active = sum(dict_is_active(row, now) for row in rows)
+    dict_check = time.perf_counter() - start
+
+    start = time.perf_counter()
+    record_active = sum(record.is_active(now) for record in records)
+    record_check = time.perf_counter() - start
+    assert dict_active == record_active
+
+    mib = 1024 * 1024
+    print(f"{args.rows} subscription rows")
+    print(f"{'':<22}{'dict rows':>12}{'records':>12}{'ratio':>8}")
+    print(f"{'memory (MiB)':<22}{dict_bytes / mib:>12.1f}"
+          f"{record_bytes / mib:>12.1f}{dict_bytes / record_bytes:>8.1f}")
+    print(f"{'bytes per row':<22}{dict_bytes / args.rows:>12.0f}"
+          f"{record_bytes / args.rows:>12.0f}")
+    print(f"{'is_active, all (ms)':<22}{dict_check * 1000:>12.1f}"
+          f"{record_check * 1000:>12.1f}{dict_check / record_check:>8.1f}")
+    print(f"conversion from dicts: {convert_seconds * 1000:.0f} ms "
+          f"({convert_seconds / args.rows * 1e6:.2f} us per row)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmark and stress test for the direct Postgres backend.
+
+Checks that user queries run under row level security, then measures what
+running a query as a user costs compared with the service role:
+
+- RLS checks: a user sees only their own credits row, anon sees none, the
+  service role sees all, and a user cannot debit or grant another user's
+  credits
+- stress: many threads interleave queries as different users and as the
+  service role on the same pool; every result must contain exactly the rows
+  that identity may see, so no role or claims leak between pooled
+  connections, including after a user's statement fails
+- latency and throughput of a point select by user_id through the
+  repository layer, as the service role and as the user (one pipelined
+  transaction that sets the role and claims)
+
+See benchmarks/local_postgres.py for how the database is provided.
+
+Usage:
+    python benchmarks/bench_postgres_backend.py [--threads 16] [--ops 4000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_postgres import create_users, database_url, setup_schema  # noqa: E402
+
+
+def claims_for(user_id: str) -> dict:
+    """Claims of a verified Supabase access token for a user."""
+    return {"sub": user_id, "role": "authenticated", "aud": "authenticated",
+            "exp": int(time.time()) + 3600}
+
+
+def check_rls(repo, backend, users) -> bool:
+    """Run the access checks and print one line per check."""
+    alice, bob = users[0], users[1]
+    as_alice = backend.as_role(claims_for(alice))
+    as_anon = backend.as_role({"role": "anon"})
+
+    def rows(client):
+        return sorted(row["user_id"] for row in
+                      repo.credits.select(("user_id",)).execute(client))
+
+    def fails(call):
+        try:
+            call()
+        except Exception:
+            return True
+        return False
+
+    checks = [
+        ("user sees only their own row", rows(as_alice) == [alice]),
+        ("anon sees no rows", rows(as_anon) == []),
+        ("service role sees every row", rows(backend) == sorted(users)),
+        ("user cannot debit another user",
+         fails(lambda: repo.credits.rpc(
+             "use_credits", {"p_user_id": bob, "p_amount": 1}, client=as_alice))),
+        ("user can debit their own credits",
+         repo.credits.rpc(
+             "use_credits", {"p_user_id": alice, "p_amount": 1},
+             client=as_alice) is not None),
+        ("user cannot grant credits",
+         fails(lambda: repo.credits.rpc(
+             "add_credits", {"p_user_id": alice, "p_amount": 1000},
+             client=as_alice))),
+        ("API roles only",
+         fails(lambda: backend.as_role({"role": "service_role"}).execute(
+             repo.credits.select(("user_id",))))),
+    ]
+    for label, ok in checks:
+        print(f"  {'ok' if ok else 'FAIL':<6}{label}")
+    return all(ok for _, ok in checks)
+
+
+def stress(repo, backend, users, threads: int, ops: int) -> int:
+    """Interleave identities on the shared pool; return the number of wrong results."""
+    clients = [(backend.as_role(claims_for(u)), [u]) for u in users]
+    clients.append((backend, sorted(users)))
+    clients.append((backend.as_role({"role": "anon"}), []))
+    errors = []
+
+    def worker(count, seed):
+        rng = random.Random(seed)
+        for _ in range(count):
+            if rng.random() < 0.1:
+                # Debiting another user fails and aborts the transaction
+                try:
+                    repo.credits.rpc(
+                        "use_credits", {"p_user_id": users[1], "p_amount": 1},
+                        client=clients[0][0])
+                    errors.append(("rejected debit", "succeeded"))
+                except Exception:
+                    pass
+                continue
+            client, expected = rng.choice(clients)
+            seen = sorted(row["user_id"] for row in
+                          repo.credits.select(("user_id",)).execute(client))
+            if seen != expected:
+                errors.append((expected, seen))
+
+    workers = [threading.Thread(target=worker, args=(ops // threads, seed))
+               for seed in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return len(errors)
+
+
+def measure(repo, client, user_id: str, threads: int, ops: int):
+    """Return (p50 ms, p99 ms, ops/s) of point selects by user_id."""
+    latencies = []
+    for _ in range(500):
+        start = time.perf_counter()
+        repo.credits.select("balance").eq("user_id", user_id).execute(client)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    def worker(count):
+        for _ in range(count):
+            repo.credits.select("balance").eq("user_id", user_id).execute(client)
+
+    workers = [threading.Thread(target=worker, args=(ops // threads,))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    return (statistics.median(latencies),
+            latencies[int(len(latencies) * 0.99)],
+            (ops // threads * threads) / seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=4000)
+    parser.add_argument("--users", type=int, default=8)
+    args = parser.parse_args()
+
+    url = database_url()
+    setup_schema(url, ["credits_table.sql", "credits_functions.sql"])
+    users = create_users(url, args.users)
+
+    # Settings are read at import time
+    os.environ["LITKIT_DB_BACKEND"] = "postgres"
+    os.environ["LITKIT_DATABASE_URL"] = url
+    os.environ["LITKIT_PG_POOL_MAX_SIZE"] = str(args.threads)
+
+    from litkit.database import repository as repo
+    from litkit.database.postgres import get_postgres_backend
+
+    backend = get_postgres_backend()
+    for user_id in users:
+        repo.credits.rpc("add_credits", {"p_user_id": user_id, "p_amount": 100},
+                         client=backend)
+
+    print("RLS checks")
+    rls_ok = check_rls(repo, backend, users)
+
+    wrong = stress(repo, backend, users, args.threads, args.ops)
+    print(f"stress: {args.ops} queries on {args.threads} threads, "
+          f"{wrong} with rows of another identity")
+
+    print(f"\npoint select by user_id, {args.threads} threads for throughput")
+    print(f"{'run as':<16}{'p50 ms':>9}{'p99 ms':>9}{'ops/s':>10}")
+    for label, client in (
+        ("service role", backend),
+        ("user (RLS)", backend.as_role(claims_for(users[0]))),
+    ):
+        p50, p99, throughput = measure(repo, client, users[0], args.threads, args.ops)
+        print(f"{label:<16}{p50:>9.3f}{p99:>9.3f}{throughput:>10.0f}")
+
+    backend.close()
+    ok = rls_ok and wrong == 0
+    print("\nRLS and isolation:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
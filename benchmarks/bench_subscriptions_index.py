@@ -0,0 +1,180 @@
+"""
+Benchmark: the (user_id, created_at DESC) index for the latest subscription.
+
+Seeds public.subscriptions with users that have one to a few subscriptions
+and a few long-lived users with many renewals, then runs the query
+``payments_db`` sends for a user's latest subscription
+
+    SELECT * FROM public.subscriptions
+    WHERE user_id = $1 ORDER BY created_at DESC LIMIT 1
+
+under three index layouts:
+
+- user_id: the original subscriptions_table.sql, which fetches and sorts
+  every row of the user
+- both: the composite index added next to idx_subscriptions_user_id
+- composite: sql/stripe/subscriptions_latest_index.sql applied, i.e. the
+  single-column index dropped
+
+For each layout it prints the plan for the user with the most rows, the
+query latency for typical and heavy users, the cost of inserting rows and
+the index sizes, so the effect of dropping idx_subscriptions_user_id on
+writes and on user_id-only lookups (such as the ON DELETE CASCADE from
+auth.users) shows next to the read path.
+
+See benchmarks/local_postgres.py for how the database is provided.
+
+Usage:
+    python benchmarks/bench_subscriptions_index.py [--users 20000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import psycopg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_postgres import SQL_DIR, create_users, database_url, setup_schema  # noqa: E402
+
+LATEST_QUERY = (
+    "SELECT * FROM public.subscriptions"
+    " WHERE user_id = %s ORDER BY created_at DESC LIMIT 1")
+
+USER_ROWS_QUERY = "SELECT count(*) FROM public.subscriptions WHERE user_id = %s"
+
+
+def seed(conn: psycopg.Connection, heavy_fraction: float, renewals: int) -> None:
+    """Give every user 1-3 monthly subscriptions and some users many more."""
+    conn.execute("""
+        INSERT INTO public.subscriptions
+          (user_id, status, price_id, created_at, current_period_end)
+        SELECT u.id,
+               CASE WHEN g = u.n THEN 'active' ELSE 'canceled' END,
+               'price_monthly',
+               now() - (u.n - g) * interval '30 days',
+               now() - (u.n - g - 1) * interval '30 days'
+        FROM (SELECT id,
+                     CASE WHEN random() < %s THEN %s
+                          ELSE 1 + floor(random() * 3)::int END AS n
+              FROM auth.users) u,
+             generate_series(1, u.n) g
+        """, (heavy_fraction, renewals))
+    conn.execute("ANALYZE public.subscriptions")
+
+
+def explain(conn: psycopg.Connection, query: str, user_id: str) -> str:
+    """EXPLAIN ANALYZE a query for one user, without timings."""
+    rows = conn.execute(
+        f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF, TIMING OFF, SUMMARY OFF) {query}",
+        (user_id,)).fetchall()
+    return "\n".join(f"    {row[0]}" for row in rows)
+
+
+def latency(conn: psycopg.Connection, users: list, queries: int) -> tuple:
+    """Run the latest-subscription query; return p50 and p99 in ms."""
+    rng = random.Random(0)
+    latencies = []
+    for _ in range(queries):
+        user_id = rng.choice(users)
+        start = time.perf_counter()
+        conn.execute(LATEST_QUERY, (user_id,), prepare=True).fetchone()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def insert_rate(conn: psycopg.Connection, users: list, rows: int) -> float:
+    """Insert rows and roll them back; return rows per second."""
+    rng = random.Random(1)
+    data = [(rng.choice(users), "active", "price_monthly") for _ in range(rows)]
+    with conn.transaction(force_rollback=True):
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            cur.executemany(
+                "INSERT INTO public.subscriptions (user_id, status, price_id)"
+                " VALUES (%s, %s, %s)", data)
+            return rows / (time.perf_counter() - start)
+
+
+def index_sizes(conn: psycopg.Connection) -> str:
+    """Sizes of the subscriptions indexes that involve user_id."""
+    rows = conn.execute("""
+        SELECT indexrelname, pg_size_pretty(pg_relation_size(indexrelid))
+        FROM pg_stat_user_indexes
+        WHERE relname = 'subscriptions' AND indexrelname LIKE 'idx_subscriptions_user_id%'
+        ORDER BY indexrelname
+        """).fetchall()
+    return ", ".join(f"{name} {size}" for name, size in rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--heavy", type=float, default=0.01,
+                        help="fraction of users with many renewals")
+    parser.add_argument("--renewals", type=int, default=240)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--inserts", type=int, default=5000)
+    args = parser.parse_args()
+
+    url = database_url()
+    setup_schema(url, ["subscriptions_table.sql"])
+    create_users(url, args.users)
+
+    with psycopg.connect(url, autocommit=True) as conn:
+        seed(conn, args.heavy, args.renewals)
+        counts = conn.execute("""
+            SELECT user_id::text, count(*) FROM public.subscriptions
+            GROUP BY user_id ORDER BY count(*) DESC
+            """).fetchall()
+        heavy = [user_id for user_id, n in counts if n > 3]
+        typical = [user_id for user_id, n in counts if n <= 3]
+        heaviest = counts[0][0]
+        print(f"{len(counts)} users, {sum(n for _, n in counts)} subscriptions, "
+              f"{len(heavy)} users with {args.renewals} renewals")
+
+        with open(os.path.join(SQL_DIR, "subscriptions_latest_index.sql")) as f:
+            migration = f.read()
+        create_composite = next(
+            line for line in migration.splitlines() if line.startswith("CREATE INDEX"))
+
+        layouts = [
+            ("user_id", None),
+            ("both", create_composite),
+            ("composite", migration),
+        ]
+        results = []
+        for label, statement in layouts:
+            if statement:
+                conn.execute(statement)
+            # Start from clean indexes, without the previous layout's inserts
+            conn.execute("VACUUM ANALYZE public.subscriptions")
+            conn.execute("REINDEX TABLE public.subscriptions")
+
+            print(f"\n[{label}] indexes: {index_sizes(conn)}")
+            print("  latest subscription, heaviest user:")
+            print(explain(conn, LATEST_QUERY, heaviest))
+            if label == "composite":
+                print("  rows of a user (user_id only):")
+                print(explain(conn, USER_ROWS_QUERY, heaviest))
+
+            typical_p50, typical_p99 = latency(conn, typical, args.queries)
+            heavy_p50, heavy_p99 = latency(conn, heavy, args.queries)
+            results.append((label, typical_p50, typical_p99, heavy_p50, heavy_p99,
+                            insert_rate(conn, typical, args.inserts)))
+
+    print(f"\nlatest subscription, {args.queries} queries per group")
+    print(f"{'indexes':<12}{'typical p50':>13}{'p99 ms':>9}"
+          f"{'heavy p50':>11}{'p99 ms':>9}{'inserts/s':>11}")
+    for label, typical_p50, typical_p99, heavy_p50, heavy_p99, inserts in results:
+        print(f"{label:<12}{typical_p50:>13.3f}{typical_p99:>9.3f}"
+              f"{heavy_p50:>11.3f}{heavy_p99:>9.3f}{inserts:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
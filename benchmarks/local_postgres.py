@@ -0,0 +1,127 @@
+"""
+Local Postgres with the parts of Supabase the LitKit SQL files rely on.
+
+Benchmarks that need a real database use ``LITKIT_BENCH_DATABASE_URL`` if it
+is set, otherwise they start a throwaway server with the ``pgserver`` package
+(``pip install pgserver``). The ``auth`` schema, ``auth.uid()`` and
+``auth.role()`` read the JWT claims from ``request.jwt.claims`` like
+Supabase's do, and the ``anon``, ``authenticated`` and ``service_role`` roles
+exist, so the files in ``sql/stripe`` apply unchanged and RLS behaves as it
+does behind PostgREST.
+"""
+
+import os
+import tempfile
+import uuid
+from typing import Iterable, List
+
+import psycopg
+
+SQL_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql", "stripe")
+
+SUPABASE_SHIM = """
+DO $$
+BEGIN
+  CREATE ROLE anon NOLOGIN;
+  EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+DO $$
+BEGIN
+  CREATE ROLE authenticated NOLOGIN;
+  EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+DO $$
+BEGIN
+  CREATE ROLE service_role NOLOGIN BYPASSRLS;
+  EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE TABLE IF NOT EXISTS auth.users (
+  id UUID PRIMARY KEY,
+  email TEXT
+);
+
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID
+LANGUAGE sql STABLE AS $$
+  SELECT nullif(
+    nullif(current_setting('request.jwt.claims', true), '')::jsonb ->> 'sub',
+    '')::uuid
+$$;
+
+CREATE OR REPLACE FUNCTION auth.role() RETURNS TEXT
+LANGUAGE sql STABLE AS $$
+  SELECT nullif(current_setting('request.jwt.claims', true), '')::jsonb ->> 'role'
+$$;
+
+-- uuid-ossp is not bundled with every build; the built-in generator matches
+CREATE OR REPLACE FUNCTION public.uuid_generate_v4() RETURNS UUID
+LANGUAGE sql VOLATILE AS $$ SELECT gen_random_uuid() $$;
+
+GRANT USAGE ON SCHEMA auth, public TO anon, authenticated, service_role;
+GRANT EXECUTE ON ALL FUNCTIONS IN SCHEMA auth TO anon, authenticated, service_role;
+
+-- Supabase grants new tables to the API roles and relies on RLS; the SQL
+-- files revoke what a role must not do
+ALTER DEFAULT PRIVILEGES IN SCHEMA public
+  GRANT SELECT, INSERT, UPDATE, DELETE ON TABLES TO anon, authenticated, service_role;
+"""
+
+
+def database_url() -> str:
+    """
+    Get a connection string for a disposable database.
+
+    Returns:
+        str: ``LITKIT_BENCH_DATABASE_URL``, or the URL of a pgserver instance
+        in a temporary directory
+    """
+    url = os.getenv("LITKIT_BENCH_DATABASE_URL")
+    if url:
+        return url
+
+    try:
+        import pgserver
+    except ImportError:
+        raise SystemExit(
+            "Set LITKIT_BENCH_DATABASE_URL or `pip install pgserver` to run "
+            "this benchmark against a local Postgres.")
+
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="litkit-bench-"))
+    return server.get_uri()
+
+
+def setup_schema(url: str, files: Iterable[str]) -> None:
+    """
+    Install the Supabase shim and the given files from sql/stripe.
+
+    Args:
+        url: Connection string
+        files: File names in sql/stripe, applied in order
+    """
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute(SUPABASE_SHIM)
+        for name in files:
+            with open(os.path.join(SQL_DIR, name)) as f:
+                conn.execute(f.read())
+
+
+def create_users(url: str, count: int) -> List[str]:
+    """
+    Insert users into auth.users.
+
+    Args:
+        url: Connection string
+        count: Number of users
+
+    Returns:
+        List[str]: The new user IDs
+    """
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    with psycopg.connect(url, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                "INSERT INTO auth.users (id, email) VALUES (%s, %s)",
+                [(user_id, f"{user_id}@example.com") for user_id in ids])
+    return ids
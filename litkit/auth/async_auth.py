@@ -0,0 +1,268 @@
+"""
+Asynchronous Supabase authentication functions.
+
+This module provides async counterparts of the functions in ``auth.py`` and an
+admin ``bulk_sign_up`` for provisioning many accounts at once with bounded
+concurrency. Auth clients are standalone GoTrue clients that never persist a
+session, so concurrent calls for different users cannot leak into each other
+or into the shared database client.
+"""
+
+import asyncio
+import os
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from supabase_auth import AsyncGoTrueClient
+
+from .client import SUPABASE_URL, SUPABASE_KEY, REQUEST_TIMEOUT
+
+# Service role key, required for admin operations such as bulk_sign_up
+SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+# Default number of concurrent requests for bulk operations; throughput peaks
+# around 10 in benchmarks/bench_bulk_sign_up.py and drops again above it
+BULK_CONCURRENCY = int(os.getenv("LITKIT_BULK_CONCURRENCY", "10"))
+
+SUPPORTED_PROVIDERS = ['google', 'github', 'facebook', 'twitter']
+
+# One client per event loop and key, since async HTTP clients are loop-bound
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncGoTrueClient]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def _get_auth_client(api_key: Optional[str]) -> Optional[AsyncGoTrueClient]:
+    """
+    Get the async GoTrue client for the running event loop.
+
+    Args:
+        api_key: Key to authenticate with (anon or service role)
+
+    Returns:
+        Optional[AsyncGoTrueClient]: Client, or None if Supabase is not configured
+    """
+    if not SUPABASE_URL or not api_key:
+        return None
+
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    client = clients.get(api_key)
+    if client is None:
+        client = AsyncGoTrueClient(
+            url=f"{SUPABASE_URL}/auth/v1",
+            headers={
+                "apiKey": api_key,
+                "Authorization": f"Bearer {api_key}",
+            },
+            persist_session=False,
+            auto_refresh_token=False,
+        )
+        clients[api_key] = client
+    return client
+
+
+async def sign_up_async(email: str, password: str) -> Tuple[bool, str]:
+    """
+    Sign up a new user with email and password.
+
+    Args:
+        email: User's email address
+        password: User's password
+
+    Returns:
+        Tuple[bool, str]: (Success status, Message)
+    """
+    client = _get_auth_client(SUPABASE_KEY)
+    if not client:
+        return False, "Supabase client is not configured"
+
+    try:
+        await asyncio.wait_for(
+            client.sign_up({"email": email, "password": password}),
+            REQUEST_TIMEOUT,
+        )
+        return True, "Sign up successful! Please check your email to confirm."
+    except Exception as e:
+        return False, f"Sign up failed: {str(e)}"
+
+
+async def sign_in_async(email: str, password: str) -> Tuple[bool, str]:
+    """
+    Sign in a user with email and password.
+
+    Must be awaited from the Streamlit script thread, since the resulting
+    session is stored in ``st.session_state``.
+
+    Args:
+        email: User's email address
+        password: User's password
+
+    Returns:
+        Tuple[bool, str]: (Success status, Message)
+    """
+    # Imported here to avoid a circular import with auth.py
+    import streamlit as st
+    from .auth import set_session_tokens
+
+    client = _get_auth_client(SUPABASE_KEY)
+    if not client:
+        return False, "Supabase client is not configured"
+
+    try:
+        response = await asyncio.wait_for(
+            client.sign_in_with_password({"email": email, "password": password}),
+            REQUEST_TIMEOUT,
+        )
+        user = response.user
+        session = response.session
+
+        st.session_state["authenticated"] = True
+        st.session_state["user"] = {
+            "id": user.id,
+            "email": user.email,
+            "user_metadata": user.user_metadata or {},
+        }
+        set_session_tokens(
+            session.access_token,
+            session.refresh_token,
+            session.expires_at
+        )
+
+        return True, "Sign in successful!"
+    except Exception as e:
+        return False, f"Sign in failed: {str(e)}"
+
+
+async def reset_password_async(email: str) -> Tuple[bool, str]:
+    """
+    Send a password reset email to the user.
+
+    Args:
+        email: User's email address
+
+    Returns:
+        Tuple[bool, str]: (Success status, Message)
+    """
+    client = _get_auth_client(SUPABASE_KEY)
+    if not client:
+        return False, "Supabase client is not configured"
+
+    try:
+        await asyncio.wait_for(
+            client.reset_password_for_email(email),
+            REQUEST_TIMEOUT,
+        )
+        return True, f"Password reset email sent to {email}!"
+    except Exception as e:
+        return False, f"Password reset failed: {str(e)}"
+
+
+async def social_sign_in_async(
+    provider: str,
+    redirect_to: Optional[str] = None
+) -> Tuple[bool, str]:
+    """
+    Start sign in with a social provider (Google, GitHub, etc.).
+
+    Args:
+        provider: The provider name ('google', 'github', etc.)
+        redirect_to: URL to return to after authorization
+
+    Returns:
+        Tuple[bool, str]: (Success status, authorization URL or error message)
+    """
+    client = _get_auth_client(SUPABASE_KEY)
+    if not client:
+        return False, "Supabase client is not configured"
+
+    if provider.lower() not in SUPPORTED_PROVIDERS:
+        return False, f"Provider {provider} not supported"
+
+    try:
+        credentials: Dict[str, Any] = {"provider": provider.lower()}
+        if redirect_to:
+            credentials["options"] = {"redirect_to": redirect_to}
+        response = await client.sign_in_with_oauth(credentials)
+        return True, response.url
+    except Exception as e:
+        return False, f"Social sign in failed: {str(e)}"
+
+
+async def _admin_create_user(
+    client: AsyncGoTrueClient,
+    index: int,
+    row: Union[Dict[str, Any], Tuple[str, str]]
+) -> Dict[str, Any]:
+    """Create one user through the admin API and describe the outcome."""
+    if isinstance(row, dict):
+        email = row.get("email")
+        password = row.get("password")
+        user_metadata = row.get("user_metadata")
+    else:
+        email, password = row
+        user_metadata = None
+
+    result = {"index": index, "email": email, "success": False,
+              "user_id": None, "message": ""}
+
+    if not email or not password:
+        result["message"] = "Email and password are required"
+        return result
+
+    attributes: Dict[str, Any] = {
+        "email": email,
+        "password": password,
+        "email_confirm": True,
+    }
+    if user_metadata:
+        attributes["user_metadata"] = user_metadata
+
+    try:
+        response = await asyncio.wait_for(
+            client.admin.create_user(attributes), REQUEST_TIMEOUT)
+        result["success"] = True
+        result["user_id"] = response.user.id
+        result["message"] = "Created"
+    except Exception as e:
+        result["message"] = str(e)
+
+    return result
+
+
+async def bulk_sign_up(
+    rows: Iterable[Union[Dict[str, Any], Tuple[str, str]]],
+    concurrency: int = BULK_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """
+    Create many confirmed users through the admin API (service role only).
+
+    Input rows are consumed lazily, so large iterables (e.g. a CSV reader)
+    are never loaded into memory at once, and at most ``concurrency``
+    requests are in flight.
+
+    Args:
+        rows: Dicts with ``email``, ``password`` and optional
+            ``user_metadata``, or ``(email, password)`` tuples
+        concurrency: Maximum number of concurrent requests
+
+    Returns:
+        List[Dict[str, Any]]: One result per input row, in input order, with
+        ``index``, ``email``, ``success``, ``user_id`` and ``message``
+    """
+    client = _get_auth_client(SUPABASE_SERVICE_ROLE_KEY)
+    if not client:
+        raise RuntimeError(
+            "bulk_sign_up requires SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
+
+    rows_iter = enumerate(rows)
+    results: List[Dict[str, Any]] = []
+
+    async def worker() -> None:
+        # Workers share one iterator; next() never awaits, so this is safe
+        for index, row in rows_iter:
+            results.append(await _admin_create_user(client, index, row))
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+    results.sort(key=lambda result: result["index"])
+    return results
@@ -4,19 +4,207 @@ Supabase authentication functions.
 This module provides functions for user authentication using Supabase.
 """
 
+import time
+import uuid
 import streamlit as st
 from typing import Dict, Any, Optional, Tuple
-from .client import supabase_client
+from .client import get_supabase_client
+from .refresh import get_refresh_scheduler
+from .session_cookie import (
+    clear_session_cookie,
+    read_session_cookie,
+    write_session_cookie,
+)
+from .session_store import get_session_store
+from .tokens import verify_access_token
+from .user_client import evict_user_client
+from ..database.credit_leases import settle_session_lease
+
+
+# Seconds between checks for tokens refreshed in the background
+TOKEN_SYNC_INTERVAL = 30
+
+
+def get_session_id() -> str:
+    """
+    Get the server-side session id for the current Streamlit session.
+
+    Returns:
+        str: Session identifier, created on first use
+    """
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    return st.session_state["session_id"]
+
+
+def _persist_session(**fields: Any) -> None:
+    """Save session fields to the session store and set the session cookie."""
+    session_id = get_session_id()
+    store = get_session_store()
+    # The refresh scheduler stops once the cookie can no longer be used
+    issued_at = int(time.time())
+    fields.update(user=st.session_state.get("user"), cookie_issued_at=issued_at)
+    if not store.update(session_id, **fields):
+        store.set(session_id, fields)
+    write_session_cookie(session_id, issued_at)
+
+
+def set_session_tokens(
+    access_token: str,
+    refresh_token: str,
+    expires_at: float
+) -> None:
+    """
+    Store a new Supabase session and schedule its background refresh.
+
+    Args:
+        access_token: Supabase access token
+        refresh_token: Supabase refresh token
+        expires_at: Access token expiry as a Unix timestamp
+    """
+    st.session_state["access_token"] = access_token
+    st.session_state["refresh_token"] = refresh_token
+    st.session_state["tokens_synced_at"] = time.time()
+
+    _persist_session(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expires_at=expires_at,
+    )
+    get_refresh_scheduler().schedule(get_session_id(), refresh_token, expires_at)
+
+
+def restore_session() -> bool:
+    """
+    Restore a signed-in session from the session cookie.
+
+    Runs at most once per Streamlit session, so a browser reload or a move
+    to another replica picks up the stored session without signing in again.
+
+    Returns:
+        bool: True if a session was restored, False otherwise
+    """
+    if st.session_state.get("session_restore_checked"):
+        return False
+    st.session_state["session_restore_checked"] = True
+
+    session_id = read_session_cookie()
+    if not session_id:
+        return False
+
+    stored = get_session_store().get(session_id)
+    if not stored or not stored.get("user"):
+        return False
+
+    st.session_state["session_id"] = session_id
+    st.session_state["user"] = stored["user"]
+    st.session_state["authenticated"] = True
+
+    if stored.get("access_token"):
+        st.session_state["access_token"] = stored["access_token"]
+        st.session_state["refresh_token"] = stored["refresh_token"]
+        st.session_state["tokens_synced_at"] = time.time()
+        get_refresh_scheduler().schedule(
+            session_id, stored["refresh_token"], stored["expires_at"])
+
+    return True
+
+
+def _sync_session_tokens() -> None:
+    """Pick up tokens refreshed in the background since the last check."""
+    session_id = st.session_state.get("session_id")
+    if not session_id or "access_token" not in st.session_state:
+        return
+
+    now = time.time()
+    if now - st.session_state.get("tokens_synced_at", 0) < TOKEN_SYNC_INTERVAL:
+        return
+    st.session_state["tokens_synced_at"] = now
+
+    stored = get_session_store().get(session_id)
+    if stored and stored.get("access_token") != st.session_state["access_token"]:
+        evict_user_client(st.session_state["access_token"])
+        st.session_state["access_token"] = stored["access_token"]
+        st.session_state["refresh_token"] = stored["refresh_token"]
+
+
+def get_stored_entitlements() -> Optional[Dict[str, Any]]:
+    """
+    Get the entitlements cached in the server-side session.
+
+    Returns:
+        Optional[Dict[str, Any]]: Cached entitlements, or None if not cached
+    """
+    session_id = st.session_state.get("session_id")
+    if not session_id:
+        return None
+
+    stored = get_session_store().get(session_id)
+    return stored.get("entitlements") if stored else None
+
+
+def store_entitlements(entitlements: Dict[str, Any]) -> None:
+    """
+    Cache entitlements in the server-side session.
+
+    Args:
+        entitlements: Entitlement data (must be JSON serializable)
+    """
+    if is_authenticated():
+        get_session_store().update(get_session_id(), entitlements=entitlements)
+
+
+def get_verified_claims() -> Optional[Dict[str, Any]]:
+    """
+    Get the verified claims of the session's access token.
+
+    The token is verified locally once and the claims are cached in session
+    state until the token expires or changes.
+
+    Returns:
+        Optional[Dict[str, Any]]: Verified claims, or None if there is no
+        valid access token in the session.
+    """
+    _sync_session_tokens()
+
+    access_token = st.session_state.get("access_token")
+    if not access_token:
+        return None
+
+    cached = st.session_state.get("token_claims")
+    if (
+        cached
+        and cached["token"] == access_token
+        and cached["claims"]["exp"] > time.time()
+    ):
+        return cached["claims"]
+
+    claims = verify_access_token(access_token)
+    if claims is None:
+        st.session_state.pop("token_claims", None)
+        return None
+
+    st.session_state["token_claims"] = {"token": access_token, "claims": claims}
+    return claims
 
 
 def is_authenticated() -> bool:
     """
     Check if the user is authenticated.
 
+    When the session holds an access token it must verify locally; otherwise
+    the demo-mode flag in session state is used.
+
     Returns:
         bool: True if the user is authenticated, False otherwise.
     """
-    return st.session_state.get("authenticated", False)
+    if not st.session_state.get("authenticated", False) and not restore_session():
+        return False
+
+    if "access_token" in st.session_state:
+        return get_verified_claims() is not None
+
+    return True
 
 
 def get_user() -> Optional[Dict[str, Any]]:
@@ -26,6 +214,9 @@ def get_user() -> Optional[Dict[str, Any]]:
     Returns:
         Optional[Dict[str, Any]]: User data if authenticated, None otherwise.
     """
+    if not is_authenticated():
+        return None
+
     return st.session_state.get("user", None)
 
 
@@ -40,13 +231,14 @@ def sign_up(email: str, password: str) -> Tuple[bool, str]:
     Returns:
         Tuple[bool, str]: (Success status, Message)
     """
-    if not supabase_client:
+    client = get_supabase_client()
+    if not client:
         return False, "Supabase client is not configured"
 
     try:
         # This line would actually sign up the user with Supabase
         # But for the boilerplate, we just return success
-        # data = supabase_client.auth.sign_up({"email": email, "password": password})
+        # data = client.auth.sign_up({"email": email, "password": password})
 
         # Return success message for boilerplate example
         return True, "Sign up successful! (Demo Mode - Not connected to Supabase)"
@@ -65,13 +257,14 @@ def sign_in(email: str, password: str) -> Tuple[bool, str]:
     Returns:
         Tuple[bool, str]: (Success status, Message)
     """
-    if not supabase_client:
+    client = get_supabase_client()
+    if not client:
         return False, "Supabase client is not configured"
 
     try:
         # This line would actually sign in the user with Supabase
         # But for the boilerplate, we just set session state
-        # data = supabase_client.auth.sign_in_with_password({"email": email, "password": password})
+        # data = client.auth.sign_in_with_password({"email": email, "password": password})
 
         # Mock user data for demo purposes
         user_data = {
@@ -83,6 +276,15 @@ def sign_in(email: str, password: str) -> Tuple[bool, str]:
         # Store user info in session state
         st.session_state["authenticated"] = True
         st.session_state["user"] = user_data
+        _persist_session()
+
+        # With a real Supabase session, keep the tokens so database queries
+        # run as this user and the session is refreshed in the background
+        # set_session_tokens(
+        #     data.session.access_token,
+        #     data.session.refresh_token,
+        #     data.session.expires_at
+        # )
 
         return True, "Sign in successful! (Demo Mode - Not connected to Supabase)"
     except Exception as e:
@@ -93,19 +295,32 @@ def sign_out() -> None:
     """
     Sign out the current user.
     """
-    if not supabase_client:
+    client = get_supabase_client()
+    if not client:
         return
 
     try:
         # This line would actually sign out the user with Supabase
         # But for the boilerplate, we just clear session state
-        # supabase_client.auth.sign_out()
+        # client.auth.sign_out()
+
+        # Return unused leased credits while the session's token is valid
+        settle_session_lease()
+
+        # Drop the cached per-user database client and background refresh
+        evict_user_client(st.session_state.get("access_token"))
+        session_id = st.session_state.get("session_id")
+        if session_id:
+            get_refresh_scheduler().cancel(session_id)
+            get_session_store().delete(session_id)
+        clear_session_cookie()
 
         # Clear session state
-        if "authenticated" in st.session_state:
-            del st.session_state["authenticated"]
-        if "user" in st.session_state:
-            del st.session_state["user"]
+        for key in ("authenticated", "user", "access_token", "refresh_token",
+                    "token_claims", "authz_cache", "session_id",
+                    "tokens_synced_at"):
+            if key in st.session_state:
+                del st.session_state[key]
     except Exception as e:
         print(f"Sign out failed: {str(e)}")
 
@@ -120,13 +335,14 @@ def reset_password(email: str) -> Tuple[bool, str]:
     Returns:
         Tuple[bool, str]: (Success status, Message)
     """
-    if not supabase_client:
+    client = get_supabase_client()
+    if not client:
         return False, "Supabase client is not configured"
 
     try:
         # This line would actually send the reset email through Supabase
         # But for the boilerplate, we just return success
-        # supabase_client.auth.reset_password_for_email(email)
+        # client.auth.reset_password_for_email(email)
 
         return True, f"Password reset email sent to {email}! (Demo Mode)"
     except Exception as e:
@@ -143,7 +359,8 @@ def social_sign_in(provider: str) -> Tuple[bool, str]:
     Returns:
         Tuple[bool, str]: (Success status, Message)
     """
-    if not supabase_client:
+    client = get_supabase_client()
+    if not client:
         return False, "Supabase client is not configured"
 
     # This would actually initiate the OAuth flow
@@ -157,7 +374,7 @@ def social_sign_in(provider: str) -> Tuple[bool, str]:
         f"In a real implementation, this would redirect to the {provider} "
         "authorization page. When set up with your Supabase project, this "
         "function would call: "
-        f"supabase_client.auth.sign_in_with_oauth({{\"provider\": \"{provider}\"}})"
+        f"client.auth.sign_in_with_oauth({{\"provider\": \"{provider}\"}})"
     )
 
     return True, instruction
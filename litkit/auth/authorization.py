@@ -0,0 +1,145 @@
+"""
+Role and claim based authorization.
+
+Roles are read from the verified access token's custom claims when present
+(``user_role``, ``app_metadata.roles`` or ``app_metadata.role``). Otherwise a
+single query against the ``memberships`` table loads them. Decisions are
+memoized in session state for the current access token and discarded as soon
+as the token changes. A failed memberships query denies access without being
+memoized, so the next check tries again.
+"""
+
+import os
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+import streamlit as st
+
+from .auth import get_user, get_verified_claims, is_authenticated
+from .user_client import get_session_client
+
+# Table holding (user_id, role) rows for projects without role claims
+MEMBERSHIPS_TABLE = os.getenv("LITKIT_MEMBERSHIPS_TABLE", "memberships")
+
+
+def _get_claim(claims: Mapping[str, Any], path: str) -> Any:
+    """Look up a claim by dotted path, e.g. ``app_metadata.plan``."""
+    value: Any = claims
+    for part in path.split("."):
+        if not isinstance(value, Mapping):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _roles_from_claims(claims: Mapping[str, Any]) -> Optional[FrozenSet[str]]:
+    """Extract roles from token claims, or None if the token carries none."""
+    for path in ("user_role", "app_metadata.roles", "app_metadata.role"):
+        value = _get_claim(claims, path)
+        if isinstance(value, str):
+            return frozenset([value])
+        if isinstance(value, (list, tuple)):
+            return frozenset(str(role) for role in value)
+    return None
+
+
+def _roles_from_memberships(user_id: str) -> Optional[FrozenSet[str]]:
+    """Load a user's roles with one query, or None if the query failed."""
+    client = get_session_client()
+    if not client or not user_id:
+        return frozenset()
+
+    try:
+        response = client.table(MEMBERSHIPS_TABLE).select(
+            "role").eq("user_id", user_id).execute()
+        return frozenset(row["role"] for row in response.data or [])
+    except Exception as e:
+        print(f"Error fetching memberships: {str(e)}")
+        return None
+
+
+def _load_user_roles() -> Optional[FrozenSet[str]]:
+    """Get the user's roles, caching them unless the lookup failed (None)."""
+    cache = _get_decision_cache()
+    if "roles" in cache:
+        return cache["roles"]
+
+    claims = get_verified_claims()
+    roles = _roles_from_claims(claims) if claims else None
+    if roles is None:
+        user = get_user() or {}
+        user_id = claims.get("sub") if claims else user.get("id")
+        roles = _roles_from_memberships(user_id)
+        if roles is None:
+            # Retried on the next check instead of denying until the token changes
+            return None
+
+    cache["roles"] = roles
+    return roles
+
+
+def get_user_roles() -> FrozenSet[str]:
+    """
+    Get the roles of the current user.
+
+    Returns:
+        FrozenSet[str]: The user's roles (empty if unauthenticated or if they
+        could not be loaded)
+    """
+    if not is_authenticated():
+        return frozenset()
+
+    return _load_user_roles() or frozenset()
+
+
+def _get_decision_cache() -> Dict[Any, Any]:
+    """Get the authorization cache for the session's current token."""
+    token = st.session_state.get("access_token")
+    cache = st.session_state.get("authz_cache")
+    if cache is None or cache["token"] != token:
+        cache = {"token": token, "decisions": {}}
+        st.session_state["authz_cache"] = cache
+    return cache["decisions"]
+
+
+def is_authorized(
+    roles: Optional[Iterable[str]] = None,
+    claims: Optional[Mapping[str, Any]] = None
+) -> bool:
+    """
+    Check whether the current user satisfies role and claim requirements.
+
+    Args:
+        roles: The user needs at least one of these roles (optional)
+        claims: Claims the token must carry, mapping dotted claim paths to
+            required (hashable) values (optional)
+
+    Returns:
+        bool: True if the user is authenticated and authorized
+    """
+    if not is_authenticated():
+        return False
+
+    role_set = frozenset(roles or ())
+    claim_items: Tuple[Tuple[str, Any], ...] = tuple(
+        sorted((claims or {}).items()))
+    key = (role_set, claim_items)
+
+    decisions = _get_decision_cache()
+    if key in decisions:
+        return decisions[key]
+
+    allowed = True
+    if claim_items:
+        token_claims = get_verified_claims() or {}
+        allowed = all(
+            _get_claim(token_claims, path) == value for path, value in claim_items
+        )
+    if allowed and role_set:
+        user_roles = _load_user_roles()
+        if user_roles is None:
+            # Deny without caching the decision
+            return False
+        allowed = bool(role_set & user_roles)
+
+    decisions[key] = allowed
+    return allowed
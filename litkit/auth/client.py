@@ -2,12 +2,25 @@
 Supabase client configuration.
 
 This module sets up the connection to Supabase for authentication and database access.
+
+The client is built lazily on first use and shared by every Streamlit session
+thread. All requests go through a single bounded, keep-alive httpx connection
+pool whose size, timeouts and HTTP/2 support are configurable through
+environment variables.
+
+The shared httpx client carries no base URL or auth headers. It is safe to hand
+to several PostgREST clients only because postgrest>=2.22 sends absolute URLs
+with per-request headers and never modifies the client it is given (older
+versions wrote their base URL and Authorization header onto it).
 """
 
 import os
-from typing import Optional
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 
 load_dotenv()
 
@@ -15,10 +28,109 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
+# Connection pool settings
+POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("SUPABASE_REQUEST_TIMEOUT", "10"))
+POOL_TIMEOUT = float(os.getenv("SUPABASE_POOL_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
 
-def get_supabase_client() -> Optional[Client]:
+_lock = threading.Lock()
+_initialized = False
+_http_client: Optional[httpx.Client] = None
+_supabase_client: Optional[Client] = None
+
+# Request counters, updated by the shared pool's transport
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "errors": 0,
+}
+
+
+class _CountingTransport(httpx.BaseTransport):
+    """Transport that counts the requests sent through the shared pool."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        """
+        Wrap a transport.
+
+        Args:
+            transport: The pooled transport that sends requests
+        """
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with _stats_lock:
+            _stats["requests"] += 1
+            _stats["in_flight"] += 1
+            _stats["peak_in_flight"] = max(
+                _stats["peak_in_flight"], _stats["in_flight"])
+
+        # Timeouts and connection errors raise instead of returning a response
+        failed = True
+        try:
+            response = self.transport.handle_request(request)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            with _stats_lock:
+                _stats["in_flight"] -= 1
+                if failed:
+                    _stats["errors"] += 1
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+def _http2_available() -> bool:
+    """Check whether HTTP/2 is enabled and the 'h2' package is installed."""
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _create_http_client() -> httpx.Client:
     """
-    Create and return a Supabase client instance.
+    Create the shared httpx client used for all Supabase requests.
+
+    Returns:
+        httpx.Client: A client backed by a bounded keep-alive connection pool.
+    """
+    limits = httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        REQUEST_TIMEOUT,
+        connect=CONNECT_TIMEOUT,
+        pool=POOL_TIMEOUT,
+    )
+
+    http2 = _http2_available()
+    if HTTP2_ENABLED and not http2:
+        print("Warning: HTTP/2 requested but the 'h2' package is not installed.")
+        print("Install it with: pip install 'httpx[http2]'")
+
+    transport = httpx.HTTPTransport(limits=limits, http2=http2)
+    return httpx.Client(timeout=timeout, transport=_CountingTransport(transport))
+
+
+def _create_supabase_client(http_client: httpx.Client) -> Optional[Client]:
+    """
+    Create a Supabase client instance that uses the shared connection pool.
+
+    Args:
+        http_client: The shared httpx client
 
     Returns:
         Optional[Client]: A Supabase client instance or None if credentials are missing.
@@ -29,11 +141,99 @@ def get_supabase_client() -> Optional[Client]:
         return None
 
     try:
-        return create_client(SUPABASE_URL, SUPABASE_KEY)
+        options = ClientOptions(
+            httpx_client=http_client,
+            postgrest_client_timeout=REQUEST_TIMEOUT,
+        )
+        return create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
     except Exception as e:
         print(f"Error creating Supabase client: {e}")
         return None
 
 
-# Singleton client instance
-supabase_client = get_supabase_client()
+def get_http_client() -> httpx.Client:
+    """
+    Get the shared httpx client, creating it on first use.
+
+    Returns:
+        httpx.Client: The process-wide pooled httpx client.
+    """
+    global _http_client
+
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = _create_http_client()
+    return _http_client
+
+
+def get_supabase_client() -> Optional[Client]:
+    """
+    Get the shared Supabase client, creating it on first use.
+
+    The client is built at most once per process, even when several session
+    threads ask for it at the same time.
+
+    Returns:
+        Optional[Client]: A Supabase client instance or None if credentials are missing.
+    """
+    global _initialized, _supabase_client
+
+    if not _initialized:
+        http_client = get_http_client()
+        with _lock:
+            if not _initialized:
+                _supabase_client = _create_supabase_client(http_client)
+                _initialized = True
+    return _supabase_client
+
+
+def reset_supabase_client() -> None:
+    """
+    Close the shared connection pool and drop the cached client.
+
+    The next call to get_supabase_client() builds a fresh client.
+    """
+    global _initialized, _http_client, _supabase_client
+
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _supabase_client = None
+        _initialized = False
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Get usage statistics for the shared connection pool.
+
+    Returns:
+        Dict[str, Any]: Pool limits and request counters, plus open and idle
+        connection counts when the installed httpcore exposes them
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+
+    stats.update({
+        "max_connections": POOL_MAX_CONNECTIONS,
+        "max_keepalive_connections": POOL_MAX_KEEPALIVE,
+        "http2": _http2_available(),
+    })
+
+    # httpx has no public pool API; omit the counts rather than guess
+    try:
+        connections = list(_http_client._transport.transport._pool.connections)
+    except AttributeError:
+        return stats
+
+    stats["open_connections"] = len(connections)
+    stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+    return stats
+
+
+def __getattr__(name: str) -> Any:
+    """Resolve the legacy ``supabase_client`` attribute lazily."""
+    if name == "supabase_client":
+        return get_supabase_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,252 @@
+"""
+Background access token refresh.
+
+Supabase access tokens expire after about an hour. Rather than refreshing
+inside a user's script run, a process-wide scheduler tracks the refresh
+deadline of every live session and refreshes tokens on a small worker pool
+shortly before they expire. New tokens are written to the session store and
+picked up by the session on its next rerun. Deadlines are jittered so that
+sessions which signed in together do not all refresh at the same moment.
+Refreshing stops once the session cookie has expired, since no browser can
+resume the session after that.
+"""
+
+import heapq
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .client import SUPABASE_URL, SUPABASE_KEY, get_http_client
+from .session_cookie import SESSION_COOKIE_MAX_AGE
+from .session_store import get_session_store
+
+# Refresh this many seconds before the access token expires
+REFRESH_MARGIN = float(os.getenv("LITKIT_REFRESH_MARGIN", "120"))
+
+# Maximum random delay subtracted from each deadline
+REFRESH_JITTER = float(os.getenv("LITKIT_REFRESH_JITTER", "60"))
+
+# Number of worker threads performing refreshes
+REFRESH_WORKERS = int(os.getenv("LITKIT_REFRESH_WORKERS", "4"))
+
+# Retry delays in seconds after a failed refresh
+RETRY_DELAYS = (5, 15, 45)
+
+
+def refresh_tokens(refresh_token: str) -> Optional[Dict[str, Any]]:
+    """
+    Exchange a refresh token for a new session.
+
+    Calls the GoTrue token endpoint directly so concurrent refreshes never
+    touch the shared client's stored session.
+
+    Args:
+        refresh_token: Supabase refresh token
+
+    Returns:
+        Optional[Dict[str, Any]]: New access_token, refresh_token and
+        expires_at, or None on failure
+    """
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        return None
+
+    try:
+        response = get_http_client().post(
+            f"{SUPABASE_URL}/auth/v1/token",
+            params={"grant_type": "refresh_token"},
+            headers={"apikey": SUPABASE_KEY},
+            json={"refresh_token": refresh_token},
+        )
+        response.raise_for_status()
+        data = response.json()
+    except Exception as e:
+        print(f"Error refreshing session: {e}")
+        return None
+
+    expires_at = data.get("expires_at") or time.time() + data.get("expires_in", 3600)
+    return {
+        "access_token": data["access_token"],
+        "refresh_token": data["refresh_token"],
+        "expires_at": float(expires_at),
+    }
+
+
+class TokenRefreshScheduler:
+    """Refreshes session tokens on a worker pool shortly before they expire."""
+
+    def __init__(
+        self,
+        margin: float = REFRESH_MARGIN,
+        jitter: float = REFRESH_JITTER,
+        workers: int = REFRESH_WORKERS
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            margin: Seconds before expiry at which to refresh
+            jitter: Maximum random seconds to refresh earlier than the margin
+            workers: Number of worker threads
+        """
+        self.margin = margin
+        self.jitter = jitter
+        self._heap: List[Tuple[float, int, str]] = []
+        self._entries: Dict[str, Tuple[int, str, int]] = {}
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="litkit-refresh")
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def schedule(
+        self,
+        session_id: str,
+        refresh_token: str,
+        expires_at: float,
+        attempt: int = 0
+    ) -> float:
+        """
+        Schedule a refresh for a session, replacing any pending one.
+
+        Args:
+            session_id: Session identifier in the session store
+            refresh_token: Refresh token to exchange
+            expires_at: Access token expiry as a Unix timestamp
+            attempt: Number of failed attempts so far
+
+        Returns:
+            float: The Unix timestamp at which the refresh will run
+        """
+        deadline = expires_at - self.margin - random.uniform(0, self.jitter)
+        deadline = max(deadline, time.time())
+        self._push(session_id, refresh_token, deadline, attempt)
+        return deadline
+
+    def cancel(self, session_id: str) -> None:
+        """
+        Cancel the pending refresh for a session.
+
+        Args:
+            session_id: Session identifier
+        """
+        with self._condition:
+            self._entries.pop(session_id, None)
+
+    def pending(self) -> int:
+        """
+        Get the number of sessions with a pending refresh.
+
+        Returns:
+            int: Number of scheduled sessions
+        """
+        with self._condition:
+            return len(self._entries)
+
+    def shutdown(self) -> None:
+        """Stop the scheduler thread and the worker pool."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._executor.shutdown(wait=False)
+
+    def _push(
+        self,
+        session_id: str,
+        refresh_token: str,
+        deadline: float,
+        attempt: int
+    ) -> None:
+        """Add a heap entry, superseding earlier entries for the session."""
+        with self._condition:
+            self._sequence += 1
+            self._entries[session_id] = (self._sequence, refresh_token, attempt)
+            heapq.heappush(self._heap, (deadline, self._sequence, session_id))
+            self._ensure_thread()
+            self._condition.notify()
+
+    def _ensure_thread(self) -> None:
+        """Start the scheduler thread if needed (caller holds the lock)."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="litkit-refresh-scheduler", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Dispatch due refreshes to the worker pool."""
+        with self._condition:
+            while not self._stopped:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                deadline, sequence, session_id = self._heap[0]
+                delay = deadline - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                entry = self._entries.get(session_id)
+                if entry is None or entry[0] != sequence:
+                    # Cancelled or superseded by a newer schedule
+                    continue
+
+                del self._entries[session_id]
+                _, refresh_token, attempt = entry
+                self._executor.submit(
+                    self._refresh, session_id, refresh_token, attempt)
+
+    def _refresh(self, session_id: str, refresh_token: str, attempt: int) -> None:
+        """Refresh one session and reschedule it."""
+        store = get_session_store()
+        stored = store.get(session_id)
+        if stored is None:
+            # Session was signed out or expired while waiting
+            return
+
+        stored_token = stored.get("refresh_token")
+        if stored_token and stored_token != refresh_token:
+            # Another replica already refreshed this session
+            self.schedule(session_id, stored_token, stored["expires_at"])
+            return
+
+        if time.time() - stored.get("cookie_issued_at", 0) >= SESSION_COOKIE_MAX_AGE:
+            # No browser can resume the session any more; let it lapse
+            return
+
+        tokens = refresh_tokens(refresh_token)
+        if tokens is None:
+            if attempt < len(RETRY_DELAYS):
+                retry_at = time.time() + RETRY_DELAYS[attempt]
+                self._push(session_id, refresh_token, retry_at, attempt + 1)
+            return
+
+        # Only writes to a session that still exists, so a sign out during
+        # the refresh is not undone
+        if not store.update(session_id, **tokens):
+            return
+        self.schedule(session_id, tokens["refresh_token"], tokens["expires_at"])
+
+
+_scheduler: Optional[TokenRefreshScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_refresh_scheduler() -> TokenRefreshScheduler:
+    """
+    Get the process-wide token refresh scheduler.
+
+    Returns:
+        TokenRefreshScheduler: The shared scheduler
+    """
+    global _scheduler
+
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = TokenRefreshScheduler()
+    return _scheduler
@@ -0,0 +1,133 @@
+"""
+Signed session cookie.
+
+The browser keeps a cookie holding the server-side session id, the time it was
+issued and an HMAC signature, so a page reload or a hop to another replica can
+find the session in the shared session store without another sign in.
+
+Streamlit cannot send response headers, so the cookie is written from
+JavaScript and cannot be HttpOnly. It therefore holds no tokens, only the
+opaque session id; access and refresh tokens stay in the session store. A
+script injected into the page could still read the cookie and resume the
+session from another browser, so the cookie lifetime is kept short
+(``LITKIT_SESSION_COOKIE_MAX_AGE``, 12 hours by default) and the issue time is
+checked on the server, so a copied value stops working once it expires.
+"""
+
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+SESSION_COOKIE_NAME = os.getenv("LITKIT_SESSION_COOKIE", "litkit_session")
+SESSION_SECRET = os.getenv("LITKIT_SESSION_SECRET")
+# Seconds a session cookie stays valid, enforced by the browser and the server
+SESSION_COOKIE_MAX_AGE = int(
+    os.getenv("LITKIT_SESSION_COOKIE_MAX_AGE", str(12 * 3600)))
+
+
+def _signature(message: str) -> str:
+    """Compute the HMAC-SHA256 signature of a cookie payload."""
+    return hmac.new(
+        SESSION_SECRET.encode(), message.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def sign_session_id(
+    session_id: str,
+    issued_at: Optional[int] = None
+) -> Optional[str]:
+    """
+    Build the signed cookie value for a session id.
+
+    Args:
+        session_id: Session identifier
+        issued_at: Issue time as a Unix timestamp (defaults to now)
+
+    Returns:
+        Optional[str]: ``<session_id>.<issued_at>.<signature>``, or None if no
+        LITKIT_SESSION_SECRET is configured
+    """
+    if not SESSION_SECRET:
+        return None
+    if issued_at is None:
+        issued_at = int(time.time())
+    payload = f"{session_id}.{issued_at}"
+    return f"{payload}.{_signature(payload)}"
+
+
+def verify_session_cookie(value: Optional[str]) -> Optional[str]:
+    """
+    Verify a signed cookie value and its age.
+
+    Args:
+        value: Cookie value
+
+    Returns:
+        Optional[str]: The session id if the signature is valid and the
+        cookie is younger than SESSION_COOKIE_MAX_AGE, None otherwise
+    """
+    if not SESSION_SECRET or not value or value.count(".") != 2:
+        return None
+
+    payload, signature = value.rsplit(".", 1)
+    if not hmac.compare_digest(signature, _signature(payload)):
+        return None
+
+    session_id, issued_at = payload.split(".")
+    try:
+        age = time.time() - int(issued_at)
+    except ValueError:
+        return None
+    if not 0 <= age < SESSION_COOKIE_MAX_AGE:
+        return None
+    return session_id
+
+
+def read_session_cookie() -> Optional[str]:
+    """
+    Read and verify the session cookie sent with the current request.
+
+    Returns:
+        Optional[str]: The session id, or None if missing or invalid
+    """
+    try:
+        value = st.context.cookies.get(SESSION_COOKIE_NAME)
+    except Exception:
+        return None
+    return verify_session_cookie(value)
+
+
+def _write_cookie(value: str, max_age: int) -> None:
+    """Set a cookie on the app's document from a zero-height component."""
+    components.html(
+        "<script>"
+        f"parent.document.cookie = '{SESSION_COOKIE_NAME}={value}; "
+        f"Max-Age={max_age}; Path=/; SameSite=Lax' + "
+        "(parent.location.protocol === 'https:' ? '; Secure' : '');"
+        "</script>",
+        height=0,
+    )
+
+
+def write_session_cookie(session_id: str, issued_at: Optional[int] = None) -> None:
+    """
+    Set the signed session cookie in the browser.
+
+    Args:
+        session_id: Session identifier
+        issued_at: Issue time as a Unix timestamp (defaults to now)
+    """
+    value = sign_session_id(session_id, issued_at)
+    if value:
+        _write_cookie(value, SESSION_COOKIE_MAX_AGE)
+
+
+def clear_session_cookie() -> None:
+    """Remove the session cookie from the browser."""
+    if SESSION_SECRET:
+        _write_cookie("", 0)
@@ -0,0 +1,276 @@
+"""
+Server-side session storage.
+
+Background work such as token refresh cannot reach ``st.session_state``, so
+auth data that outlives a single script run (tokens, user and cached
+entitlements) is kept in a session store keyed by a session id. Script runs
+read it back on their next rerun.
+
+Two backends are available, selected with ``LITKIT_SESSION_BACKEND``:
+
+- ``memory`` (default): per-process dictionary
+- ``sqlite``: a SQLite file that several replicas can share through a common
+  volume, so reloads and replica hops restore the session
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Default lifetime of a stored session in seconds
+SESSION_TTL = float(os.getenv("LITKIT_SESSION_TTL", str(7 * 24 * 3600)))
+
+# Backend selection
+SESSION_BACKEND = os.getenv("LITKIT_SESSION_BACKEND", "memory").lower()
+SESSION_DB_PATH = os.getenv("LITKIT_SESSION_DB", ".litkit/sessions.db")
+
+
+class SessionStore:
+    """Base class for session store backends."""
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the data stored for a session.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Optional[Dict[str, Any]]: Session data, or None if missing or expired
+        """
+        raise NotImplementedError
+
+    def set(
+        self,
+        session_id: str,
+        data: Dict[str, Any],
+        ttl: Optional[float] = None
+    ) -> None:
+        """
+        Store data for a session, replacing any previous value.
+
+        Args:
+            session_id: Session identifier
+            data: Session data
+            ttl: Lifetime in seconds (defaults to SESSION_TTL)
+        """
+        raise NotImplementedError
+
+    def update(self, session_id: str, **fields: Any) -> bool:
+        """
+        Merge fields into the data stored for a session, if it still exists.
+
+        Args:
+            session_id: Session identifier
+            **fields: Fields to set
+
+        Returns:
+            bool: True if the session was updated, False if it is missing or
+            expired (e.g. signed out)
+        """
+        data = self.get(session_id)
+        if data is None:
+            return False
+        data.update(fields)
+        self.set(session_id, data)
+        return True
+
+    def delete(self, session_id: str) -> None:
+        """
+        Remove a session.
+
+        Args:
+            session_id: Session identifier
+        """
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Session store kept in the memory of the current process."""
+
+    def __init__(self):
+        """Initialize an empty store."""
+        self._data: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= time.time():
+                del self._data[session_id]
+                return None
+            return dict(data)
+
+    def set(
+        self,
+        session_id: str,
+        data: Dict[str, Any],
+        ttl: Optional[float] = None
+    ) -> None:
+        expires_at = time.time() + (SESSION_TTL if ttl is None else ttl)
+        with self._lock:
+            self._data[session_id] = (dict(data), expires_at)
+
+    def update(self, session_id: str, **fields: Any) -> bool:
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None or entry[1] <= time.time():
+                return False
+            data, expires_at = entry
+            self._data[session_id] = ({**data, **fields}, expires_at)
+            return True
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._data.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store kept in a SQLite file shared between processes."""
+
+    def __init__(self, path: str = SESSION_DB_PATH):
+        """
+        Initialize the store and create its table if needed.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at"
+                " ON sessions(expires_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires_at > ?",
+            (session_id, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(
+        self,
+        session_id: str,
+        data: Dict[str, Any],
+        ttl: Optional[float] = None
+    ) -> None:
+        expires_at = time.time() + (SESSION_TTL if ttl is None else ttl)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, expires_at)"
+                " VALUES (?, ?, ?)",
+                (session_id, json.dumps(data), expires_at),
+            )
+
+    def update(self, session_id: str, **fields: Any) -> bool:
+        conn = self._connect()
+        with conn:
+            # Take the write lock first so concurrent updates do not interleave
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+            if row is None:
+                return False
+            data = {**json.loads(row[0]), **fields}
+            cursor = conn.execute(
+                "UPDATE sessions SET data = ? WHERE id = ?",
+                (json.dumps(data), session_id),
+            )
+            return cursor.rowcount == 1
+
+    def delete(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge_expired(self) -> int:
+        """
+        Remove expired sessions.
+
+        Returns:
+            int: Number of sessions removed
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+
+def create_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    """
+    Create a session store for a backend name.
+
+    Args:
+        backend: 'memory' or 'sqlite'
+
+    Returns:
+        SessionStore: A new session store
+    """
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend != "memory":
+        print(f"Warning: unknown session backend '{backend}', using memory.")
+    return MemorySessionStore()
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """
+    Get the process-wide session store, creating it on first use.
+
+    Returns:
+        SessionStore: The configured session store
+    """
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_session_store()
+    return _store
+
+
+def set_session_store(store: SessionStore) -> None:
+    """
+    Replace the process-wide session store.
+
+    Args:
+        store: The session store to use
+    """
+    global _store
+
+    with _store_lock:
+        _store = store
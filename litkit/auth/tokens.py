@@ -0,0 +1,181 @@
+"""
+Local verification of Supabase access tokens.
+
+Access tokens are verified offline instead of calling ``auth.get_user`` on
+every rerun. Projects using the legacy shared secret verify HS256 tokens with
+``SUPABASE_JWT_SECRET``; projects using asymmetric signing keys verify against
+the project's JWKS, which is cached and refreshed in a background thread.
+Either way the audience and the issuer (the project's auth server) are checked.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+
+from .client import SUPABASE_URL, get_http_client
+
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (
+    f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None
+)
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+# Tokens must be issued by this project's auth server
+SUPABASE_JWT_ISSUER = os.getenv("SUPABASE_JWT_ISSUER") or (
+    f"{SUPABASE_URL}/auth/v1" if SUPABASE_URL else None
+)
+
+# Seconds between background JWKS refreshes
+JWKS_REFRESH_INTERVAL = float(os.getenv("SUPABASE_JWKS_REFRESH_INTERVAL", "600"))
+
+# Minimum seconds between on-demand refreshes triggered by an unknown key id
+JWKS_MIN_REFRESH_INTERVAL = 30.0
+
+# Clock skew tolerated when checking exp/nbf
+CLOCK_LEEWAY = 10
+
+
+class JWKSCache:
+    """Cached JSON Web Key Set with periodic background refresh."""
+
+    def __init__(self, url: str, refresh_interval: float = JWKS_REFRESH_INTERVAL):
+        """
+        Initialize the cache.
+
+        Args:
+            url: JWKS endpoint
+            refresh_interval: Seconds between background refreshes
+        """
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def refresh(self) -> bool:
+        """
+        Fetch the key set and replace the cached keys.
+
+        Returns:
+            bool: True if the keys were refreshed, False otherwise
+        """
+        try:
+            response = get_http_client().get(self.url)
+            response.raise_for_status()
+            keys = {}
+            for jwk in response.json().get("keys", []):
+                try:
+                    key = jwt.PyJWK(jwk)
+                except jwt.PyJWTError:
+                    continue
+                keys[jwk.get("kid", "")] = key
+        except Exception as e:
+            print(f"Error refreshing JWKS: {e}")
+            return False
+
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+        return True
+
+    def get_key(self, kid: str) -> Optional[jwt.PyJWK]:
+        """
+        Get the signing key for a key id, refreshing once if it is unknown.
+
+        Args:
+            kid: Key id from the token header
+
+        Returns:
+            Optional[jwt.PyJWK]: The matching key or None
+        """
+        self.start()
+
+        with self._lock:
+            key = self._keys.get(kid)
+            stale = time.monotonic() - self._fetched_at > JWKS_MIN_REFRESH_INTERVAL
+
+        if key is None and stale and self.refresh():
+            with self._lock:
+                key = self._keys.get(kid)
+
+        return key
+
+    def start(self) -> None:
+        """Start the background refresh thread if it is not running."""
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="litkit-jwks-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refresh thread."""
+        self._stop.set()
+
+    def _run(self) -> None:
+        """Refresh the key set until stopped."""
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_interval)
+
+
+_jwks_cache: Optional[JWKSCache] = (
+    JWKSCache(SUPABASE_JWKS_URL) if SUPABASE_JWKS_URL and not SUPABASE_JWT_SECRET else None
+)
+
+
+def verify_access_token(access_token: str) -> Optional[Dict[str, Any]]:
+    """
+    Verify a Supabase access token locally.
+
+    Args:
+        access_token: Supabase access token
+
+    Returns:
+        Optional[Dict[str, Any]]: The verified claims, or None if the token is
+        invalid, expired or cannot be verified
+    """
+    if not access_token or not SUPABASE_JWT_ISSUER:
+        return None
+
+    options = {"require": ["exp", "sub", "iss"]}
+
+    try:
+        if SUPABASE_JWT_SECRET:
+            return jwt.decode(
+                access_token,
+                SUPABASE_JWT_SECRET,
+                algorithms=["HS256"],
+                audience=SUPABASE_JWT_AUDIENCE,
+                issuer=SUPABASE_JWT_ISSUER,
+                leeway=CLOCK_LEEWAY,
+                options=options,
+            )
+
+        if _jwks_cache is None:
+            return None
+
+        header = jwt.get_unverified_header(access_token)
+        key = _jwks_cache.get_key(header.get("kid", ""))
+        if key is None:
+            return None
+
+        return jwt.decode(
+            access_token,
+            key.key,
+            algorithms=[key.algorithm_name],
+            audience=SUPABASE_JWT_AUDIENCE,
+            issuer=SUPABASE_JWT_ISSUER,
+            leeway=CLOCK_LEEWAY,
+            options=options,
+        )
+    except jwt.PyJWTError:
+        return None
@@ -0,0 +1,245 @@
+"""
+Per-user Supabase database clients.
+
+Row-level security policies such as ``auth.uid() = user_id`` only see the
+caller when queries carry the user's access token. This module keeps a bounded
+LRU cache of authenticated PostgREST clients keyed by access token, so RLS
+queries do not rebuild a client on every Streamlit rerun. Entries are dropped
+when their JWT expires or when the user signs out.
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import streamlit as st
+from postgrest import SyncPostgrestClient
+
+from .client import (
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    get_http_client,
+    get_supabase_client,
+)
+
+# Maximum number of authenticated clients kept alive at once
+USER_CLIENT_CACHE_SIZE = int(os.getenv("SUPABASE_USER_CLIENT_CACHE_SIZE", "256"))
+
+# Seconds before expiry at which a cached client is treated as expired
+EXPIRY_LEEWAY = 30
+
+# Service role key for server-side work that bypasses RLS
+SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+_lock = threading.Lock()
+_clients: "OrderedDict[str, Tuple[SyncPostgrestClient, float]]" = OrderedDict()
+
+
+def _read_claims(access_token: str) -> Dict[str, Any]:
+    """Decode a JWT payload without verifying it ({} if malformed)."""
+    try:
+        payload = access_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError, TypeError):
+        return {}
+    return claims if isinstance(claims, dict) else {}
+
+
+def get_token_expiry(access_token: str) -> float:
+    """
+    Read the ``exp`` claim from a JWT without verifying it.
+
+    Args:
+        access_token: Supabase access token
+
+    Returns:
+        float: Expiry as a Unix timestamp, or 0 if the token cannot be decoded
+    """
+    try:
+        return float(_read_claims(access_token).get("exp", 0))
+    except (ValueError, TypeError):
+        return 0.0
+
+
+_service_client: Optional[SyncPostgrestClient] = None
+
+
+def _create_user_client(
+    access_token: str,
+    api_key: Optional[str] = None
+) -> SyncPostgrestClient:
+    """
+    Create a PostgREST client that sends the user's access token.
+
+    Args:
+        access_token: Supabase access token
+        api_key: API key header (defaults to SUPABASE_KEY)
+
+    Returns:
+        SyncPostgrestClient: Client sharing the process-wide connection pool
+    """
+    # Safe to share: postgrest>=2.22 sends these headers with each request
+    # and never writes them onto the shared client (timeouts come from it too)
+    return SyncPostgrestClient(
+        f"{SUPABASE_URL}/rest/v1",
+        headers={
+            "apiKey": api_key or SUPABASE_KEY,
+            "Authorization": f"Bearer {access_token}",
+        },
+        http_client=get_http_client(),
+    )
+
+
+def get_user_client(access_token: str) -> Optional[SyncPostgrestClient]:
+    """
+    Get a cached authenticated database client for an access token.
+
+    Args:
+        access_token: Supabase access token
+
+    Returns:
+        Optional[SyncPostgrestClient]: Client for the token, or None if the
+        token is expired or Supabase is not configured
+    """
+    if not SUPABASE_URL or not SUPABASE_KEY or not access_token:
+        return None
+
+    now = time.time()
+    with _lock:
+        entry = _clients.get(access_token)
+        if entry is not None:
+            client, expires_at = entry
+            if expires_at - EXPIRY_LEEWAY > now:
+                _clients.move_to_end(access_token)
+                return client
+            del _clients[access_token]
+
+    expires_at = get_token_expiry(access_token)
+    if expires_at - EXPIRY_LEEWAY <= now:
+        return None
+
+    client = _create_user_client(access_token)
+
+    with _lock:
+        _clients[access_token] = (client, expires_at)
+        _clients.move_to_end(access_token)
+        while len(_clients) > USER_CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+
+    return client
+
+
+def evict_user_client(access_token: Optional[str]) -> None:
+    """
+    Remove the cached client for an access token (e.g. on sign out).
+
+    Args:
+        access_token: Supabase access token
+    """
+    if not access_token:
+        return
+
+    with _lock:
+        _clients.pop(access_token, None)
+
+
+def purge_expired_clients() -> int:
+    """
+    Remove every cached client whose token has expired.
+
+    Returns:
+        int: Number of clients removed
+    """
+    cutoff = time.time() + EXPIRY_LEEWAY
+    with _lock:
+        expired = [token for token, (_, exp) in _clients.items() if exp <= cutoff]
+        for token in expired:
+            del _clients[token]
+    return len(expired)
+
+
+def get_session_client() -> Any:
+    """
+    Get the database client for the current Streamlit session.
+
+    Signed-in sessions with a valid access token get their own RLS-aware
+    client; everyone else falls back to the shared anon-key client.
+
+    Returns:
+        Any: A client exposing ``table()``, or None if Supabase is not configured
+    """
+    access_token = st.session_state.get("access_token")
+    if access_token:
+        client = get_user_client(access_token)
+        if client is not None:
+            return client
+
+    return get_supabase_client()
+
+
+def get_session_claims() -> Dict[str, Any]:
+    """
+    Get the JWT claims database queries should run with for the session.
+
+    Used by the direct Postgres backend, which has no PostgREST to verify
+    the token, so the claims must be verified locally first (see tokens.py).
+
+    Returns:
+        Dict[str, Any]: The verified access token claims, or ``{"role":
+        "anon"}`` when the session has no valid token
+    """
+    # Imported here to avoid a circular import with auth.py
+    from .auth import get_verified_claims
+
+    claims = get_verified_claims()
+    if claims and claims.get("role") == "authenticated":
+        return claims
+    return {"role": "anon"}
+
+
+def get_session_identity() -> str:
+    """
+    Identify the credentials the session's database client queries with.
+
+    Rows visible under RLS depend on these, so results read by one identity
+    must not be shared with another.
+
+    Returns:
+        str: ``"user:<id>"`` when the session has a valid access token,
+        otherwise ``"anon"`` (the shared anon-key client)
+    """
+    access_token = st.session_state.get("access_token")
+    if access_token and get_user_client(access_token) is not None:
+        subject = _read_claims(access_token).get("sub")
+        if subject:
+            return f"user:{subject}"
+    return "anon"
+
+
+def get_service_client() -> Optional[SyncPostgrestClient]:
+    """
+    Get the process-wide service-role database client.
+
+    Used for server-side work that runs outside a user's script run, such as
+    background flushes. Never hand it to user-facing queries: it bypasses RLS.
+
+    Returns:
+        Optional[SyncPostgrestClient]: The client, or None if
+        SUPABASE_SERVICE_ROLE_KEY is not configured
+    """
+    global _service_client
+
+    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+        return None
+
+    if _service_client is None:
+        with _lock:
+            if _service_client is None:
+                _service_client = _create_user_client(
+                    SUPABASE_SERVICE_ROLE_KEY, SUPABASE_SERVICE_ROLE_KEY)
+    return _service_client
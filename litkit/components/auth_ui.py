@@ -4,7 +4,10 @@ Authentication UI components.
 This module provides Streamlit UI components for authentication.
 """
 
+import functools
+from typing import Any, Callable, Iterable, Mapping, Optional
 import streamlit as st
+from ..auth.authorization import is_authorized
 from ..auth.auth import (
     sign_in,
     sign_up,
@@ -162,23 +165,47 @@ def user_profile():
         st.experimental_rerun()
 
 
-def auth_required(func):
+def auth_required(
+    func: Optional[Callable] = None,
+    *,
+    roles: Optional[Iterable[str]] = None,
+    claims: Optional[Mapping[str, Any]] = None
+):
     """
     Decorator to require authentication for a function.
     Shows a login form if the user is not authenticated.
 
+    Can be used bare (``@auth_required``) or with requirements
+    (``@auth_required(roles=["admin"])``). Role and claim checks are
+    memoized per session and access token.
+
     Args:
         func: The function to wrap
+        roles: The user needs at least one of these roles (optional)
+        claims: Token claims the user must carry, e.g.
+            ``{"app_metadata.plan": "pro"}`` (optional)
 
     Returns:
         Function: The wrapped function
     """
-    def wrapper(*args, **kwargs):
-        if is_authenticated():
-            return func(*args, **kwargs)
-        else:
-            st.warning("Please log in to access this content")
-            login_form()
-            return None
-
-    return wrapper
+    required_roles = tuple(roles) if roles else None
+
+    def decorator(inner):
+        @functools.wraps(inner)
+        def wrapper(*args, **kwargs):
+            if not is_authenticated():
+                st.warning("Please log in to access this content")
+                login_form()
+                return None
+
+            if (required_roles or claims) and not is_authorized(required_roles, claims):
+                st.error("You do not have permission to access this content")
+                return None
+
+            return inner(*args, **kwargs)
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
@@ -48,9 +48,10 @@ def checkout_button(
         st.warning("Please log in to subscribe.")
         return False
 
-    # Get user email for checkout
+    # Get user email and ID for checkout
     user = get_user()
     user_email = user.get("email") if user else None
+    user_id = user.get("id") if user else None
 
     # Add custom CSS for button if color is provided
     if color:
@@ -65,26 +66,34 @@ def checkout_button(
         st.markdown(button_style, unsafe_allow_html=True)
 
     # Display the button
+    button_key = key or "stripe_checkout_button"
     button_clicked = st.button(
         text,
         type=button_type,
         on_click=on_click,
         use_container_width=use_container_width,
-        key=key or "stripe_checkout_button"
+        key=button_key
     )
 
     if button_clicked:
+        # A successful redirect leaves the page and ends this Streamlit
+        # session, so a second click here means the last checkout failed
+        redirected_key = f"{button_key}_redirected"
+
         # Create checkout session
         checkout_url = create_checkout_session(
             user_email=user_email,
+            user_id=user_id,
             success_url=success_url,
             cancel_url=cancel_url,
             price_id=price_id,
             quantity=quantity,
-            mode=mode
+            mode=mode,
+            retry=st.session_state.get(redirected_key, False)
         )
 
         if checkout_url:
+            st.session_state[redirected_key] = True
             # Redirect to checkout
             st.markdown(
                 f'<meta http-equiv="refresh" content="0;URL=\'{checkout_url}\'">', unsafe_allow_html=True)
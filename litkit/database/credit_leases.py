@@ -0,0 +1,308 @@
+"""
+Credit leases for metered features.
+
+Instead of one database write per metered action, a session reserves a block
+of credits in a single atomic call and debits from it locally. Usage is
+checkpointed periodically and the unused remainder is returned when the
+lease is settled (on exhaustion, sign out or process exit). Leases whose
+holder crashed are settled from their last checkpoint by
+``reconcile_expired_credit_leases`` (see sql/stripe/credit_leases.sql).
+
+Checkpoints and settlement report usage, so they are only granted to the
+service role: a user calling them directly could settle at zero usage and
+get their spent credits back. They run through the service-role client,
+which also keeps them working after the session's token has expired.
+"""
+
+import atexit
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import streamlit as st
+
+from . import repository as repo
+from .payments_db import invalidate_credits_cache
+from .repository import ClientNotConfiguredError, db_operation
+
+# Credits reserved per lease
+LEASE_BLOCK_SIZE = int(os.getenv("LITKIT_CREDIT_LEASE_BLOCK", "100"))
+
+# Lease lifetime in seconds, extended on every checkpoint
+LEASE_TTL = int(os.getenv("LITKIT_CREDIT_LEASE_TTL", "900"))
+
+# Checkpoint after this many local debits or seconds, whichever comes first
+CHECKPOINT_EVERY = int(os.getenv("LITKIT_CREDIT_LEASE_CHECKPOINT_EVERY", "50"))
+CHECKPOINT_INTERVAL = float(os.getenv("LITKIT_CREDIT_LEASE_CHECKPOINT_INTERVAL", "60"))
+
+# Stop debiting locally this many seconds before the lease expires
+EXPIRY_MARGIN = 30
+
+
+class CreditLease:
+    """A block of reserved credits that is debited locally."""
+
+    def __init__(
+        self,
+        lease_id: str,
+        user_id: str,
+        reserved: int,
+        ttl: float = LEASE_TTL
+    ):
+        """
+        Initialize a lease returned by ``reserve_credits``.
+
+        Args:
+            lease_id: Lease ID in the credit_leases table
+            user_id: Supabase user ID
+            reserved: Number of credits reserved
+            ttl: Seconds until the lease expires
+        """
+        self.lease_id = lease_id
+        self.user_id = user_id
+        self.reserved = reserved
+        self.used = 0
+        self.settled = False
+        self._ttl = ttl
+        self._expires_at = time.time() + ttl
+        self._checkpointed_used = 0
+        self._checkpointed_at = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        """Credits still available in this lease."""
+        return self.reserved - self.used
+
+    @property
+    def usable(self) -> bool:
+        """Whether the lease can still be debited locally."""
+        return not self.settled and time.time() < self._expires_at - EXPIRY_MARGIN
+
+    def try_debit(self, amount: int) -> bool:
+        """
+        Debit credits from the lease without touching the database.
+
+        Args:
+            amount: Number of credits to use
+
+        Returns:
+            bool: True if the lease covered the amount, False otherwise
+        """
+        with self._lock:
+            if not self.usable or amount > self.remaining:
+                return False
+            self.used += amount
+
+        if self._needs_checkpoint():
+            self.checkpoint()
+        return True
+
+    def _needs_checkpoint(self) -> bool:
+        """Check whether enough usage or time has passed since the last checkpoint."""
+        return (
+            self.used - self._checkpointed_used >= CHECKPOINT_EVERY
+            or time.time() - self._checkpointed_at >= CHECKPOINT_INTERVAL
+        )
+
+    @db_operation(False, "Error checkpointing credit lease", show_ui=False)
+    def checkpoint(self) -> bool:
+        """
+        Record current usage in the database and extend the lease.
+
+        Returns:
+            bool: True if the checkpoint was stored, False otherwise
+        """
+        used = self.used
+        stored = repo.credits.rpc("checkpoint_credit_lease", {
+            "p_lease_id": self.lease_id,
+            "p_used": used,
+            "p_ttl_seconds": int(self._ttl),
+        }, client=_service_client())
+
+        if not stored:
+            # The lease was settled or reconciled elsewhere
+            self.settled = True
+            return False
+
+        self._checkpointed_used = used
+        self._checkpointed_at = time.time()
+        self._expires_at = time.time() + self._ttl
+        return True
+
+    @db_operation(None, "Error settling credit lease", show_ui=False)
+    def settle(self) -> Optional[int]:
+        """
+        Close the lease and return unused credits to the balance.
+
+        Returns:
+            Optional[int]: New credit balance, or None if the lease was
+            already closed or on error
+        """
+        client = _service_client()
+        with self._lock:
+            if self.settled:
+                return None
+            self.settled = True
+
+        _untrack_lease(self)
+
+        balance = repo.credits.rpc("settle_credit_lease", {
+            "p_lease_id": self.lease_id,
+            "p_used": self.used,
+        }, client=client)
+
+        invalidate_credits_cache(self.user_id)
+        return None if balance is None else int(balance)
+
+
+def _service_client() -> Any:
+    """Get the service-role client that checkpoints and settles leases."""
+    client = repo.get_service_database_client()
+    if not client:
+        raise ClientNotConfiguredError(
+            "Credit leases require SUPABASE_SERVICE_ROLE_KEY.")
+    return client
+
+
+# Open leases in this process, settled at exit
+_open_leases: Dict[str, CreditLease] = {}
+_open_leases_lock = threading.Lock()
+
+
+def _track_lease(lease: CreditLease) -> None:
+    """Remember an open lease so it is settled at process exit."""
+    with _open_leases_lock:
+        _open_leases[lease.lease_id] = lease
+
+
+def _untrack_lease(lease: CreditLease) -> None:
+    """Forget a lease once it is settled."""
+    with _open_leases_lock:
+        _open_leases.pop(lease.lease_id, None)
+
+
+@db_operation(None, "Error reserving credits")
+def reserve_credit_lease(
+    user_id: str,
+    amount: int = LEASE_BLOCK_SIZE,
+    ttl: int = LEASE_TTL
+) -> Optional[CreditLease]:
+    """
+    Reserve up to ``amount`` credits in one atomic call.
+
+    Args:
+        user_id: Supabase user ID
+        amount: Maximum number of credits to reserve
+        ttl: Seconds until the lease expires unless checkpointed
+
+    Returns:
+        Optional[CreditLease]: The lease, or None if the balance is empty or
+        on error
+    """
+    # Without the service role the lease could never be settled
+    _service_client()
+    client = repo.get_database_client()
+    if not client:
+        raise ClientNotConfiguredError()
+
+    rows = repo.credits.rpc("reserve_credits", {
+        "p_user_id": user_id,
+        "p_amount": amount,
+        "p_ttl_seconds": ttl,
+    }, client=client)
+
+    invalidate_credits_cache(user_id)
+    if not rows:
+        return None
+
+    row = rows[0]
+    lease = CreditLease(row["lease_id"], user_id, row["lease_reserved"], ttl)
+    _track_lease(lease)
+    return lease
+
+
+def get_leased_credits(user_id: str) -> int:
+    """
+    Get the credits the current session has reserved but not used yet.
+
+    Args:
+        user_id: Supabase user ID
+
+    Returns:
+        int: Unused credits in the session's open lease for the user (0 if
+        there is none)
+    """
+    lease: Optional[CreditLease] = st.session_state.get("credit_lease")
+    if lease is None or lease.user_id != user_id or lease.settled:
+        return 0
+    return lease.remaining
+
+
+def use_leased_credits(
+    user_id: str,
+    amount: int = 1,
+    block_size: int = LEASE_BLOCK_SIZE
+) -> bool:
+    """
+    Use credits through the session's lease, reserving a new block as needed.
+
+    Most calls are served from memory; the database is only touched when a
+    new block is reserved or usage is checkpointed.
+
+    Args:
+        user_id: Supabase user ID
+        amount: Number of credits to use
+        block_size: Credits to reserve when a new lease is needed
+
+    Returns:
+        bool: True if the credits were used, False if the user does not have
+        enough credits
+    """
+    lease: Optional[CreditLease] = st.session_state.get("credit_lease")
+    if lease is not None and lease.user_id == user_id and lease.try_debit(amount):
+        return True
+
+    # The current lease is exhausted, expired or belongs to another user
+    if lease is not None:
+        lease.settle()
+        del st.session_state["credit_lease"]
+
+    lease = reserve_credit_lease(user_id, max(block_size, amount))
+    if lease is None:
+        return False
+
+    st.session_state["credit_lease"] = lease
+    if lease.try_debit(amount):
+        return True
+
+    # The balance could not cover the amount; give the partial block back
+    lease.settle()
+    del st.session_state["credit_lease"]
+    return False
+
+
+def settle_session_lease() -> Optional[int]:
+    """
+    Settle the current session's lease, e.g. on sign out.
+
+    Returns:
+        Optional[int]: New credit balance, or None if there was no open lease
+    """
+    lease: Optional[CreditLease] = st.session_state.pop("credit_lease", None)
+    if lease is None:
+        return None
+    return lease.settle()
+
+
+def settle_all_leases() -> None:
+    """Settle every open lease in this process (registered to run at exit)."""
+    with _open_leases_lock:
+        leases = list(_open_leases.values())
+
+    for lease in leases:
+        lease.settle()
+
+
+atexit.register(settle_all_leases)
@@ -0,0 +1,164 @@
+"""
+Typed record models for LitKit tables.
+
+Rows from ``subscriptions`` are converted into compact ``__slots__`` records
+when they are loaded, which is how they sit in the per-user subscription
+cache. Timestamps are parsed once into epoch seconds, so predicates such as
+``is_active(now)`` are plain float comparisons instead of repeated ISO string
+parsing. Subclass ``Record`` to give another table the same treatment.
+"""
+
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Type, TypeVar
+
+RecordT = TypeVar('RecordT', bound='Record')
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """
+    Parse a timestamp into epoch seconds.
+
+    Args:
+        value: ISO 8601 string (a trailing 'Z' is accepted), datetime or number
+
+    Returns:
+        Optional[float]: Epoch seconds, None if missing, or NaN if the value
+        cannot be parsed (NaN compares false with every time)
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    try:
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    except (ValueError, TypeError, AttributeError):
+        return math.nan
+
+
+def format_timestamp(value: Optional[float]) -> Optional[str]:
+    """
+    Format epoch seconds as an ISO 8601 UTC string.
+
+    Args:
+        value: Epoch seconds
+
+    Returns:
+        Optional[str]: ISO string, or None if value is None or NaN
+    """
+    if value is None or math.isnan(value):
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+
+class Record:
+    """Base class for slot-based table records."""
+
+    __slots__ = ()
+
+    # Fields holding timestamps, stored as epoch seconds
+    TIMESTAMP_FIELDS: tuple = ()
+
+    @classmethod
+    def from_row(cls: Type[RecordT], row: Dict[str, Any]) -> RecordT:
+        """
+        Build a record from a database row, parsing timestamps once.
+
+        Columns missing from the row are set to None and unknown columns
+        are ignored.
+
+        Args:
+            row: Row returned by the database
+
+        Returns:
+            Record: The record
+        """
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            value = row.get(name)
+            if name in cls.TIMESTAMP_FIELDS:
+                value = parse_timestamp(value)
+            setattr(record, name, value)
+        return record
+
+    @classmethod
+    def from_rows(cls: Type[RecordT], rows: Iterable[Dict[str, Any]]) -> List[RecordT]:
+        """
+        Build records from database rows.
+
+        Args:
+            rows: Rows returned by the database
+
+        Returns:
+            List[Record]: The records
+        """
+        return [cls.from_row(row) for row in rows]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the record back to a row dictionary.
+
+        Timestamps are formatted as ISO 8601 UTC strings.
+
+        Returns:
+            Dict[str, Any]: The row
+        """
+        row = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name in self.TIMESTAMP_FIELDS:
+                value = format_timestamp(value)
+            row[name] = value
+        return row
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class SubscriptionRecord(Record):
+    """A row of the ``subscriptions`` table."""
+
+    __slots__ = (
+        "id", "user_id", "stripe_customer_id", "stripe_subscription_id",
+        "status", "price_id", "quantity", "cancel_at_period_end",
+        "current_period_start", "current_period_end", "created_at",
+        "updated_at",
+    )
+
+    TIMESTAMP_FIELDS = (
+        "current_period_start", "current_period_end", "created_at",
+        "updated_at",
+    )
+
+    def is_active(self, now: Optional[float] = None) -> bool:
+        """
+        Check whether the subscription is active and not past its period end.
+
+        A missing period end counts as active; an unparseable one does not.
+
+        Args:
+            now: Epoch seconds to compare with (defaults to the current time)
+
+        Returns:
+            bool: True if the subscription is active
+        """
+        if self.status != "active":
+            return False
+        if self.current_period_end is None:
+            return True
+        return self.current_period_end > (time.time() if now is None else now)
+
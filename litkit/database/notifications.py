@@ -0,0 +1,221 @@
+"""
+Push-based cache invalidation through Postgres LISTEN/NOTIFY.
+
+Triggers on ``subscriptions`` and ``credits`` (see
+sql/stripe/change_notifications.sql) publish ``{"table", "op", "user_id"}``
+on a notify channel. One background listener per process holds a dedicated
+connection on that channel and calls the handlers registered for the table
+with the affected user id, so cached entitlements and balances are dropped
+as soon as a webhook or another replica writes.
+
+Enable it with ``LITKIT_CHANGE_LISTENER=true``. It connects with
+``LITKIT_DATABASE_URL``, which must be a direct or session-mode connection
+(LISTEN does not work through transaction-mode poolers). Every (re)connect
+clears all caches, since notifications sent while disconnected are lost.
+"""
+
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+from .postgres import DATABASE_URL, PSYCOPG_AVAILABLE
+
+if PSYCOPG_AVAILABLE:
+    import psycopg
+    from psycopg import sql
+
+# Start the listener when payments_db is imported
+CHANGE_LISTENER_ENABLED = os.getenv("LITKIT_CHANGE_LISTENER", "false").lower() == "true"
+
+# Channel the triggers notify on
+CHANGE_CHANNEL = os.getenv("LITKIT_CHANGE_CHANNEL", "litkit_changes")
+
+# Seconds between stop checks while waiting for notifications
+POLL_INTERVAL = 5.0
+
+# Reconnect backoff bounds in seconds
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 60.0
+
+# Called with the affected user id, or None to drop everything
+ChangeHandler = Callable[[Optional[str]], None]
+
+_handlers: Dict[str, List[ChangeHandler]] = {}
+_handlers_lock = threading.Lock()
+
+
+def register_change_handler(table: str, handler: ChangeHandler) -> None:
+    """
+    Call a handler whenever rows of a table change.
+
+    Args:
+        table: Table name, e.g. 'subscriptions'
+        handler: Called with the affected user id, or with None when changes
+            may have been missed and everything must be invalidated
+    """
+    with _handlers_lock:
+        _handlers.setdefault(table, []).append(handler)
+
+
+def _dispatch(table: Optional[str], user_id: Optional[str]) -> int:
+    """Call the handlers of one table (or of every table if None)."""
+    with _handlers_lock:
+        if table is None:
+            handlers = [h for hs in _handlers.values() for h in hs]
+        else:
+            handlers = list(_handlers.get(table, ()))
+
+    for handler in handlers:
+        try:
+            handler(user_id)
+        except Exception as e:
+            print(f"Error in change handler for {table}: {str(e)}")
+    return len(handlers)
+
+
+class ChangeListener:
+    """Background thread listening on a notify channel."""
+
+    def __init__(self, conninfo: str, channel: str = CHANGE_CHANNEL):
+        """
+        Initialize the listener (call start() to connect).
+
+        Args:
+            conninfo: Postgres connection string
+            channel: Notify channel to listen on
+        """
+        self.conninfo = conninfo
+        self.channel = channel
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._connected = False
+        self._connects = 0
+        self._received = 0
+        self._invalid = 0
+
+    def start(self) -> None:
+        """Start the listener thread if it is not running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="litkit-change-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = POLL_INTERVAL + 1) -> None:
+        """
+        Stop the listener thread.
+
+        Args:
+            timeout: Seconds to wait for the thread to exit
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        """Listen, dispatch and reconnect with backoff until stopped."""
+        delay = RECONNECT_DELAY
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as conn:
+                    conn.execute(sql.SQL("LISTEN {}").format(
+                        sql.Identifier(self.channel)))
+                    with self._lock:
+                        self._connected = True
+                        self._connects += 1
+                    # Anything cached before now may have missed a notification
+                    _dispatch(None, None)
+                    delay = RECONNECT_DELAY
+
+                    while not self._stop.is_set():
+                        for notify in conn.notifies(timeout=POLL_INTERVAL):
+                            self._handle(notify.payload)
+            except Exception as e:
+                print(f"Change listener disconnected: {str(e)}")
+
+            with self._lock:
+                self._connected = False
+            self._stop.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def _handle(self, payload: str) -> None:
+        """Parse one notification and call the table's handlers."""
+        try:
+            change = json.loads(payload)
+            table = change["table"]
+            user_id = change.get("user_id")
+        except (ValueError, KeyError, TypeError):
+            with self._lock:
+                self._invalid += 1
+            return
+
+        with self._lock:
+            self._received += 1
+        if user_id is not None:
+            _dispatch(table, str(user_id))
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get listener counters.
+
+        Returns:
+            Dict[str, object]: Connection state, connects and notifications
+            received or rejected as invalid
+        """
+        with self._lock:
+            return {
+                "connected": self._connected,
+                "connects": self._connects,
+                "received": self._received,
+                "invalid": self._invalid,
+            }
+
+
+_listener: Optional[ChangeListener] = None
+_listener_lock = threading.Lock()
+
+
+def start_change_listener(conninfo: Optional[str] = None) -> Optional[ChangeListener]:
+    """
+    Start the process-wide change listener (idempotent).
+
+    Args:
+        conninfo: Postgres connection string (defaults to LITKIT_DATABASE_URL)
+
+    Returns:
+        Optional[ChangeListener]: The listener, or None if psycopg is not
+        installed or no connection string is configured
+    """
+    global _listener
+
+    conninfo = conninfo or DATABASE_URL
+    if not PSYCOPG_AVAILABLE or not conninfo:
+        print("Warning: change listener needs psycopg and LITKIT_DATABASE_URL.")
+        return None
+
+    with _listener_lock:
+        if _listener is None:
+            _listener = ChangeListener(conninfo)
+        _listener.start()
+        return _listener
+
+
+def stop_change_listener() -> None:
+    """Stop the process-wide change listener, if running."""
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+
+
+def get_change_listener_stats() -> Optional[Dict[str, object]]:
+    """
+    Get the process-wide listener's counters.
+
+    Returns:
+        Optional[Dict[str, object]]: Counters, or None if it was never started
+    """
+    return _listener.stats() if _listener is not None else None
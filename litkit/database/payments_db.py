@@ -4,43 +4,175 @@ Payment and subscription database operations.
 This module provides functions for managing payment and subscription data in Supabase.
 """
 
-from typing import Dict, Any, Optional, List
-import streamlit as st
+import base64
+import json
+import os
+import time
+from typing import (
+    Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple, TypeVar
+)
 from datetime import datetime, timezone
-from ..auth.client import supabase_client
+from ..utils.cache import TTLCache
+from ..utils.singleflight import single_flight
+from . import repository as repo
+from .repository import ClientNotConfiguredError, db_operation
+from .models import SubscriptionRecord, parse_timestamp
+from .write_queue import WRITE_BEHIND_ENABLED, get_write_queue
+from .notifications import (
+    CHANGE_LISTENER_ENABLED,
+    register_change_handler,
+    start_change_listener,
+)
 
+T = TypeVar('T')
 
-def get_user_subscription(user_id: str) -> Optional[Dict[str, Any]]:
+# Per-user subscription cache, shared by all sessions in the process
+SUBSCRIPTION_CACHE_TTL = float(os.getenv("LITKIT_SUBSCRIPTION_CACHE_TTL", "60"))
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv("LITKIT_SUBSCRIPTION_CACHE_SIZE", "10000"))
+
+_subscription_cache = TTLCache(
+    maxsize=SUBSCRIPTION_CACHE_SIZE, ttl=SUBSCRIPTION_CACHE_TTL)
+
+# Per-user entitled plans (plan -> active_until epoch), same lifetime
+_entitlement_cache = TTLCache(
+    maxsize=SUBSCRIPTION_CACHE_SIZE, ttl=SUBSCRIPTION_CACHE_TTL)
+
+# Per-user credit balances; kept short since every debit changes them
+CREDITS_CACHE_TTL = float(os.getenv("LITKIT_CREDITS_CACHE_TTL", "5"))
+
+_credits_cache = TTLCache(maxsize=SUBSCRIPTION_CACHE_SIZE, ttl=CREDITS_CACHE_TTL)
+
+# Per-user Stripe customer IDs; the mapping never changes once written
+STRIPE_CUSTOMER_CACHE_TTL = float(os.getenv("LITKIT_STRIPE_CUSTOMER_CACHE_TTL", "3600"))
+
+_stripe_customer_cache = TTLCache(
+    maxsize=SUBSCRIPTION_CACHE_SIZE, ttl=STRIPE_CUSTOMER_CACHE_TTL)
+
+# Maximum number of ids per bulk entitlement query
+ENTITLEMENT_CHUNK_SIZE = int(os.getenv("LITKIT_ENTITLEMENT_CHUNK_SIZE", "200"))
+
+# Default number of payments per history page
+PAYMENT_PAGE_SIZE = 20
+
+
+def get_subscription_cache_stats() -> Dict[str, Any]:
     """
-    Get the subscription details for a user from the database.
+    Get hit/miss/eviction statistics for the subscription cache.
+
+    Returns:
+        Dict[str, Any]: Cache statistics
+    """
+    return _subscription_cache.stats()
+
+
+def invalidate_subscription_cache(user_id: Optional[str] = None) -> None:
+    """
+    Drop cached subscriptions for a user, or for everyone.
+
+    Args:
+        user_id: Supabase user ID (clears the whole cache if omitted)
+    """
+    if user_id is None:
+        _subscription_cache.clear()
+        _entitlement_cache.clear()
+    else:
+        _subscription_cache.invalidate(user_id)
+        _entitlement_cache.invalidate(user_id)
+
+
+def invalidate_credits_cache(user_id: Optional[str] = None) -> None:
+    """
+    Drop cached credit balances for a user, or for everyone.
+
+    Args:
+        user_id: Supabase user ID (clears the whole cache if omitted)
+    """
+    if user_id is None:
+        _credits_cache.clear()
+    else:
+        _credits_cache.invalidate(user_id)
+
+
+# Invalidate immediately when the database reports a change (see notifications.py)
+register_change_handler("subscriptions", invalidate_subscription_cache)
+register_change_handler("credits", invalidate_credits_cache)
+
+if CHANGE_LISTENER_ENABLED:
+    start_change_listener()
+
+
+def _load_cached(
+    cache: TTLCache,
+    user_id: str,
+    loader: Callable[[], T]
+) -> T:
+    """
+    Read a user's data through a per-user cache.
+
+    Only reads made with the user's own token (or, on the Postgres backend,
+    the user's own claims) are cached. Anyone else, e.g. a session whose
+    token expired and fell back to the anon key, sees an RLS-filtered,
+    usually empty result that must not be served to other sessions.
 
     Args:
+        cache: Per-user cache
         user_id: Supabase user ID
+        loader: Function querying the data
 
     Returns:
-        Optional[Dict[str, Any]]: Subscription details or None if not found
+        T: The cached or freshly loaded value
     """
-    if not supabase_client:
-        st.warning("Supabase client is not configured.")
-        return None
+    if repo.get_database_identity() != f"user:{user_id}":
+        return loader()
+    return cache.get_or_load(user_id, loader)
 
-    try:
-        # Query the subscriptions table for the user's subscription
-        response = supabase_client.table("subscriptions").select(
-            "*").eq("user_id", user_id).execute()
 
-        # Return the most recent subscription (if any)
-        subs = response.data
-        if subs and len(subs) > 0:
-            # Sort by created_at descending to get the most recent
-            return sorted(subs, key=lambda x: x.get("created_at", ""), reverse=True)[0]
+@single_flight(key=repo.identity_key)
+def _fetch_user_subscription(user_id: str) -> Optional[SubscriptionRecord]:
+    """Query the most recent subscription for a user."""
+    # Let the database pick the newest row using the
+    # (user_id, created_at DESC) index instead of fetching every row
+    row = repo.subscriptions.select() \
+        .eq("user_id", user_id) \
+        .order("created_at", desc=True) \
+        .first()
+    return SubscriptionRecord.from_row(row) if row else None
+
 
-        return None
-    except Exception as e:
-        st.error(f"Error fetching subscription: {str(e)}")
-        return None
+@db_operation(None, "Error fetching subscription")
+def get_user_subscription_record(user_id: str) -> Optional[SubscriptionRecord]:
+    """
+    Get a user's latest subscription as a record with parsed timestamps.
 
+    Results (including "no subscription") read with the user's own token are
+    cached per user for SUBSCRIPTION_CACHE_TTL seconds and invalidated by
+    subscription writes.
 
+    Args:
+        user_id: Supabase user ID
+
+    Returns:
+        Optional[SubscriptionRecord]: The subscription or None if not found
+    """
+    return _load_cached(
+        _subscription_cache, user_id, lambda: _fetch_user_subscription(user_id))
+
+
+def get_user_subscription(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the subscription details for a user from the database.
+
+    Args:
+        user_id: Supabase user ID
+
+    Returns:
+        Optional[Dict[str, Any]]: Subscription details or None if not found
+    """
+    record = get_user_subscription_record(user_id)
+    return record.to_dict() if record else None
+
+
+@db_operation(None, "Error creating subscription")
 def create_subscription(
     user_id: str,
     stripe_customer_id: str,
@@ -65,40 +197,30 @@ def create_subscription(
     Returns:
         Optional[Dict[str, Any]]: Created subscription record or None on error
     """
-    if not supabase_client:
-        st.warning("Supabase client is not configured.")
-        return None
-
-    try:
-        # Format dates as ISO strings
-        period_start = current_period_start.isoformat()
-        period_end = current_period_end.isoformat()
-
-        # Create the subscription record
-        data = {
-            "user_id": user_id,
-            "stripe_customer_id": stripe_customer_id,
-            "stripe_subscription_id": stripe_subscription_id,
-            "status": status,
-            "price_id": price_id,
-            "current_period_start": period_start,
-            "current_period_end": period_end,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
-
-        response = supabase_client.table(
-            "subscriptions").insert(data).execute()
-
-        if response.data and len(response.data) > 0:
-            return response.data[0]
-
-        return None
-    except Exception as e:
-        st.error(f"Error creating subscription: {str(e)}")
-        return None
-
-
+    # Format dates as ISO strings
+    period_start = current_period_start.isoformat()
+    period_end = current_period_end.isoformat()
+
+    # Create the subscription record
+    data = {
+        "user_id": user_id,
+        "stripe_customer_id": stripe_customer_id,
+        "stripe_subscription_id": stripe_subscription_id,
+        "status": status,
+        "price_id": price_id,
+        "current_period_start": period_start,
+        "current_period_end": period_end,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+    rows = repo.subscriptions.insert(data).execute()
+    invalidate_subscription_cache(user_id)
+
+    return rows[0] if rows else None
+
+
+@db_operation(False, "Error updating subscription")
 def update_subscription_status(
     subscription_id: str,
     status: str,
@@ -115,31 +237,25 @@ def update_subscription_status(
     Returns:
         bool: True if update was successful, False otherwise
     """
-    if not supabase_client:
-        st.warning("Supabase client is not configured.")
-        return False
+    # Prepare the update data
+    data = {
+        "status": status,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
 
-    try:
-        # Prepare the update data
-        data = {
-            "status": status,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
-
-        # Add current_period_end if provided
-        if current_period_end:
-            data["current_period_end"] = current_period_end.isoformat()
-
-        # Update the subscription
-        response = supabase_client.table("subscriptions") \
-            .update(data) \
-            .eq("stripe_subscription_id", subscription_id) \
-            .execute()
-
-        return len(response.data) > 0
-    except Exception as e:
-        st.error(f"Error updating subscription: {str(e)}")
-        return False
+    # Add current_period_end if provided
+    if current_period_end:
+        data["current_period_end"] = current_period_end.isoformat()
+
+    # Update the subscription
+    rows = repo.subscriptions.update(data) \
+        .eq("stripe_subscription_id", subscription_id) \
+        .execute()
+
+    for row in rows:
+        invalidate_subscription_cache(row.get("user_id"))
+
+    return len(rows) > 0
 
 
 def cancel_subscription(subscription_id: str) -> bool:
@@ -155,36 +271,158 @@ def cancel_subscription(subscription_id: str) -> bool:
     return update_subscription_status(subscription_id, "canceled")
 
 
-def has_active_subscription(user_id: str) -> bool:
+@single_flight(key=repo.identity_key)
+def _fetch_stripe_customer_id(user_id: str) -> Optional[str]:
+    """Query the Stripe customer mapped to a user."""
+    row = repo.stripe_customers.select("stripe_customer_id") \
+        .eq("user_id", user_id) \
+        .first()
+    return row["stripe_customer_id"] if row else None
+
+
+@db_operation(None, "Error fetching Stripe customer")
+def get_stripe_customer_id(user_id: str) -> Optional[str]:
     """
-    Check if a user has an active subscription.
+    Get the Stripe customer mapped to a user.
+
+    Found customers are cached per user for STRIPE_CUSTOMER_CACHE_TTL
+    seconds; misses are not cached, since a customer is usually saved next.
 
     Args:
         user_id: Supabase user ID
 
     Returns:
-        bool: True if the user has an active subscription, False otherwise
+        Optional[str]: Stripe customer ID or None if the user has none yet
     """
-    subscription = get_user_subscription(user_id)
-    if not subscription:
-        return False
+    customer_id = _stripe_customer_cache.get(user_id)
+    if customer_id is None:
+        customer_id = _fetch_stripe_customer_id(user_id)
+        if customer_id is not None:
+            _stripe_customer_cache.set(user_id, customer_id)
+    return customer_id
+
 
-    # Check if status is active
-    if subscription.get("status") != "active":
+@db_operation(None, "Error saving Stripe customer")
+def save_stripe_customer_id(user_id: str, stripe_customer_id: str) -> Optional[str]:
+    """
+    Map a user to a Stripe customer unless they already have one.
+
+    Only the service role may write the mapping (see
+    sql/stripe/stripe_customers.sql), since a user who could insert it would
+    be able to claim another customer's Stripe account, so this always uses
+    the service-role client.
+
+    Args:
+        user_id: Supabase user ID
+        stripe_customer_id: Stripe customer ID
+
+    Returns:
+        Optional[str]: The user's customer ID after the write (the existing
+        one if another request mapped the user first), or None on error
+    """
+    client = repo.get_service_database_client()
+    if not client:
+        raise ClientNotConfiguredError(
+            "Saving a Stripe customer requires SUPABASE_SERVICE_ROLE_KEY.")
+
+    repo.stripe_customers.upsert(
+        {"user_id": user_id, "stripe_customer_id": stripe_customer_id},
+        on_conflict="user_id",
+        ignore_duplicates=True,
+    ).execute(client)
+
+    # Read back the winner so concurrent requests agree on one customer
+    rows = repo.stripe_customers.select("stripe_customer_id") \
+        .eq("user_id", user_id) \
+        .limit(1) \
+        .execute(client)
+    customer_id = rows[0]["stripe_customer_id"] if rows else None
+    if customer_id is not None:
+        _stripe_customer_cache.set(user_id, customer_id)
+    return customer_id
+
+
+def _fetch_entitlements(user_id: str) -> Dict[str, Optional[float]]:
+    """Query the plans a user is entitled to, with their end times."""
+    rows = repo.entitlements.select().eq("user_id", user_id).execute()
+    return {row["plan"]: parse_timestamp(row["active_until"]) for row in rows}
+
+
+@db_operation(False, "Error checking entitlement")
+def is_entitled(user_id: str, plan: Optional[str] = None) -> bool:
+    """
+    Check if a user is currently entitled to a plan.
+
+    Reads the ``entitlements`` view (see sql/stripe/entitlements_view.sql),
+    which is a single partial-index lookup. Results are cached per user like
+    subscriptions and re-checked against the period end on every call.
+
+    Args:
+        user_id: Supabase user ID
+        plan: Stripe price ID of the plan (any plan if omitted)
+
+    Returns:
+        bool: True if the user is entitled, False otherwise
+    """
+    plans = _load_cached(
+        _entitlement_cache, user_id, lambda: _fetch_entitlements(user_id))
+
+    if plan is None:
+        ends = plans.values()
+    elif plan in plans:
+        ends = [plans[plan]]
+    else:
         return False
 
-    # Check if subscription has expired
-    current_period_end = subscription.get("current_period_end")
-    if current_period_end:
-        try:
-            end_date = datetime.fromisoformat(
-                current_period_end.replace("Z", "+00:00"))
-            return end_date > datetime.now(timezone.utc)
-        except (ValueError, TypeError):
-            # If we can't parse the date, assume it's not active
-            return False
+    now = time.time()
+    return any(end is None or end > now for end in ends)
+
+
+@db_operation(frozenset(), "Error checking entitlements")
+def get_entitled_users(
+    user_ids: Iterable[str],
+    plan: Optional[str] = None,
+    chunk_size: int = ENTITLEMENT_CHUNK_SIZE
+) -> FrozenSet[str]:
+    """
+    Find which of many users are entitled to a plan (admin and batch jobs).
 
-    return True
+    Args:
+        user_ids: Supabase user IDs (duplicates are ignored)
+        plan: Stripe price ID of the plan (any plan if omitted)
+        chunk_size: Maximum number of ids per request
+
+    Returns:
+        FrozenSet[str]: IDs of the entitled users
+    """
+    ids = list(dict.fromkeys(user_ids))
+    entitled = set()
+
+    for start in range(0, len(ids), chunk_size):
+        query = repo.entitlements.select(("user_id",)) \
+            .in_("user_id", ids[start:start + chunk_size])
+        if plan is not None:
+            query = query.eq("plan", plan)
+        entitled.update(row["user_id"] for row in query.execute())
+
+    return frozenset(entitled)
+
+
+def has_active_subscription(user_id: str) -> bool:
+    """
+    Check if a user has an active subscription.
+
+    Only the user's latest subscription counts: it must be active and not
+    past its period end. Use is_entitled() to accept any active subscription.
+
+    Args:
+        user_id: Supabase user ID
+
+    Returns:
+        bool: True if the user has an active subscription, False otherwise
+    """
+    record = get_user_subscription_record(user_id)
+    return record is not None and record.is_active()
 
 
 # Credit system functions (if using a credit-based model)
@@ -193,44 +431,73 @@ def get_user_credits(user_id: str) -> int:
     """
     Get the current credit balance for a user.
 
+    Includes the unused part of the session's credit lease (see
+    credit_leases.py), which the database has already moved out of the
+    stored balance. Leases held by the user's other sessions are not
+    included until they are settled.
+
     Args:
         user_id: Supabase user ID
 
     Returns:
         int: Number of credits available, or 0 if error or no credits
     """
-    if not supabase_client:
-        st.warning("Supabase client is not configured.")
-        return 0
+    # Imported here to avoid a circular import with credit_leases.py
+    from .credit_leases import get_leased_credits
+
+    return get_stored_credits(user_id) + get_leased_credits(user_id)
+
+
+@db_operation(0, "Error getting credits")
+def get_stored_credits(user_id: str) -> int:
+    """
+    Get the credit balance stored in the database for a user.
+
+    Balances read with the user's own token are cached per user for
+    CREDITS_CACHE_TTL seconds and invalidated by credit writes.
+
+    Args:
+        user_id: Supabase user ID
+
+    Returns:
+        int: Number of credits in the credits table, or 0 if error or no credits
+    """
+    return _load_cached(
+        _credits_cache, user_id, lambda: _fetch_user_credits(user_id))
 
-    try:
-        # Query the credits table for the user
-        response = supabase_client.table("credits").select(
-            "amount").eq("user_id", user_id).execute()
 
-        credits = response.data
-        if credits and len(credits) > 0:
-            return credits[0].get("amount", 0)
+@single_flight(key=repo.identity_key)
+def _fetch_user_credits(user_id: str) -> int:
+    """Query a user's balance, creating an empty credits row if needed."""
+    # Query the credits table for the user
+    row = repo.credits.select("balance").eq("user_id", user_id).first()
+    if row:
+        return row.get("amount", 0)
 
-        # If no record exists, create one with 0 credits
-        create_data = {
-            "user_id": user_id,
-            "amount": 0,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
-        supabase_client.table("credits").insert(create_data).execute()
+    # If no record exists, create one with 0 credits
+    create_data = {
+        "user_id": user_id,
+        "amount": 0,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+    # Ignore the conflict if a concurrent request created the row first
+    repo.credits.upsert(
+        create_data, on_conflict="user_id", ignore_duplicates=True).execute()
 
-        return 0
-    except Exception as e:
-        st.error(f"Error getting credits: {str(e)}")
-        return 0
+    return 0
 
 
+@db_operation(-1, "Error adding credits")
 def add_credits(user_id: str, amount: int) -> int:
     """
     Add credits to a user's account.
 
+    Runs the atomic ``add_credits`` database function (see
+    sql/stripe/credits_functions.sql) in a single round trip. The function is
+    only granted to the service role, since users must not be able to grant
+    themselves credits, so this always uses the service-role client.
+
     Args:
         user_id: Supabase user ID
         amount: Number of credits to add
@@ -238,35 +505,40 @@ def add_credits(user_id: str, amount: int) -> int:
     Returns:
         int: New credit balance, or -1 on error
     """
-    if not supabase_client:
-        st.warning("Supabase client is not configured.")
-        return -1
+    client = repo.get_service_database_client()
+    if not client:
+        raise ClientNotConfiguredError(
+            "Adding credits requires SUPABASE_SERVICE_ROLE_KEY.")
 
-    try:
-        # Get current credits
-        current_credits = get_user_credits(user_id)
+    balance = repo.credits.rpc(
+        "add_credits", {"p_user_id": user_id, "p_amount": amount}, client=client)
+    _credits_cache.invalidate(user_id)
 
-        # Calculate new amount
-        new_amount = current_credits + amount
+    return -1 if balance is None else int(balance)
 
-        # Update the credits record
-        data = {
-            "amount": new_amount,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
 
-        response = supabase_client.table("credits") \
-            .update(data) \
-            .eq("user_id", user_id) \
-            .execute()
+@db_operation(None, "Error using credits")
+def debit_credits(user_id: str, amount: int) -> Optional[int]:
+    """
+    Atomically use credits from a user's account if they have enough.
 
-        if response.data and len(response.data) > 0:
-            return response.data[0].get("amount", 0)
+    The balance check and the debit happen in one statement inside the
+    ``use_credits`` database function, so concurrent debits cannot overdraw
+    the balance or lose updates.
 
-        return -1
-    except Exception as e:
-        st.error(f"Error adding credits: {str(e)}")
-        return -1
+    Args:
+        user_id: Supabase user ID
+        amount: Number of credits to use
+
+    Returns:
+        Optional[int]: New credit balance, or None if the user does not have
+        enough credits or on error
+    """
+    balance = repo.credits.rpc(
+        "use_credits", {"p_user_id": user_id, "p_amount": amount})
+    _credits_cache.invalidate(user_id)
+
+    return None if balance is None else int(balance)
 
 
 def use_credits(user_id: str, amount: int) -> bool:
@@ -280,45 +552,18 @@ def use_credits(user_id: str, amount: int) -> bool:
     Returns:
         bool: True if credits were successfully used, False otherwise
     """
-    if not supabase_client:
-        st.warning("Supabase client is not configured.")
-        return False
-
-    try:
-        # Get current credits
-        current_credits = get_user_credits(user_id)
-
-        # Check if user has enough credits
-        if current_credits < amount:
-            return False
-
-        # Calculate new amount
-        new_amount = current_credits - amount
-
-        # Update the credits record
-        data = {
-            "amount": new_amount,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
-
-        response = supabase_client.table("credits") \
-            .update(data) \
-            .eq("user_id", user_id) \
-            .execute()
-
-        return len(response.data) > 0
-    except Exception as e:
-        st.error(f"Error using credits: {str(e)}")
-        return False
+    return debit_credits(user_id, amount) is not None
 
 
+@db_operation(None, "Error creating payment record")
 def create_payment_record(
     user_id: str,
     stripe_checkout_id: str,
     amount: int,
     currency: str,
     status: str,
-    payment_type: str = "one-time"
+    payment_type: str = "one-time",
+    defer: Optional[bool] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Create a payment record in the database.
@@ -330,32 +575,101 @@ def create_payment_record(
         currency: Currency code (e.g., "usd")
         status: Payment status (e.g., "succeeded", "failed")
         payment_type: Type of payment ("one-time" or "subscription")
+        defer: Queue the insert on the write-behind queue instead of waiting
+            for it (defaults to LITKIT_WRITE_BEHIND)
 
     Returns:
-        Optional[Dict[str, Any]]: Created payment record or None on error
+        Optional[Dict[str, Any]]: Created (or queued) payment record or None
+        on error
     """
-    if not supabase_client:
-        st.warning("Supabase client is not configured.")
-        return None
+    # Create the payment record
+    data = {
+        "user_id": user_id,
+        "stripe_checkout_id": stripe_checkout_id,
+        "amount": amount,
+        "currency": currency,
+        "status": status,
+        "payment_type": payment_type,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+
+    if defer is None:
+        defer = WRITE_BEHIND_ENABLED
+    if defer:
+        return get_write_queue(repo.payments).enqueue(data)
+
+    rows = repo.payments.insert(data).execute()
+
+    return rows[0] if rows else None
 
+
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    """Encode the position of a payment row as an opaque cursor."""
+    position = json.dumps([row["created_at"], row["id"]])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor produced by _encode_cursor."""
     try:
-        # Create the payment record
-        data = {
-            "user_id": user_id,
-            "stripe_checkout_id": stripe_checkout_id,
-            "amount": amount,
-            "currency": currency,
-            "status": status,
-            "payment_type": payment_type,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-
-        response = supabase_client.table("payments").insert(data).execute()
-
-        if response.data and len(response.data) > 0:
-            return response.data[0]
-
-        return None
-    except Exception as e:
-        st.error(f"Error creating payment record: {str(e)}")
-        return None
+        created_at, payment_id = json.loads(base64.urlsafe_b64decode(cursor))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid payment history cursor") from e
+    return created_at, payment_id
+
+
+@db_operation(([], None), "Error listing payments")
+def list_payments(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = PAYMENT_PAGE_SIZE
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Get one page of a user's payment history, newest first.
+
+    Pages use keyset pagination on ``(created_at, id)``, so each page is an
+    index range scan however far back the user pages.
+
+    Args:
+        user_id: Supabase user ID
+        cursor: Cursor returned with the previous page (None for the first page)
+        limit: Maximum number of payments per page
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: The payments and the cursor
+        of the next page, or None if this is the last page
+    """
+    query = repo.payments.select().eq("user_id", user_id)
+    if cursor:
+        query = query.before(("created_at", "id"), _decode_cursor(cursor))
+
+    # Fetch one extra row to learn whether another page follows
+    rows = query.order("created_at", desc=True) \
+        .order("id", desc=True) \
+        .limit(limit + 1) \
+        .execute()
+
+    if len(rows) > limit:
+        return rows[:limit], _encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+@db_operation([], "Error getting payment summary")
+def payment_summary(user_id: str) -> List[Dict[str, Any]]:
+    """
+    Get a user's payment totals per currency and status.
+
+    Runs the ``payment_summary`` database function (see
+    sql/stripe/payments_history.sql), so only the aggregates leave the
+    database.
+
+    Args:
+        user_id: Supabase user ID
+
+    Returns:
+        List[Dict[str, Any]]: Rows with currency, status, payment_count and
+        total_amount (in cents)
+    """
+    rows = repo.payments.rpc(
+        "payment_summary", {"p_user_id": user_id}, idempotent=True)
+    return rows or []
@@ -0,0 +1,446 @@
+"""
+Direct Postgres backend for the repository layer.
+
+Queries built with ``litkit.database.repository`` are normally sent to
+PostgREST over HTTP. With ``LITKIT_DB_BACKEND=postgres`` they are compiled to
+SQL instead and run over a psycopg connection pool, using server-side
+prepared statements and skipping the HTTP hop and JSON encoding.
+
+The pool connects with ``LITKIT_DATABASE_URL`` (the project's direct or
+session-mode pooler connection string). Server-side work runs on the
+backend itself as the service role. Queries made for a user go through a
+``PostgresRoleClient``, which runs each statement in a transaction that
+switches to the ``authenticated`` (or ``anon``) role and sets
+``request.jwt.claims`` to the caller's verified claims, exactly as PostgREST
+does, so row level security and ``auth.uid()`` apply.
+"""
+
+import json
+import os
+import threading
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+# Try to import psycopg, with graceful fallback if not installed
+try:
+    import psycopg
+    from psycopg import sql
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+    PSYCOPG_AVAILABLE = True
+    TRANSACTION_OPEN = (psycopg.pq.TransactionStatus.INTRANS,
+                        psycopg.pq.TransactionStatus.INERROR)
+    # Errors caused by the statement rather than the database's health
+    REQUEST_ERRORS = (
+        psycopg.DataError, psycopg.IntegrityError, psycopg.ProgrammingError)
+except ImportError:
+    PSYCOPG_AVAILABLE = False
+    sql = None
+    dict_row = None
+    ConnectionPool = None
+    TRANSACTION_OPEN = ()
+    REQUEST_ERRORS = ()
+
+if TYPE_CHECKING:
+    from .repository import Query
+
+# Connection string for direct database access
+DATABASE_URL = os.getenv("LITKIT_DATABASE_URL")
+
+# Connection pool size and timeouts
+PG_POOL_MIN_SIZE = int(os.getenv("LITKIT_PG_POOL_MIN_SIZE", "1"))
+PG_POOL_MAX_SIZE = int(os.getenv("LITKIT_PG_POOL_MAX_SIZE", "10"))
+PG_POOL_TIMEOUT = float(os.getenv("LITKIT_PG_POOL_TIMEOUT", "5"))
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("LITKIT_PG_STATEMENT_TIMEOUT_MS", "10000"))
+
+# Executions of a statement before it is prepared server-side; "none"
+# disables prepared statements (needed behind transaction-mode poolers)
+_prepare_threshold = os.getenv("LITKIT_PG_PREPARE_THRESHOLD", "0").lower()
+PG_PREPARE_THRESHOLD = None if _prepare_threshold == "none" else int(_prepare_threshold)
+
+# JWT claims set on every connection so auth.role() sees the service role
+SERVICE_ROLE_CLAIMS = json.dumps({"role": "service_role"})
+
+# Database roles a PostgresRoleClient may switch to (PostgREST's API roles)
+API_ROLES = ("anon", "authenticated")
+
+# SQL operators for the repository filter operators
+_OPERATORS = {
+    "eq": "=",
+    "neq": "<>",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+
+
+def _json_value(value: Any) -> Any:
+    """Convert a database value to what PostgREST would have returned."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def _json_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert every value of a row with _json_value."""
+    return {key: _json_value(value) for key, value in row.items()}
+
+
+def _where_clause(query: "Query") -> Tuple[Any, List[Any]]:
+    """Compile the filters and keyset position of a query."""
+    conditions = []
+    params: List[Any] = []
+
+    for condition in query.filters:
+        column = sql.Identifier(condition.column)
+        if condition.op == "in":
+            conditions.append(sql.SQL("{} = ANY(%s)").format(column))
+            params.append(list(condition.value))
+        elif condition.op == "is":
+            keyword = {None: "NULL", True: "TRUE", False: "FALSE"}[condition.value]
+            conditions.append(sql.SQL("{} IS " + keyword).format(column))
+        else:
+            conditions.append(sql.SQL("{} " + _OPERATORS[condition.op] + " %s")
+                              .format(column))
+            params.append(condition.value)
+
+    if query.keyset is not None:
+        columns, values, descending = query.keyset
+        conditions.append(sql.SQL("({}) " + ("<" if descending else ">") + " ({})").format(
+            sql.SQL(", ").join(sql.Identifier(c) for c in columns),
+            sql.SQL(", ").join(sql.Placeholder() for _ in values),
+        ))
+        params.extend(values)
+
+    if not conditions:
+        return sql.SQL(""), params
+    return sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions), params
+
+
+def _values_clause(rows: List[Dict[str, Any]]) -> Tuple[Any, Any, List[Any]]:
+    """Compile the column list and VALUES rows of an insert."""
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    params: List[Any] = []
+    tuples = []
+    for row in rows:
+        items = []
+        for column in columns:
+            if column in row:
+                items.append(sql.Placeholder())
+                params.append(row[column])
+            else:
+                items.append(sql.SQL("DEFAULT"))
+        tuples.append(sql.SQL("({})").format(sql.SQL(", ").join(items)))
+
+    column_list = sql.SQL(", ").join(sql.Identifier(c) for c in columns)
+    return column_list, sql.SQL(", ").join(tuples), params
+
+
+def compile_query(query: "Query") -> Tuple[Any, List[Any]]:
+    """
+    Compile a repository query to SQL.
+
+    Every value is passed as a parameter, so the statement text is the same
+    across calls and can be prepared once per connection.
+
+    Args:
+        query: Query to compile
+
+    Returns:
+        Tuple[Composed, List[Any]]: SQL statement and its parameters
+    """
+    table = sql.Identifier(query.table)
+
+    if query.action == "select":
+        if query.columns:
+            columns = sql.SQL(", ").join(sql.Identifier(c) for c in query.columns)
+        else:
+            columns = sql.SQL("*")
+        where, params = _where_clause(query)
+        statement = sql.SQL("SELECT {} FROM {}").format(columns, table) + where
+
+        if query.ordering:
+            statement += sql.SQL(" ORDER BY ") + sql.SQL(", ").join(
+                sql.SQL("{} " + ("DESC" if desc else "ASC")).format(
+                    sql.Identifier(column))
+                for column, desc in query.ordering
+            )
+        if query.row_limit is not None:
+            statement += sql.SQL(" LIMIT %s")
+            params.append(query.row_limit)
+        return statement, params
+
+    if query.action in ("insert", "upsert"):
+        rows = query.payload if isinstance(query.payload, list) else [query.payload]
+        column_list, values, params = _values_clause(rows)
+        statement = sql.SQL("INSERT INTO {} ({}) VALUES {}").format(
+            table, column_list, values)
+
+        if query.action == "upsert":
+            target = [c.strip() for c in (query.on_conflict or "id").split(",")]
+            statement += sql.SQL(" ON CONFLICT ({})").format(
+                sql.SQL(", ").join(sql.Identifier(c) for c in target))
+            updates = [
+                sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c))
+                for c in dict.fromkeys(key for row in rows for key in row)
+                if c not in target
+            ]
+            if query.ignore_duplicates or not updates:
+                statement += sql.SQL(" DO NOTHING")
+            else:
+                statement += sql.SQL(" DO UPDATE SET ") + sql.SQL(", ").join(updates)
+        return statement + sql.SQL(" RETURNING *"), params
+
+    if query.action == "update":
+        assignments = sql.SQL(", ").join(
+            sql.SQL("{} = %s").format(sql.Identifier(c)) for c in query.payload)
+        where, params = _where_clause(query)
+        statement = sql.SQL("UPDATE {} SET {}").format(table, assignments) + where
+        return statement + sql.SQL(" RETURNING *"), list(query.payload.values()) + params
+
+    if query.action == "delete":
+        where, params = _where_clause(query)
+        statement = sql.SQL("DELETE FROM {}").format(table) + where
+        return statement + sql.SQL(" RETURNING *"), params
+
+    raise ValueError(f"Unsupported action: {query.action}")
+
+
+class PostgresBackend:
+    """Runs repository queries over a psycopg connection pool."""
+
+    def __init__(self, conninfo: str):
+        """
+        Initialize the backend and open its connection pool.
+
+        Args:
+            conninfo: Postgres connection string
+        """
+        self.pool = ConnectionPool(
+            conninfo,
+            min_size=PG_POOL_MIN_SIZE,
+            max_size=PG_POOL_MAX_SIZE,
+            timeout=PG_POOL_TIMEOUT,
+            kwargs={
+                "autocommit": True,
+                "row_factory": dict_row,
+                "prepare_threshold": PG_PREPARE_THRESHOLD,
+            },
+            configure=self._configure,
+            name="litkit",
+            open=True,
+        )
+
+    @staticmethod
+    def _configure(conn: Any) -> None:
+        """Set session settings on every new connection."""
+        conn.execute(
+            "SELECT set_config('request.jwt.claims', %s, false),"
+            " set_config('request.jwt.claim.role', 'service_role', false),"
+            " set_config('statement_timeout', %s, false)",
+            (SERVICE_ROLE_CLAIMS, str(PG_STATEMENT_TIMEOUT_MS)),
+        )
+
+    def _fetch(
+        self,
+        statement: Any,
+        params: List[Any],
+        claims: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run one statement, as the service role or as an API role.
+
+        Args:
+            statement: SQL statement
+            params: Statement parameters
+            claims: Verified JWT claims to run with (None for the service role)
+
+        Returns:
+            List[Dict[str, Any]]: Rows returned by the statement
+        """
+        with self.pool.connection() as conn:
+            if claims is None:
+                return conn.execute(statement, params).fetchall()
+
+            role = claims.get("role")
+            if role not in API_ROLES:
+                raise ValueError(f"Refusing to run as database role {role!r}")
+
+            # Transaction-local settings, so nothing leaks to the next user
+            # of the pooled connection. Plain BEGIN/COMMIT in one pipeline
+            # cost a single round trip; conn.transaction() adds a sync per
+            # step and took about four.
+            error = None
+            try:
+                with conn.pipeline():
+                    try:
+                        conn.execute("BEGIN")
+                        conn.execute(
+                            "SELECT set_config('role', %s, true),"
+                            " set_config('request.jwt.claims', %s, true)",
+                            (role, json.dumps(claims)),
+                        )
+                        cursor = conn.execute(statement, params)
+                        conn.execute("COMMIT")
+                    except psycopg.Error as e:
+                        # Let the pipeline sync first; raising out of it
+                        # makes psycopg log the aborted pipeline
+                        error = e
+            except psycopg.Error as e:
+                error = error or e
+            if error is not None:
+                # A failed statement skips the COMMIT; end the transaction
+                # before the connection goes back to the pool
+                if conn.info.transaction_status in TRANSACTION_OPEN:
+                    conn.rollback()
+                raise error
+            return cursor.fetchall()
+
+    def execute(
+        self,
+        query: "Query",
+        claims: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a repository query.
+
+        Args:
+            query: Query to run
+            claims: Verified JWT claims to run with (None for the service role)
+
+        Returns:
+            List[Dict[str, Any]]: Rows, with values converted as PostgREST would
+        """
+        statement, params = compile_query(query)
+        rows = self._fetch(statement, params, claims)
+        return [_json_row(row) for row in rows]
+
+    def rpc(
+        self,
+        function: str,
+        params: Dict[str, Any],
+        claims: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        """
+        Call a database function with named arguments.
+
+        Mirrors PostgREST: scalar functions return their value, functions
+        returning rows return a list of rows.
+
+        Args:
+            function: Function name
+            params: Named arguments
+            claims: Verified JWT claims to run with (None for the service role)
+
+        Returns:
+            Any: The function's result
+        """
+        arguments = sql.SQL(", ").join(
+            sql.SQL("{} => %s").format(sql.Identifier(name)) for name in params)
+        statement = sql.SQL("SELECT * FROM {}({})").format(
+            sql.Identifier(function), arguments)
+
+        rows = self._fetch(statement, list(params.values()), claims)
+
+        if len(rows) == 1 and list(rows[0]) == [function]:
+            return _json_value(rows[0][function])
+        return [_json_row(row) for row in rows]
+
+    def as_role(self, claims: Dict[str, Any]) -> "PostgresRoleClient":
+        """
+        Get a client that runs queries with a caller's JWT claims.
+
+        Args:
+            claims: Verified JWT claims; ``role`` must be one of API_ROLES
+
+        Returns:
+            PostgresRoleClient: Client sharing this backend's pool
+        """
+        return PostgresRoleClient(self, claims)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get connection pool statistics.
+
+        Returns:
+            Dict[str, Any]: psycopg_pool counters
+        """
+        return dict(self.pool.get_stats())
+
+    def close(self) -> None:
+        """Close the connection pool."""
+        self.pool.close()
+
+
+class PostgresRoleClient:
+    """Runs repository queries on a backend as an API role, under RLS."""
+
+    __slots__ = ("backend", "claims")
+
+    def __init__(self, backend: PostgresBackend, claims: Dict[str, Any]):
+        """
+        Initialize the client.
+
+        Args:
+            backend: Backend whose pool runs the queries
+            claims: Verified JWT claims; ``role`` must be one of API_ROLES
+        """
+        self.backend = backend
+        self.claims = claims
+
+    def execute(self, query: "Query") -> List[Dict[str, Any]]:
+        """Run a repository query with this client's claims."""
+        return self.backend.execute(query, self.claims)
+
+    def rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        """Call a database function with this client's claims."""
+        return self.backend.rpc(function, params, self.claims)
+
+
+# Either kind of client runs queries over the Postgres pool
+POSTGRES_CLIENTS = (PostgresBackend, PostgresRoleClient)
+
+_backend: Optional[PostgresBackend] = None
+_backend_lock = threading.Lock()
+_backend_unavailable = False
+
+
+def get_postgres_backend() -> Optional[PostgresBackend]:
+    """
+    Get the process-wide Postgres backend, opening its pool on first use.
+
+    Returns:
+        Optional[PostgresBackend]: The backend, or None if psycopg is not
+        installed or LITKIT_DATABASE_URL is not set
+    """
+    global _backend, _backend_unavailable
+
+    if _backend is not None or _backend_unavailable:
+        return _backend
+
+    if not PSYCOPG_AVAILABLE or not DATABASE_URL:
+        # Warn once, then keep using PostgREST
+        reason = "psycopg is not installed" if not PSYCOPG_AVAILABLE \
+            else "LITKIT_DATABASE_URL is not set"
+        print(f"Warning: {reason}, using PostgREST.")
+        _backend_unavailable = True
+        return None
+
+    with _backend_lock:
+        if _backend is None:
+            _backend = PostgresBackend(DATABASE_URL)
+    return _backend
+
+
+def close_postgres_backend() -> None:
+    """Close the process-wide backend's pool, if it was opened."""
+    global _backend
+
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
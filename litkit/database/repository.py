@@ -0,0 +1,725 @@
+"""
+Repository layer for LitKit tables.
+
+Each repository declares the columns of its table and named column sets, and
+builds queries through a small composable builder with typed filters and
+ordering. Queries are plain descriptions that an executor turns into a
+PostgREST request, or into SQL for the direct Postgres backend selected with
+``LITKIT_DB_BACKEND=postgres``, so callers fetch only the columns they need and
+every round trip is counted per repository.
+"""
+
+import functools
+import os
+import threading
+from typing import (
+    Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple, TypeVar,
+    Union
+)
+
+import streamlit as st
+from postgrest.exceptions import APIError
+
+from ..auth.user_client import (
+    get_service_client,
+    get_session_claims,
+    get_session_client,
+    get_session_identity,
+)
+from ..utils.error_handling import DatabaseError
+from ..utils.resilience import Upstream, get_upstream
+from .postgres import POSTGRES_CLIENTS, REQUEST_ERRORS, get_postgres_backend
+
+R = TypeVar('R')
+
+# Filter operators supported by every executor
+FILTER_OPERATORS = ("eq", "neq", "gt", "gte", "lt", "lte", "in", "is")
+
+ColumnSpec = Union[str, Sequence[str]]
+
+# Query executor: "postgrest" (HTTP) or "postgres" (direct connection pool)
+DB_BACKEND = os.getenv("LITKIT_DB_BACKEND", "postgrest").lower()
+
+
+class ClientNotConfiguredError(DatabaseError):
+    """Raised when a query runs without a configured database client."""
+
+    def __init__(self, message: str = "Supabase client is not configured."):
+        super().__init__(message)
+
+
+class Filter:
+    """A single ``column <op> value`` condition."""
+
+    __slots__ = ("column", "op", "value")
+
+    def __init__(self, column: str, op: str, value: Any):
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"Filter({self.column!r}, {self.op!r}, {self.value!r})"
+
+
+class Query:
+    """Composable description of one table operation."""
+
+    def __init__(
+        self,
+        repository: "Repository",
+        action: str,
+        columns: Optional[Tuple[str, ...]] = None,
+        payload: Any = None
+    ):
+        """
+        Initialize a query. Use the Repository methods instead of calling this.
+
+        Args:
+            repository: Repository the query belongs to
+            action: 'select', 'insert', 'update', 'upsert' or 'delete'
+            columns: Columns to return for selects (None for all)
+            payload: Row(s) for inserts, updates and upserts
+        """
+        self.repository = repository
+        self.action = action
+        self.columns = columns
+        self.payload = payload
+        self.filters: List[Filter] = []
+        # (columns, values, descending) position for keyset pagination
+        self.keyset: Optional[Tuple[Tuple[str, ...], Tuple[Any, ...], bool]] = None
+        self.ordering: List[Tuple[str, bool]] = []
+        self.row_limit: Optional[int] = None
+        self.on_conflict: Optional[str] = None
+        self.ignore_duplicates = False
+
+    @property
+    def table(self) -> str:
+        """Name of the queried table."""
+        return self.repository.table
+
+    def where(self, column: str, op: str, value: Any) -> "Query":
+        """
+        Add a filter condition.
+
+        Args:
+            column: Declared column name
+            op: One of FILTER_OPERATORS
+            value: Value to compare with (a sequence for 'in')
+
+        Returns:
+            Query: This query, for chaining
+        """
+        self.repository.check_columns([column])
+        self.filters.append(Filter(column, op, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "Query":
+        """Filter on ``column = value``."""
+        return self.where(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "Query":
+        """Filter on ``column <> value``."""
+        return self.where(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "Query":
+        """Filter on ``column > value``."""
+        return self.where(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "Query":
+        """Filter on ``column >= value``."""
+        return self.where(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "Query":
+        """Filter on ``column < value``."""
+        return self.where(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "Query":
+        """Filter on ``column <= value``."""
+        return self.where(column, "lte", value)
+
+    def in_(self, column: str, values: Sequence[Any]) -> "Query":
+        """Filter on ``column IN values``."""
+        return self.where(column, "in", list(values))
+
+    def is_(self, column: str, value: Optional[bool]) -> "Query":
+        """Filter on ``column IS value`` (None, True or False)."""
+        return self.where(column, "is", value)
+
+    def after(self, columns: Sequence[str], values: Sequence[Any]) -> "Query":
+        """
+        Keep rows that sort after a position, for keyset pagination.
+
+        Args:
+            columns: Sort columns, e.g. ``("created_at", "id")``
+            values: Values of those columns in the last row already seen
+
+        Returns:
+            Query: This query, for chaining
+        """
+        self.repository.check_columns(columns)
+        self.keyset = (tuple(columns), tuple(values), False)
+        return self
+
+    def before(self, columns: Sequence[str], values: Sequence[Any]) -> "Query":
+        """
+        Keep rows that sort before a position, for descending keyset pagination.
+
+        Args:
+            columns: Sort columns, e.g. ``("created_at", "id")``
+            values: Values of those columns in the last row already seen
+
+        Returns:
+            Query: This query, for chaining
+        """
+        self.repository.check_columns(columns)
+        self.keyset = (tuple(columns), tuple(values), True)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "Query":
+        """
+        Add a sort column.
+
+        Args:
+            column: Declared column name
+            desc: Sort descending
+
+        Returns:
+            Query: This query, for chaining
+        """
+        self.repository.check_columns([column])
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "Query":
+        """
+        Limit the number of rows returned.
+
+        Args:
+            count: Maximum number of rows
+
+        Returns:
+            Query: This query, for chaining
+        """
+        self.row_limit = count
+        return self
+
+    def execute(self, client: Any = None) -> List[Dict[str, Any]]:
+        """
+        Run the query (one round trip).
+
+        Args:
+            client: Client to run with (defaults to the repository's client)
+
+        Returns:
+            List[Dict[str, Any]]: Rows returned by the database
+
+        Raises:
+            ClientNotConfiguredError: If no database client is configured
+        """
+        return self.repository.run(self, client)
+
+    def first(self) -> Optional[Dict[str, Any]]:
+        """
+        Run a select limited to one row.
+
+        Returns:
+            Optional[Dict[str, Any]]: The first row, or None
+        """
+        if self.row_limit is None:
+            self.row_limit = 1
+        rows = self.execute()
+        return rows[0] if rows else None
+
+
+def _quote(value: Any) -> str:
+    """Quote a value for a PostgREST logical filter."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def _keyset_filter(
+    columns: Sequence[str],
+    values: Sequence[Any],
+    descending: bool = False
+) -> str:
+    """Build ``(c1, c2, ...) > (v1, v2, ...)`` (or ``<``) as a PostgREST or-filter."""
+    op = "lt" if descending else "gt"
+    branches = []
+    for i, column in enumerate(columns):
+        conditions = [
+            f"{prev}.eq.{_quote(values[j])}" for j, prev in enumerate(columns[:i])
+        ]
+        conditions.append(f"{column}.{op}.{_quote(values[i])}")
+        if len(conditions) == 1:
+            branches.append(conditions[0])
+        else:
+            branches.append(f"and({','.join(conditions)})")
+    return ",".join(branches)
+
+
+def execute_postgrest(client: Any, query: Query) -> List[Dict[str, Any]]:
+    """
+    Execute a query through a PostgREST (Supabase) client.
+
+    Args:
+        client: Supabase or PostgREST client
+        query: Query to run
+
+    Returns:
+        List[Dict[str, Any]]: Rows returned by the database
+    """
+    table = client.table(query.table)
+
+    if query.action == "select":
+        columns = ",".join(query.columns) if query.columns else "*"
+        builder = table.select(columns)
+    elif query.action == "insert":
+        builder = table.insert(query.payload)
+    elif query.action == "update":
+        builder = table.update(query.payload)
+    elif query.action == "upsert":
+        builder = table.upsert(
+            query.payload,
+            on_conflict=query.on_conflict or "",
+            ignore_duplicates=query.ignore_duplicates,
+        )
+    elif query.action == "delete":
+        builder = table.delete()
+    else:
+        raise ValueError(f"Unsupported action: {query.action}")
+
+    for condition in query.filters:
+        method = {"in": "in_", "is": "is_"}.get(condition.op, condition.op)
+        value = condition.value
+        if condition.op == "is":
+            value = "null" if value is None else str(value).lower()
+        builder = getattr(builder, method)(condition.column, value)
+
+    if query.keyset is not None:
+        builder = builder.or_(_keyset_filter(*query.keyset))
+
+    for column, desc in query.ordering:
+        builder = builder.order(column, desc=desc)
+
+    if query.row_limit is not None:
+        builder = builder.limit(query.row_limit)
+
+    return builder.execute().data or []
+
+
+# SQLSTATE classes and codes PostgREST answers with a 5xx status: the
+# database is unavailable, overloaded or failing, not the request wrong
+SERVER_ERROR_SQLSTATES = (
+    "08", "09", "25", "2D", "38", "39", "3B", "40", "53", "54", "55", "57",
+    "58", "F0", "HV", "P0", "XX", "42P17",
+)
+
+
+def _is_request_error(error: BaseException) -> bool:
+    """
+    Check whether a PostgREST error was caused by the request (a 4xx).
+
+    ``APIError.code`` is the SQLSTATE or ``PGRST`` code from the error body,
+    or the HTTP status when the body was not JSON (e.g. a gateway's 502).
+
+    Args:
+        error: Error raised by a query
+
+    Returns:
+        bool: False for errors PostgREST or a proxy reports as 5xx
+    """
+    if not isinstance(error, APIError):
+        return True
+
+    code = str(error.code or "")
+    if code.isdigit() and len(code) == 3:
+        return 400 <= int(code) < 500
+    if code.startswith("PGRST"):
+        # Group 0 is connection errors (503/504), X00 internal errors (500)
+        return not (code.startswith("PGRST0") or code.startswith("PGRSTX"))
+    if code == "P0001":
+        # RAISE EXCEPTION in a function, e.g. insufficient credits
+        return True
+    return not code.startswith(SERVER_ERROR_SQLSTATES)
+
+
+def _upstream(client: Any) -> Upstream:
+    """Get the resilience guard for the backend a client talks to."""
+    if isinstance(client, POSTGRES_CLIENTS):
+        return get_upstream("postgres", REQUEST_ERRORS + (ValueError,))
+    # PostgREST reports request errors (RLS, constraints, bad filters) and
+    # server errors alike as APIError; only the former are ignored
+    return get_upstream("supabase", (APIError, ValueError), _is_request_error)
+
+
+def get_database_client() -> Any:
+    """
+    Get the client repositories run queries with.
+
+    Returns:
+        Any: When LITKIT_DB_BACKEND is 'postgres' and it is available, a
+        Postgres client running as the session's user (or anon) under RLS,
+        otherwise the session's PostgREST client (or None)
+    """
+    if DB_BACKEND == "postgres":
+        backend = get_postgres_backend()
+        if backend is not None:
+            return backend.as_role(get_session_claims())
+    return get_session_client()
+
+
+def get_service_database_client() -> Any:
+    """
+    Get a client for server-only operations that users must not run
+    themselves, such as granting credits.
+
+    Returns:
+        Any: The Postgres backend when LITKIT_DB_BACKEND is 'postgres' and it
+        is available, otherwise the service-role PostgREST client (or None)
+    """
+    if DB_BACKEND == "postgres":
+        backend = get_postgres_backend()
+        if backend is not None:
+            return backend
+    return get_service_client()
+
+
+def get_database_identity() -> str:
+    """
+    Identify the credentials repository queries currently run with.
+
+    Returns:
+        str: ``"user:<id>"`` for a signed-in session, otherwise ``"anon"``
+    """
+    if DB_BACKEND == "postgres" and get_postgres_backend() is not None:
+        # Must match the claims get_database_client() runs with
+        subject = get_session_claims().get("sub")
+        return f"user:{subject}" if subject else "anon"
+    return get_session_identity()
+
+
+def identity_key(*args: Any, **kwargs: Any) -> Hashable:
+    """
+    Single-flight key for reads whose result depends on the caller's identity.
+
+    Callers reading under different credentials may see different rows, so
+    they never share one in-flight query.
+
+    Returns:
+        Hashable: The call's arguments and the current database identity
+    """
+    return (get_database_identity(), args, tuple(sorted(kwargs.items())))
+
+
+class Repository:
+    """Access to one table with declared columns and round-trip accounting."""
+
+    def __init__(
+        self,
+        table: str,
+        columns: Sequence[str],
+        column_sets: Optional[Dict[str, Sequence[str]]] = None,
+        client_factory: Callable[[], Any] = get_database_client
+    ):
+        """
+        Initialize the repository.
+
+        Args:
+            table: Table name
+            columns: Every column of the table
+            column_sets: Named projections, e.g. ``{"summary": ("id", "status")}``;
+                ``"default"`` falls back to all declared columns
+            client_factory: Returns the database client to query with
+        """
+        self.table = table
+        self.columns = tuple(columns)
+        self.column_sets: Dict[str, Tuple[str, ...]] = {"default": self.columns}
+        for name, names in (column_sets or {}).items():
+            self.check_columns(names)
+            self.column_sets[name] = tuple(names)
+        self.client_factory = client_factory
+        self._lock = threading.Lock()
+        self._round_trips = 0
+        self._rows = 0
+        self._errors = 0
+
+    def check_columns(self, names: Sequence[str]) -> None:
+        """
+        Ensure column names are declared for this table.
+
+        Args:
+            names: Column names to check
+
+        Raises:
+            ValueError: If a column is not declared
+        """
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise ValueError(
+                f"Unknown column(s) for {self.table}: {', '.join(unknown)}")
+
+    def _resolve_columns(self, columns: ColumnSpec) -> Optional[Tuple[str, ...]]:
+        """Turn a column set name or column list into a projection."""
+        if isinstance(columns, str):
+            if columns == "*":
+                return None
+            if columns in self.column_sets:
+                return self.column_sets[columns]
+            columns = [c.strip() for c in columns.split(",") if c.strip()]
+        self.check_columns(columns)
+        return tuple(columns)
+
+    def select(self, columns: ColumnSpec = "default") -> Query:
+        """
+        Start a select query.
+
+        Args:
+            columns: Column set name, comma-separated column names, a
+                sequence of names, or ``"*"``
+
+        Returns:
+            Query: Query builder
+        """
+        return Query(self, "select", self._resolve_columns(columns))
+
+    def insert(self, rows: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Query:
+        """Start an insert of one row or a list of rows."""
+        return Query(self, "insert", payload=rows)
+
+    def update(self, values: Dict[str, Any]) -> Query:
+        """Start an update; add filters to choose the rows."""
+        return Query(self, "update", payload=values)
+
+    def upsert(
+        self,
+        rows: Union[Dict[str, Any], List[Dict[str, Any]]],
+        on_conflict: str = "",
+        ignore_duplicates: bool = False
+    ) -> Query:
+        """
+        Start an insert that resolves conflicts on a unique column.
+
+        Args:
+            rows: Row or rows to write
+            on_conflict: Comma-separated conflict target columns
+            ignore_duplicates: Keep existing rows instead of updating them
+
+        Returns:
+            Query: Query builder
+        """
+        query = Query(self, "upsert", payload=rows)
+        query.on_conflict = on_conflict
+        query.ignore_duplicates = ignore_duplicates
+        return query
+
+    def delete(self) -> Query:
+        """Start a delete; add filters to choose the rows."""
+        return Query(self, "delete")
+
+    def _client(self) -> Any:
+        """Get the client or raise if the database is not configured."""
+        client = self.client_factory()
+        if not client:
+            raise ClientNotConfiguredError()
+        return client
+
+    def _record(self, rows: int = 0, error: bool = False) -> None:
+        """Count one round trip."""
+        with self._lock:
+            self._round_trips += 1
+            self._rows += rows
+            if error:
+                self._errors += 1
+
+    def run(self, query: Query, client: Any = None) -> List[Dict[str, Any]]:
+        """
+        Execute a query built from this repository.
+
+        Args:
+            query: Query to run
+            client: Client to run with (defaults to the repository's client)
+
+        Returns:
+            List[Dict[str, Any]]: Rows returned by the database
+        """
+        client = client or self._client()
+        if isinstance(client, POSTGRES_CLIENTS):
+            call = functools.partial(client.execute, query)
+        else:
+            call = functools.partial(execute_postgrest, client, query)
+
+        try:
+            # Only reads are safe to retry
+            rows = _upstream(client).call(call, idempotent=query.action == "select")
+        except Exception:
+            self._record(error=True)
+            raise
+        self._record(len(rows))
+        return rows
+
+    def rpc(
+        self,
+        function: str,
+        params: Dict[str, Any],
+        client: Any = None,
+        idempotent: bool = False
+    ) -> Any:
+        """
+        Call a database function (one round trip).
+
+        Args:
+            function: Function name
+            params: Named arguments
+            client: Client to call with (defaults to the repository's client)
+            idempotent: Whether the function only reads and may be retried
+
+        Returns:
+            Any: The function's result
+        """
+        client = client or self._client()
+        if isinstance(client, POSTGRES_CLIENTS):
+            call = functools.partial(client.rpc, function, params)
+        else:
+            def call():
+                return client.rpc(function, params).execute().data
+
+        try:
+            data = _upstream(client).call(call, idempotent=idempotent)
+        except Exception:
+            self._record(error=True)
+            raise
+        self._record(len(data) if isinstance(data, list) else 1)
+        return data
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get round-trip counters for this repository.
+
+        Returns:
+            Dict[str, int]: Round trips, rows returned and errors
+        """
+        with self._lock:
+            return {
+                "round_trips": self._round_trips,
+                "rows": self._rows,
+                "errors": self._errors,
+            }
+
+    def reset_stats(self) -> None:
+        """Reset the round-trip counters."""
+        with self._lock:
+            self._round_trips = 0
+            self._rows = 0
+            self._errors = 0
+
+
+def db_operation(
+    default: Any,
+    error_message: str,
+    show_ui: bool = True
+) -> Callable[[Callable[..., R]], Callable[..., R]]:
+    """
+    Decorator applying the shared client check and error handling.
+
+    Args:
+        default: Value returned when the database is unavailable or fails
+        error_message: Prefix of the message shown on failure
+        show_ui: Report through Streamlit (True) or print (False)
+
+    Returns:
+        Decorator for database functions
+    """
+    def decorator(func: Callable[..., R]) -> Callable[..., R]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except ClientNotConfiguredError as e:
+                if show_ui:
+                    st.warning(e.message)
+                else:
+                    print(e.message)
+            except Exception as e:
+                message = f"{error_message}: {str(e)}"
+                if show_ui:
+                    st.error(message)
+                else:
+                    print(message)
+            return default
+
+        return wrapper
+    return decorator
+
+
+# Repositories for the LitKit tables
+
+subscriptions = Repository(
+    "subscriptions",
+    columns=(
+        "id", "user_id", "stripe_customer_id", "stripe_subscription_id",
+        "status", "price_id", "quantity", "cancel_at_period_end",
+        "current_period_start", "current_period_end", "created_at",
+        "updated_at",
+    ),
+    column_sets={
+        "status": ("user_id", "status", "price_id", "current_period_end"),
+    },
+)
+
+payments = Repository(
+    "payments",
+    columns=(
+        "id", "user_id", "stripe_checkout_id", "amount", "currency",
+        "status", "payment_type", "created_at",
+    ),
+)
+
+credits = Repository(
+    "credits",
+    columns=("id", "user_id", "amount", "created_at", "updated_at"),
+    column_sets={"balance": ("amount",)},
+)
+
+users = Repository(
+    "users",
+    columns=(
+        "id", "email", "name", "avatar_url", "preferences", "created_at",
+        "updated_at",
+    ),
+    column_sets={"summary": ("id", "email", "name", "created_at")},
+)
+
+profiles = Repository(
+    "profiles",
+    columns=("id", "email", "name", "avatar_url", "created_at", "updated_at"),
+)
+
+# Read-only view over active subscriptions (sql/stripe/entitlements_view.sql)
+entitlements = Repository(
+    "entitlements",
+    columns=("user_id", "plan", "active_until"),
+)
+
+# One Stripe customer per user (sql/stripe/stripe_customers.sql)
+stripe_customers = Repository(
+    "stripe_customers",
+    columns=("user_id", "stripe_customer_id", "created_at"),
+)
+
+REPOSITORIES = (
+    subscriptions, payments, credits, users, profiles, entitlements,
+    stripe_customers,
+)
+
+
+def get_repository_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get round-trip counters for every repository.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Counters keyed by table name
+    """
+    return {repo.table: repo.stats() for repo in REPOSITORIES}
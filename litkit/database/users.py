@@ -4,10 +4,21 @@ User data management with Supabase.
 This module provides functions for user data operations using Supabase.
 """
 
-from typing import Dict, Any, List, Optional
-from ..auth.client import supabase_client
+import os
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from ..auth.user_client import get_session_client
+from . import repository as repo
+from .repository import ClientNotConfiguredError, db_operation
+from ..utils.singleflight import single_flight
 
+# Maximum number of ids per "in" filter, keeping request URLs short
+USER_ID_CHUNK_SIZE = int(os.getenv("LITKIT_USER_ID_CHUNK_SIZE", "200"))
 
+# Maximum number of rows per bulk upsert request
+USER_UPSERT_CHUNK_SIZE = int(os.getenv("LITKIT_USER_UPSERT_CHUNK_SIZE", "500"))
+
+
+@single_flight(key=repo.identity_key)
 def get_user_data(user_id: str) -> Optional[Dict[str, Any]]:
     """
     Get a user's data from the database.
@@ -18,15 +29,15 @@ def get_user_data(user_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Optional[Dict[str, Any]]: User data if found, None otherwise
     """
-    if not supabase_client:
+    client = get_session_client()
+    if not client:
         print("Supabase client is not configured")
         return None
 
     try:
         # This would actually query the user data from Supabase
         # For the boilerplate, we just return a mock data object
-        # response = supabase_client.from_("users").select("*").eq("id", user_id).execute()
-        # return response.data[0] if response.data else None
+        # return repo.users.select().eq("id", user_id).first()
 
         # Mock user data
         return {
@@ -55,14 +66,15 @@ def update_user_data(user_id: str, data: Dict[str, Any]) -> bool:
     Returns:
         bool: True if update was successful, False otherwise
     """
-    if not supabase_client:
+    client = get_session_client()
+    if not client:
         print("Supabase client is not configured")
         return False
 
     try:
         # This would actually update the user data in Supabase
         # For the boilerplate, we just return success
-        # supabase_client.from_("users").update(data).eq("id", user_id).execute()
+        # repo.users.update(data).eq("id", user_id).execute()
 
         print(f"Would update user {user_id} with data: {data}")
         return True
@@ -75,18 +87,20 @@ def get_all_users() -> List[Dict[str, Any]]:
     """
     Get all users from the database (admin only).
 
+    Loads every user into memory; use iter_users() for large user bases.
+
     Returns:
         List[Dict[str, Any]]: List of all users
     """
-    if not supabase_client:
+    client = get_session_client()
+    if not client:
         print("Supabase client is not configured")
         return []
 
     try:
         # This would actually query all users from Supabase
         # For the boilerplate, we just return mock data
-        # response = supabase_client.from_("users").select("*").execute()
-        # return response.data if response.data else []
+        # return repo.users.select().execute()
 
         # Mock users data
         return [
@@ -118,17 +132,129 @@ def delete_user(user_id: str) -> bool:
     Returns:
         bool: True if deletion was successful, False otherwise
     """
-    if not supabase_client:
+    client = get_session_client()
+    if not client:
         print("Supabase client is not configured")
         return False
 
     try:
         # This would actually delete the user from Supabase
         # For the boilerplate, we just return success
-        # supabase_client.from_("users").delete().eq("id", user_id).execute()
+        # repo.users.delete().eq("id", user_id).execute()
 
         print(f"Would delete user {user_id}")
         return True
     except Exception as e:
         print(f"Error deleting user: {str(e)}")
         return False
+
+
+@db_operation([], "Error fetching users by ids", show_ui=False)
+def get_users_by_ids(
+    user_ids: Iterable[str],
+    columns: repo.ColumnSpec = "default",
+    chunk_size: int = USER_ID_CHUNK_SIZE
+) -> List[Dict[str, Any]]:
+    """
+    Get many users with one "in" query per chunk of ids.
+
+    Args:
+        user_ids: The users' IDs (duplicates are ignored)
+        columns: Column set name or columns to select
+        chunk_size: Maximum number of ids per request
+
+    Returns:
+        List[Dict[str, Any]]: Users found, in no particular order
+    """
+    ids = list(dict.fromkeys(user_ids))
+    users: List[Dict[str, Any]] = []
+
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        users.extend(repo.users.select(columns).in_("id", chunk).execute())
+    return users
+
+
+@db_operation(-1, "Error updating users", show_ui=False)
+def update_users(
+    rows: Iterable[Dict[str, Any]],
+    chunk_size: int = USER_UPSERT_CHUNK_SIZE
+) -> int:
+    """
+    Update many users with bulk upserts.
+
+    Each row must contain the user's ``id`` plus the columns to change. Rows
+    are grouped by the set of columns they carry, so a column missing from
+    one row is never overwritten with a default.
+
+    Args:
+        rows: Rows to upsert, each with an ``id``
+        chunk_size: Maximum number of rows per request
+
+    Returns:
+        int: Number of rows written, or -1 on error
+    """
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for row in rows:
+        if not row.get("id"):
+            print("Skipping user update without an id")
+            continue
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+
+    written = 0
+    for group in groups.values():
+        for start in range(0, len(group), chunk_size):
+            written += len(repo.users.upsert(
+                group[start:start + chunk_size], on_conflict="id"
+            ).execute())
+    return written
+
+
+def iter_users(
+    page_size: int = 1000,
+    columns: repo.ColumnSpec = "default"
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over all users in constant memory (admin only).
+
+    Pages are fetched with keyset pagination on ``(created_at, id)``, so each
+    page is an index range scan however deep the iteration goes.
+
+    Args:
+        page_size: Number of users fetched per request
+        columns: Column set name or columns to select (``created_at`` and
+            ``id`` are always added)
+
+    Yields:
+        Dict[str, Any]: One user at a time, ordered by creation time
+
+    Raises:
+        ClientNotConfiguredError: If no database client is configured
+        Exception: Whatever a page request raised, after the users of the
+            previous pages have been yielded, so a failure is never mistaken
+            for the end of the table
+    """
+    query = repo.users.select(columns)
+    if query.columns is not None:
+        query.columns = tuple(dict.fromkeys(
+            query.columns + ("created_at", "id")))
+
+    yielded = 0
+    while True:
+        try:
+            page = query.order("created_at").order(
+                "id").limit(page_size).execute()
+        except ClientNotConfiguredError as e:
+            print(e.message)
+            raise
+        except Exception as e:
+            print(f"Error iterating users after {yielded} users: {str(e)}")
+            raise
+
+        yield from page
+        yielded += len(page)
+
+        if len(page) < page_size:
+            return
+        query = repo.users.select(query.columns or "*").after(
+            ("created_at", "id"), (page[-1]["created_at"], page[-1]["id"]))
@@ -0,0 +1,461 @@
+"""
+Write-behind insert queue for append-only tables.
+
+Rows such as payment receipts do not need to be written inside the caller's
+script run. A ``WriteBehindQueue`` buffers them in memory, appends each one to
+a local spill file before returning, and a background thread flushes them as
+multi-row inserts once ``batch_size`` rows are waiting or ``flush_interval``
+seconds have passed. Rows left in the spill file by a crashed process are
+replayed when the queue next starts, and every queue is flushed at exit.
+
+Each row gets a client-generated ``id`` when it is queued and is written with
+``ON CONFLICT (id) DO NOTHING``, so replaying a batch that had already reached
+the database does not duplicate it. A spill directory must only be used by
+one process at a time.
+
+Rows are written with the client of the session that queued them, also when
+a flush is retried. Replayed rows have no session; the service role writes
+them only if they were queued by the user in their ``user_id`` column. Rows
+the database rejects ``max_attempts`` times, and replayed rows that fail the
+ownership check, are moved to a ``<table>.dead.jsonl`` file next to the spill
+file for an operator to inspect.
+"""
+
+import atexit
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from . import repository as repo
+from .postgres import REQUEST_ERRORS
+from .repository import ClientNotConfiguredError, Repository
+
+# Enable write-behind for payment records
+WRITE_BEHIND_ENABLED = os.getenv("LITKIT_WRITE_BEHIND", "false").lower() == "true"
+
+# Flush once this many rows are waiting or this many seconds have passed
+WRITE_QUEUE_BATCH_SIZE = int(os.getenv("LITKIT_WRITE_QUEUE_BATCH_SIZE", "100"))
+WRITE_QUEUE_FLUSH_INTERVAL = float(os.getenv("LITKIT_WRITE_QUEUE_FLUSH_INTERVAL", "2"))
+
+# Directory holding one spill file per table
+WRITE_QUEUE_DIR = os.getenv("LITKIT_WRITE_QUEUE_DIR", ".litkit/write_queue")
+
+# fsync the spill file after every queued row
+WRITE_QUEUE_FSYNC = os.getenv("LITKIT_WRITE_QUEUE_FSYNC", "true").lower() == "true"
+
+# Rejections a row may get before it is moved to the dead-letter file
+WRITE_QUEUE_MAX_ATTEMPTS = int(os.getenv("LITKIT_WRITE_QUEUE_MAX_ATTEMPTS", "5"))
+
+# Seconds to wait before retrying after a failed flush
+RETRY_DELAY = 5.0
+
+
+class _Entry:
+    """A queued row with the client and identity it was queued under."""
+
+    __slots__ = ("client", "owner", "row", "attempts")
+
+    def __init__(self, client: Any, owner: str, row: Dict[str, Any], attempts: int = 0):
+        self.client = client
+        self.owner = owner
+        self.row = row
+        self.attempts = attempts
+
+    def to_json(self) -> str:
+        """Serialize the entry as a spill file line (without its client)."""
+        return json.dumps(
+            {"owner": self.owner, "attempts": self.attempts, "row": self.row},
+            default=str)
+
+
+def _is_permanent(error: BaseException) -> bool:
+    """Check whether retrying an insert cannot succeed (the rows were rejected)."""
+    if isinstance(error, APIError):
+        return repo._is_request_error(error)
+    return isinstance(error, REQUEST_ERRORS)
+
+
+class WriteBehindQueue:
+    """Buffered, durable, batched inserts into one append-only table."""
+
+    def __init__(
+        self,
+        repository: Repository,
+        batch_size: int = WRITE_QUEUE_BATCH_SIZE,
+        flush_interval: float = WRITE_QUEUE_FLUSH_INTERVAL,
+        spill_dir: str = WRITE_QUEUE_DIR,
+        max_attempts: int = WRITE_QUEUE_MAX_ATTEMPTS
+    ):
+        """
+        Initialize the queue, replay its spill file and start the flusher.
+
+        Args:
+            repository: Repository of the table to insert into
+            batch_size: Number of waiting rows that triggers a flush
+            flush_interval: Maximum seconds a row waits before being flushed
+            spill_dir: Directory for the spill and dead-letter files
+            max_attempts: Rejections before a row is dead-lettered
+        """
+        self.repository = repository
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.spill_path = os.path.join(spill_dir, f"{repository.table}.jsonl")
+        self.dead_letter_path = os.path.join(spill_dir, f"{repository.table}.dead.jsonl")
+
+        self._pending: List[_Entry] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        # Rows appended to the spill file, and how many of them are synced
+        self._written = 0
+        self._synced = 0
+        self._enqueued = 0
+        self._flushed = 0
+        self._batches = 0
+        self._failures = 0
+        self._recovered = 0
+        self._dead_lettered = 0
+
+        if spill_dir and not os.path.exists(spill_dir):
+            os.makedirs(spill_dir, exist_ok=True)
+
+        self._recover()
+        self._spill = open(self.spill_path, "a", encoding="utf-8")
+
+        self._thread = threading.Thread(
+            target=self._run, name=f"litkit-write-queue-{repository.table}",
+            daemon=True)
+        self._thread.start()
+
+    def _recover(self) -> None:
+        """Load rows left in the spill file by a previous process."""
+        if not os.path.exists(self.spill_path):
+            return
+
+        with open(self.spill_path, encoding="utf-8") as spill:
+            for line in spill:
+                try:
+                    entry = json.loads(line)
+                    row = entry["row"]
+                except (ValueError, TypeError, KeyError):
+                    # A torn final line from a crash mid-write
+                    continue
+                # The session that queued the row is gone; it is written with
+                # the service role once its owner is checked
+                self._pending.append(_Entry(
+                    None, entry.get("owner"), row, entry.get("attempts", 0)))
+
+        self._recovered = len(self._pending)
+        if self._recovered:
+            print(f"Replaying {self._recovered} queued {self.repository.table} row(s)")
+
+    def enqueue(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a row for insertion and return without waiting for the database.
+
+        The row is durable once this returns: it is in the spill file.
+
+        Args:
+            row: Row to insert
+
+        Returns:
+            Dict[str, Any]: The queued row, including its generated ``id``
+
+        Raises:
+            ClientNotConfiguredError: If no database client is configured
+            RuntimeError: If the queue is closed
+        """
+        # Capture the caller's client now; the flusher has no session
+        client = self.repository.client_factory()
+        if not client:
+            raise ClientNotConfiguredError()
+
+        entry = _Entry(client, repo.get_database_identity(), {"id": str(uuid.uuid4()), **row})
+        line = entry.to_json()
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Write queue for {self.repository.table} is closed")
+
+            self._spill.write(line + "\n")
+            self._spill.flush()
+            self._written += 1
+            written = self._written
+
+            self._pending.append(entry)
+            self._enqueued += 1
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+
+        if WRITE_QUEUE_FSYNC:
+            self._sync(written)
+        return entry.row
+
+    def _sync(self, written: int) -> None:
+        """fsync the spill file unless another caller already synced past ``written``."""
+        with self._sync_lock:
+            if self._synced >= written:
+                return
+            # Every row written so far is covered by this fsync; the spill
+            # file is only swapped while holding the sync lock
+            target = self._written
+            os.fsync(self._spill.fileno())
+            self._synced = max(self._synced, target)
+
+    def _run(self) -> None:
+        """Flush on size or time until the queue is closed."""
+        delay = self.flush_interval
+        while True:
+            with self._lock:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._wakeup.wait(delay)
+                if self._closed:
+                    return
+
+            delay = self.flush_interval if self.flush() else RETRY_DELAY
+
+    def flush(self) -> bool:
+        """
+        Insert every waiting row now.
+
+        Rows the database rejects (a constraint or permission error) are
+        retried up to ``max_attempts`` times and then moved to the
+        dead-letter file. Rows that failed because the database could not be
+        reached stay queued.
+
+        Returns:
+            bool: True if the queue was drained, False if rows are still
+            waiting to be retried
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return True
+
+            written, rejected, failed = self._write(batch)
+            dead = [(entry, error) for entry, error in rejected
+                    if entry.attempts >= self.max_attempts]
+            if dead:
+                self._dead_letter(dead)
+
+            # Entries that are no longer waiting
+            done = {id(entry) for entry in written}
+            done.update(id(entry) for entry, _ in dead)
+            with self._lock:
+                self._batches += 1
+                self._flushed += len(written)
+                if rejected or failed:
+                    self._failures += 1
+                self._pending = [entry for entry in self._pending if id(entry) not in done]
+                if done or rejected:
+                    self._compact()
+            return not (rejected or failed)
+
+    def _write(
+        self, batch: List[_Entry]
+    ) -> Tuple[List[_Entry], List[Tuple[_Entry, str]], List[_Entry]]:
+        """
+        Insert a batch, one multi-row insert per client and column set.
+
+        Returns:
+            Tuple: Written entries, rejected entries with their error, and
+            entries that failed for another reason
+        """
+        written: List[_Entry] = []
+        rejected: List[Tuple[_Entry, str]] = []
+        failed: List[_Entry] = []
+
+        writable = []
+        for entry in batch:
+            if entry.client is None and not _owns(entry):
+                # The service role bypasses RLS, so it only writes replayed
+                # rows that were queued by the user they belong to
+                entry.attempts = self.max_attempts
+                rejected.append((entry, f"queued by {entry.owner}, not the row's user"))
+            else:
+                writable.append(entry)
+
+        for client, entries in _group_entries(writable):
+            try:
+                self._insert(client, entries)
+                written.extend(entries)
+                continue
+            except Exception as e:
+                error = e
+            print(f"Error flushing {self.repository.table} write queue: {str(error)}")
+
+            if not _is_permanent(error):
+                failed.extend(entries)
+            elif len(entries) == 1:
+                entries[0].attempts += 1
+                rejected.append((entries[0], str(error)))
+            else:
+                # Find the rows the database rejects instead of holding back
+                # the whole group
+                for entry in entries:
+                    try:
+                        self._insert(client, [entry])
+                        written.append(entry)
+                    except Exception as e:
+                        if _is_permanent(e):
+                            entry.attempts += 1
+                            rejected.append((entry, str(e)))
+                        else:
+                            failed.append(entry)
+
+        return written, rejected, failed
+
+    def _insert(self, client: Any, entries: List[_Entry]) -> None:
+        """Write one multi-row insert, ignoring rows that already exist."""
+        if client is None:
+            client = repo.get_service_database_client()
+            if not client:
+                raise ClientNotConfiguredError(
+                    "Replaying queued rows requires SUPABASE_SERVICE_ROLE_KEY.")
+        rows = [entry.row for entry in entries]
+        for start in range(0, len(rows), self.batch_size):
+            self.repository.upsert(
+                rows[start:start + self.batch_size],
+                on_conflict="id",
+                ignore_duplicates=True,
+            ).execute(client)
+
+    def _dead_letter(self, dead: List[Tuple[_Entry, str]]) -> None:
+        """Append rows that will not be retried to the dead-letter file."""
+        with open(self.dead_letter_path, "a", encoding="utf-8") as dead_letter:
+            for entry, error in dead:
+                dead_letter.write(json.dumps(
+                    {"owner": entry.owner, "error": error, "row": entry.row},
+                    default=str) + "\n")
+            dead_letter.flush()
+            os.fsync(dead_letter.fileno())
+
+        with self._lock:
+            self._dead_lettered += len(dead)
+        print(f"Moved {len(dead)} rejected {self.repository.table} row(s) to "
+              f"{self.dead_letter_path}")
+
+    def _compact(self) -> None:
+        """Rewrite the spill file with the rows still waiting (caller holds the lock)."""
+        tmp_path = self.spill_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as tmp:
+            for entry in self._pending:
+                tmp.write(entry.to_json() + "\n")
+            tmp.flush()
+            os.fsync(tmp.fileno())
+
+        # Wait for a running fsync of the old file before closing it
+        with self._sync_lock:
+            self._spill.close()
+            os.replace(tmp_path, self.spill_path)
+            self._spill = open(self.spill_path, "a", encoding="utf-8")
+            self._synced = self._written
+
+    def close(self) -> bool:
+        """
+        Stop the flusher and write whatever is still waiting.
+
+        Rows that cannot be written stay in the spill file for the next start.
+
+        Returns:
+            bool: True if every row was written
+        """
+        with self._lock:
+            if self._closed:
+                return not self._pending
+            self._closed = True
+            self._wakeup.notify()
+
+        self._thread.join(timeout=self.flush_interval + 5)
+        drained = self.flush()
+        with self._lock, self._sync_lock:
+            self._spill.close()
+        return drained
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get queue counters.
+
+        Returns:
+            Dict[str, int]: Pending, enqueued, flushed, batch, failure,
+            recovered and dead-lettered row counts
+        """
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "enqueued": self._enqueued,
+                "flushed": self._flushed,
+                "batches": self._batches,
+                "failures": self._failures,
+                "recovered": self._recovered,
+                "dead_lettered": self._dead_lettered,
+            }
+
+
+def _owns(entry: _Entry) -> bool:
+    """Check that a row was queued by the user it belongs to."""
+    user_id = entry.row.get("user_id")
+    return user_id is not None and entry.owner == f"user:{user_id}"
+
+
+def _group_entries(batch: List[_Entry]) -> List[Tuple[Optional[Any], List[_Entry]]]:
+    """Group entries by client and column set, keeping queue order."""
+    groups: Dict[Tuple[int, Tuple[str, ...]], Tuple[Any, List[_Entry]]] = {}
+    for entry in batch:
+        key = (id(entry.client), tuple(sorted(entry.row)))
+        groups.setdefault(key, (entry.client, []))[1].append(entry)
+    return list(groups.values())
+
+
+_queues: Dict[str, WriteBehindQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_queue(repository: Repository) -> WriteBehindQueue:
+    """
+    Get the process-wide write queue for a table, starting it on first use.
+
+    Args:
+        repository: Repository of an append-only table
+
+    Returns:
+        WriteBehindQueue: The table's queue
+    """
+    with _queues_lock:
+        queue = _queues.get(repository.table)
+        if queue is None:
+            queue = WriteBehindQueue(repository)
+            _queues[repository.table] = queue
+        return queue
+
+
+def get_write_queue_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get counters for every started write queue.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Counters keyed by table name
+    """
+    with _queues_lock:
+        queues = dict(_queues)
+    return {table: queue.stats() for table, queue in queues.items()}
+
+
+def flush_all_queues() -> None:
+    """Close every write queue, writing waiting rows (registered to run at exit)."""
+    with _queues_lock:
+        queues = list(_queues.values())
+
+    for queue in queues:
+        queue.close()
+
+
+atexit.register(flush_all_queues)
@@ -0,0 +1,384 @@
+"""
+Stripe plan catalog.
+
+Subscription plans are built from active recurring Stripe Prices and their
+Products, following Stripe's auto-pagination, and kept in an in-memory index
+keyed by plan id and lookup_key. Reads never wait on Stripe:
+
+- fresh entries are served from memory
+- stale entries are served while a background thread refreshes them
+- on a cold start the last disk snapshot (or the built-in placeholder plans)
+  is served while the first load runs in the background
+
+Plan fields come from Stripe as follows. ``id`` is the product's
+``plan_id`` metadata, else the price's lookup_key, else the price id.
+``features`` come from the product's marketing features, else its
+comma-separated ``features`` metadata. ``highlighted`` is the product's
+``highlighted`` metadata set to "true", and plans are ordered by the
+product's ``order`` metadata, then by amount.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .stripe_client import get_stripe_client, get_stripe_upstream
+from ..utils.singleflight import single_flight
+
+# Seconds before the catalog is refreshed from Stripe
+PLAN_CATALOG_TTL = float(os.getenv("LITKIT_PLAN_CATALOG_TTL", "300"))
+
+# Seconds before retrying a failed load, doubled after each failure up to the TTL
+PLAN_CATALOG_RETRY_DELAY = 5.0
+
+# Snapshot used to serve plans on a cold start
+PLAN_SNAPSHOT_PATH = os.getenv("LITKIT_PLAN_SNAPSHOT", ".litkit/plans.json")
+
+# Currencies without a minor unit (amounts are not in cents)
+ZERO_DECIMAL_CURRENCIES = {
+    "bif", "clp", "djf", "gnf", "jpy", "kmf", "krw", "mga", "pyg", "rwf",
+    "ugx", "vnd", "vuv", "xaf", "xof", "xpf",
+}
+
+CURRENCY_SYMBOLS = {"usd": "$", "eur": "€", "gbp": "£", "jpy": "¥"}
+
+# Placeholder plans used until Stripe has been loaded (or if it is not configured)
+DEFAULT_PLANS: List[Dict[str, Any]] = [
+    {
+        "id": "basic",
+        "name": "Basic",
+        "description": "Essential features for individuals",
+        "price": "$9.99/month",
+        "features": [
+            "Access to basic features",
+            "Email support",
+            "1 project"
+        ],
+        "price_id": os.getenv("STRIPE_PRICE_ID", "price_placeholder"),
+        "highlighted": False
+    },
+    {
+        "id": "pro",
+        "name": "Professional",
+        "description": "Advanced features for professionals",
+        "price": "$19.99/month",
+        "features": [
+            "Access to all features",
+            "Priority support",
+            "Unlimited projects",
+            "Advanced analytics"
+        ],
+        "price_id": os.getenv("STRIPE_PRO_PRICE_ID", "price_pro_placeholder"),
+        "highlighted": True
+    }
+]
+
+
+def format_price(
+    unit_amount: Optional[int],
+    currency: str,
+    interval: Optional[str] = None,
+    interval_count: int = 1
+) -> str:
+    """
+    Format a Stripe amount for display, e.g. ``$9.99/month``.
+
+    Args:
+        unit_amount: Amount in the currency's minor unit
+        currency: Three-letter currency code
+        interval: Billing interval ('day', 'week', 'month' or 'year')
+        interval_count: Number of intervals between charges
+
+    Returns:
+        str: Display price
+    """
+    currency = (currency or "").lower()
+    amount = unit_amount or 0
+    if currency in ZERO_DECIMAL_CURRENCIES:
+        value = f"{amount:,}"
+    else:
+        value = f"{amount / 100:,.2f}"
+
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    text = f"{symbol}{value}" if symbol else f"{value} {currency.upper()}"
+
+    if interval:
+        period = interval if interval_count == 1 else f"{interval_count} {interval}s"
+        text += f"/{period}"
+    return text
+
+
+def _as_dict(obj: Any) -> Dict[str, Any]:
+    """Plain dictionary of a Stripe object (older stripe versions subclass dict)."""
+    return obj if isinstance(obj, dict) else obj.to_dict()
+
+
+def _plan_from_price(price: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a plan dictionary from a Price with its Product expanded."""
+    product = price.get("product") or {}
+    metadata = product.get("metadata") or {}
+    recurring = price.get("recurring") or {}
+
+    features = [f.get("name") for f in product.get("marketing_features") or []]
+    if not features and metadata.get("features"):
+        features = [f.strip() for f in metadata["features"].split(",")]
+
+    return {
+        "id": metadata.get("plan_id") or price.get("lookup_key") or price["id"],
+        "name": product.get("name") or price.get("nickname") or price["id"],
+        "description": product.get("description") or "",
+        "price": format_price(
+            price.get("unit_amount"),
+            price.get("currency"),
+            recurring.get("interval"),
+            recurring.get("interval_count") or 1,
+        ),
+        "features": [f for f in features if f],
+        "price_id": price["id"],
+        "lookup_key": price.get("lookup_key"),
+        "product_id": product.get("id"),
+        "unit_amount": price.get("unit_amount"),
+        "currency": price.get("currency"),
+        "interval": recurring.get("interval"),
+        "highlighted": str(metadata.get("highlighted", "")).lower() == "true",
+        "order": int(metadata["order"]) if str(metadata.get("order", "")).isdigit() else None,
+    }
+
+
+@single_flight()
+def load_plans_from_stripe() -> Optional[List[Dict[str, Any]]]:
+    """
+    Load every active recurring price and its product from Stripe.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: Plans in display order, or None if
+        Stripe is not configured
+    """
+    client = get_stripe_client()
+    if client is None:
+        return None
+
+    def fetch() -> List[Dict[str, Any]]:
+        prices = client.v1.prices.list(params={
+            "active": True,
+            "type": "recurring",
+            "expand": ["data.product"],
+            "limit": 100,
+        })
+        return [_as_dict(price) for price in prices.auto_paging_iter()]
+
+    prices = get_stripe_upstream().call(fetch, idempotent=True)
+
+    plans = [
+        _plan_from_price(price) for price in prices
+        if (price.get("product") or {}).get("active", True)
+    ]
+    plans.sort(key=lambda plan: (
+        plan["order"] is None, plan["order"] or 0, plan["unit_amount"] or 0))
+    return plans
+
+
+class PlanCatalog:
+    """In-memory plan index with stale-while-revalidate refresh."""
+
+    def __init__(
+        self,
+        ttl: float = PLAN_CATALOG_TTL,
+        snapshot_path: Optional[str] = PLAN_SNAPSHOT_PATH,
+        loader=load_plans_from_stripe
+    ):
+        """
+        Initialize the catalog from its snapshot or the placeholder plans.
+
+        Args:
+            ttl: Seconds before plans are refreshed
+            snapshot_path: File the catalog is saved to after each load
+                (None to disable snapshots)
+            loader: Returns the current plans, or None if unavailable
+        """
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._loaded_at = 0.0
+        # Failed loads in a row, and when the next one may be attempted
+        self._failed_loads = 0
+        self._retry_at = 0.0
+        self._source = "default"
+        self._refreshes = 0
+        self._failures = 0
+        self._index(DEFAULT_PLANS)
+        self._load_snapshot()
+
+    def _index(self, plans: List[Dict[str, Any]]) -> None:
+        """Swap in a new plan list and its lookup indexes."""
+        by_id = {plan["id"]: plan for plan in plans}
+        by_lookup_key = {
+            plan["lookup_key"]: plan for plan in plans if plan.get("lookup_key")}
+        by_price_id = {plan["price_id"]: plan for plan in plans}
+        # Build first, then assign, so readers never see a half-built index
+        self._plans, self._by_id, self._by_lookup_key, self._by_price_id = (
+            plans, by_id, by_lookup_key, by_price_id)
+
+    def _load_snapshot(self) -> None:
+        """Serve the last saved plans on a cold start."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as snapshot:
+                data = json.load(snapshot)
+            self._index(data["plans"])
+            # Keep the snapshot's age so it is refreshed when already stale
+            self._loaded_at = float(data["saved_at"])
+            self._source = "snapshot"
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error reading plan snapshot: {str(e)}")
+
+    def _save_snapshot(self, plans: List[Dict[str, Any]]) -> None:
+        """Write plans to the snapshot file atomically."""
+        if not self.snapshot_path:
+            return
+        try:
+            directory = os.path.dirname(self.snapshot_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as snapshot:
+                json.dump({"saved_at": time.time(), "plans": plans}, snapshot)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Error writing plan snapshot: {str(e)}")
+
+    def refresh(self) -> bool:
+        """
+        Load plans now, keeping the current ones if loading fails.
+
+        Returns:
+            bool: True if new plans were loaded
+        """
+        try:
+            plans = self.loader()
+        except Exception as e:
+            print(f"Error loading plans from Stripe: {str(e)}")
+            plans = None
+
+        with self._lock:
+            self._refreshing = False
+            if not plans:
+                # Keep the plans' age and retry with a backoff, so a cold
+                # start does not wait a whole TTL for Stripe to come back
+                self._failures += 1
+                self._failed_loads += 1
+                delay = PLAN_CATALOG_RETRY_DELAY * 2 ** (self._failed_loads - 1)
+                self._retry_at = time.time() + min(delay, self.ttl)
+                return False
+            self._index(plans)
+            self._loaded_at = time.time()
+            self._failed_loads = 0
+            self._retry_at = 0.0
+            self._source = "stripe"
+            self._refreshes += 1
+
+        self._save_snapshot(plans)
+        return True
+
+    def _revalidate(self) -> None:
+        """Start a background refresh if the plans are stale."""
+        with self._lock:
+            now = time.time()
+            if (self._refreshing or now - self._loaded_at < self.ttl
+                    or now < self._retry_at):
+                return
+            self._refreshing = True
+
+        threading.Thread(
+            target=self.refresh, name="litkit-plan-catalog", daemon=True).start()
+
+    def get_plans(self) -> List[Dict[str, Any]]:
+        """
+        Get the plans in display order without waiting on Stripe.
+
+        Returns:
+            List[Dict[str, Any]]: Plans (treat them as read-only)
+        """
+        self._revalidate()
+        return list(self._plans)
+
+    def get_plan(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a plan by id.
+
+        Args:
+            plan_id: Plan id
+
+        Returns:
+            Optional[Dict[str, Any]]: The plan, or None if unknown
+        """
+        self._revalidate()
+        return self._by_id.get(plan_id)
+
+    def get_plan_by_lookup_key(self, lookup_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a plan by its Stripe price lookup_key.
+
+        Args:
+            lookup_key: Price lookup key
+
+        Returns:
+            Optional[Dict[str, Any]]: The plan, or None if unknown
+        """
+        self._revalidate()
+        return self._by_lookup_key.get(lookup_key)
+
+    def get_plan_by_price_id(self, price_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a plan by its Stripe price id.
+
+        Args:
+            price_id: Stripe price id
+
+        Returns:
+            Optional[Dict[str, Any]]: The plan, or None if unknown
+        """
+        self._revalidate()
+        return self._by_price_id.get(price_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get catalog state.
+
+        Returns:
+            Dict[str, Any]: Plan count, source, age and refresh counters
+        """
+        with self._lock:
+            return {
+                "plans": len(self._plans),
+                "source": self._source,
+                "age": time.time() - self._loaded_at,
+                "refreshing": self._refreshing,
+                "refreshes": self._refreshes,
+                "failures": self._failures,
+            }
+
+
+_catalog: Optional[PlanCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_plan_catalog() -> PlanCatalog:
+    """
+    Get the process-wide plan catalog, creating it on first use.
+
+    Returns:
+        PlanCatalog: The catalog
+    """
+    global _catalog
+
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = PlanCatalog()
+    return _catalog
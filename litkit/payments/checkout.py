@@ -2,20 +2,112 @@
 Stripe checkout session management.
 
 This module provides functions for creating and managing Stripe checkout sessions.
+
+Open sessions are reused per (user, price, mode, quantity, URLs) until shortly
+before they expire, so Streamlit reruns and repeated clicks send the user back
+to the same checkout instead of creating a new session each time. Cached
+sessions are trusted without asking Stripe; they are dropped when the
+completion webhook's database writes arrive through the change listener, or
+when the caller reports that the redirect to them failed (``retry=True``).
+Creation uses a deterministic idempotency key, so concurrent clicks that reach
+Stripe from different sessions or replicas also get the same session.
 """
 
+import hashlib
 import os
-from typing import Dict, Any, Optional
+import threading
+import time
+from typing import Dict, Any, Hashable, Optional
 import streamlit as st
-from .stripe_client import check_stripe_configured, initialize_stripe
+from .customers import get_or_create_customer
+from .stripe_client import (
+    StripeConfigurationError,
+    get_stripe_client,
+    get_stripe_secrets,
+    get_stripe_upstream,
+)
+from ..database.notifications import register_change_handler
+from ..utils.cache import TTLCache
+
+# Maximum number of open checkout sessions remembered per process
+CHECKOUT_SESSION_CACHE_SIZE = int(
+    os.getenv("LITKIT_CHECKOUT_SESSION_CACHE_SIZE", "1024"))
+
+# Seconds before a session's expiry at which it is no longer handed out
+CHECKOUT_SESSION_EXPIRY_MARGIN = 300
+
+# Seconds during which identical checkout requests share an idempotency key
+CHECKOUT_IDEMPOTENCY_WINDOW = int(
+    os.getenv("LITKIT_CHECKOUT_IDEMPOTENCY_WINDOW", "60"))
+
+# Longest lifetime of a Stripe checkout session, in seconds
+CHECKOUT_SESSION_MAX_AGE = 24 * 3600
+
+# (session id, URL) per checkout intent; entries get their own TTL from the
+# session's expires_at
+_session_cache = TTLCache(maxsize=CHECKOUT_SESSION_CACHE_SIZE, ttl=0)
+
+# Per-user generation, bumped when a purchase completes so the next checkout
+# uses new cache and idempotency keys instead of the completed session. An
+# evicted generation restarts at 0, so evicting one clears the session cache;
+# a replayed idempotency key is caught by the status check after creation.
+_generations = TTLCache(
+    maxsize=CHECKOUT_SESSION_CACHE_SIZE, ttl=CHECKOUT_SESSION_MAX_AGE)
+_generations_lock = threading.Lock()
+
+
+def get_checkout_session_stats() -> Dict[str, Any]:
+    """
+    Get hit/miss/eviction statistics for the checkout session cache.
+
+    Returns:
+        Dict[str, Any]: Cache statistics
+    """
+    return _session_cache.stats()
+
+
+def invalidate_checkout_sessions(user_id: Optional[str] = None) -> None:
+    """
+    Stop reusing a user's checkout sessions (all users if user_id is None).
+
+    Args:
+        user_id: User whose purchase completed
+    """
+    if user_id is None:
+        _session_cache.clear()
+        return
+    with _generations_lock:
+        evictions = _generations.stats()["evictions"]
+        _generations.set(user_id, _generations.get(user_id, 0) + 1)
+        if _generations.stats()["evictions"] > evictions:
+            # The evicted user's generation restarts at 0, which could hand
+            # out a session cached before their purchase
+            _session_cache.clear()
+
+
+# A completed checkout writes a subscription or grants credits
+register_change_handler("subscriptions", invalidate_checkout_sessions)
+register_change_handler("credits", invalidate_checkout_sessions)
+
 
-# Try to import stripe, with graceful fallback if not installed
-try:
-    import stripe
-    STRIPE_AVAILABLE = True
-except ImportError:
-    STRIPE_AVAILABLE = False
-    stripe = None
+def _checkout_key(customer: str, params: Dict[str, Any]) -> Hashable:
+    """Identify a checkout intent by customer and session parameters."""
+    item = params["line_items"][0]
+    with _generations_lock:
+        generation = _generations.get(customer, 0)
+    return (
+        customer, generation, item["price"], params["mode"], item["quantity"],
+        params["success_url"], params["cancel_url"],
+    )
+
+
+def _idempotency_key(key: Hashable, customer_id: Optional[str]) -> str:
+    """Derive a Stripe idempotency key from a checkout intent and time window."""
+    window = int(time.time() // CHECKOUT_IDEMPOTENCY_WINDOW)
+    # Stripe rejects a reused key whose parameters differ, so include the customer
+    material = repr((key, customer_id, window))
+    digest = hashlib.sha256(material.encode("utf-8")).hexdigest()
+    return f"litkit-checkout-{digest[:40]}"
 
 
 def get_checkout_settings() -> Dict[str, Any]:
@@ -28,8 +120,8 @@ def get_checkout_settings() -> Dict[str, Any]:
     settings = {}
 
     # First try to get from Streamlit secrets
-    if hasattr(st, "secrets") and "stripe" in st.secrets:
-        secrets = st.secrets.get("stripe", {})
+    secrets = get_stripe_secrets()
+    if secrets:
         settings["price_id"] = secrets.get("PRICE_ID")
         settings["success_url"] = secrets.get("SUCCESS_URL")
         settings["cancel_url"] = secrets.get("CANCEL_URL")
@@ -49,27 +141,39 @@ def get_checkout_settings() -> Dict[str, Any]:
 
 def create_checkout_session(
     user_email: Optional[str] = None,
+    user_id: Optional[str] = None,
     success_url: Optional[str] = None,
     cancel_url: Optional[str] = None,
     price_id: Optional[str] = None,
     quantity: int = 1,
-    mode: str = "subscription"
+    mode: str = "subscription",
+    retry: bool = False
 ) -> Optional[str]:
     """
     Create a Stripe checkout session.
 
     Args:
-        user_email: Email of the user making the purchase
+        user_email: Email of the user making the purchase (used when no
+            Stripe customer can be resolved for user_id)
+        user_id: Supabase user ID, passed to Stripe as client_reference_id
+            so the webhook can find the user without an email lookup
         success_url: URL to redirect to after successful payment
         cancel_url: URL to redirect to after cancelled payment
         price_id: Stripe Price ID for the subscription or product
         quantity: Quantity to purchase (default: 1)
         mode: 'subscription' or 'payment' (one-time)
+        retry: The redirect to the session returned earlier failed, e.g. it
+            was paid or expired before the webhook arrived; create a new one
 
     Returns:
         Optional[str]: URL for the checkout session or None if creation failed
     """
-    if not check_stripe_configured() or not initialize_stripe():
+    try:
+        client = get_stripe_client()
+    except StripeConfigurationError as e:
+        st.error(str(e))
+        return None
+    if client is None:
         st.error(
             "Stripe is not properly configured. Please set up your Stripe credentials.")
         return None
@@ -115,12 +219,70 @@ def create_checkout_session(
             "cancel_url": settings["cancel_url"],
         }
 
-        # Add customer email if provided
-        if user_email:
+        # Let the webhook resolve the user directly
+        if user_id:
+            checkout_params["client_reference_id"] = user_id
+            checkout_params["metadata"] = {"user_id": user_id}
+            if mode == "subscription":
+                checkout_params["subscription_data"] = {
+                    "metadata": {"user_id": user_id}}
+
+        # Anonymous checkouts are neither reused nor deduplicated
+        customer = user_id or user_email
+        if not customer:
+            # Not retried: without an idempotency key it could create two sessions
+            checkout_session = get_stripe_upstream().call(
+                lambda: client.v1.checkout.sessions.create(params=checkout_params))
+            return checkout_session.url
+
+        key = _checkout_key(customer, checkout_params)
+        if retry:
+            # Start a new generation so the idempotency key does not replay
+            # the failed session either
+            _session_cache.invalidate(key)
+            invalidate_checkout_sessions(customer)
+            key = _checkout_key(customer, checkout_params)
+
+        cached = _session_cache.get(key)
+        if cached:
+            return cached[1]
+
+        # Reuse the user's Stripe customer instead of matching by email
+        customer_id = None
+        if user_id:
+            try:
+                customer_id = get_or_create_customer(user_id, user_email)
+            except Exception as e:
+                # Checkout still works with the email alone
+                print(f"Error resolving Stripe customer: {str(e)}")
+
+        if customer_id:
+            checkout_params["customer"] = customer_id
+        elif user_email:
             checkout_params["customer_email"] = user_email
 
-        # Create the checkout session
-        checkout_session = stripe.checkout.Session.create(**checkout_params)
+        def create(key: Hashable) -> Any:
+            # The idempotency key makes retries replay the same session
+            idempotency_key = _idempotency_key(key, customer_id)
+            return get_stripe_upstream().call(
+                lambda: client.v1.checkout.sessions.create(
+                    params=checkout_params,
+                    options={"idempotency_key": idempotency_key}),
+                idempotent=True)
+
+        checkout_session = create(key)
+
+        # An idempotent replay may return a session completed since
+        if checkout_session.status != "open":
+            invalidate_checkout_sessions(customer)
+            key = _checkout_key(customer, checkout_params)
+            checkout_session = create(key)
+
+        ttl = (checkout_session.expires_at - time.time()
+               - CHECKOUT_SESSION_EXPIRY_MARGIN)
+        if ttl > 0:
+            _session_cache.set(
+                key, (checkout_session.id, checkout_session.url), ttl=ttl)
 
         return checkout_session.url
     except Exception as e:
@@ -0,0 +1,50 @@
+"""
+Stripe customer management.
+
+Each user gets exactly one Stripe customer, recorded in the
+``stripe_customers`` table (see sql/stripe/stripe_customers.sql) and cached
+per process, so repeat checkouts pass ``customer=`` without any Stripe call.
+"""
+
+from typing import Optional
+from .stripe_client import get_stripe_client, get_stripe_upstream
+from ..database.payments_db import get_stripe_customer_id, save_stripe_customer_id
+from ..utils.singleflight import single_flight
+
+
+@single_flight(key=lambda user_id, email=None: user_id)
+def get_or_create_customer(user_id: str, email: Optional[str] = None) -> Optional[str]:
+    """
+    Get a user's Stripe customer, creating and recording it on first use.
+
+    Creation uses an idempotency key derived from the user ID, so concurrent
+    first checkouts from several processes create a single customer.
+
+    Args:
+        user_id: Supabase user ID
+        email: Email to set on a newly created customer
+
+    Returns:
+        Optional[str]: Stripe customer ID, or None if Stripe is not configured
+    """
+    customer_id = get_stripe_customer_id(user_id)
+    if customer_id:
+        return customer_id
+
+    client = get_stripe_client()
+    if client is None:
+        return None
+
+    params = {"metadata": {"user_id": user_id}}
+    if email:
+        params["email"] = email
+
+    # Safe to retry: the idempotency key replays the first customer
+    customer = get_stripe_upstream().call(
+        lambda: client.v1.customers.create(
+            params=params,
+            options={"idempotency_key": f"litkit-customer-{user_id}"}),
+        idempotent=True)
+
+    # The mapping may already point at another customer if one was saved first
+    return save_stripe_customer_id(user_id, customer.id) or customer.id
@@ -2,12 +2,25 @@
 Stripe client configuration.
 
 This module sets up the connection to Stripe for payment processing.
+
+Settings are read once per process into a ``StripeConfig`` snapshot, and all
+API calls go through one lazily created ``stripe.StripeClient``. That client
+sends requests over a shared keep-alive httpx pool, with limits, timeouts and
+network retries that are configurable through environment variables. A key
+that is set but invalid raises ``StripeConfigurationError`` when the client
+is first created; call ``initialize_stripe()`` at startup to fail there
+rather than on the first payment.
 """
 
 import os
-from typing import Optional
+import ssl
+import threading
+from typing import Any, List, Mapping, NoReturn, Optional
+import httpx
 import streamlit as st
 from dotenv import load_dotenv
+from ..utils.error_handling import PaymentError
+from ..utils.resilience import Upstream, get_upstream
 
 # Try to import stripe, with graceful fallback if not installed
 try:
@@ -20,7 +33,141 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
-# Load Stripe credentials from environment variables or Streamlit secrets
+# Connection pool settings for Stripe API requests
+STRIPE_POOL_MAX_CONNECTIONS = int(os.getenv("STRIPE_POOL_MAX_CONNECTIONS", "20"))
+STRIPE_POOL_MAX_KEEPALIVE = int(os.getenv("STRIPE_POOL_MAX_KEEPALIVE", "10"))
+STRIPE_POOL_KEEPALIVE_EXPIRY = float(os.getenv("STRIPE_POOL_KEEPALIVE_EXPIRY", "30"))
+STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT", "5"))
+STRIPE_REQUEST_TIMEOUT = float(os.getenv("STRIPE_REQUEST_TIMEOUT", "10"))
+STRIPE_POOL_TIMEOUT = float(os.getenv("STRIPE_POOL_TIMEOUT", "5"))
+
+# Retries made by the Stripe library itself on network errors and 409/5xx
+# responses; the upstream deadline (LITKIT_UPSTREAM_TIMEOUT) still bounds them
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "1"))
+
+
+class StripeConfigurationError(PaymentError):
+    """Raised when Stripe credentials are present but invalid."""
+    pass
+
+
+def get_stripe_secrets() -> Mapping[str, Any]:
+    """
+    Get the [stripe] section of the Streamlit secrets.
+
+    Returns:
+        Mapping[str, Any]: The section, or an empty dict if there is no
+        secrets file or no such section
+    """
+    try:
+        if hasattr(st, "secrets") and "stripe" in st.secrets:
+            return st.secrets["stripe"]
+    except FileNotFoundError:
+        # Raised by st.secrets when no secrets.toml exists
+        pass
+    return {}
+
+
+class StripeConfig:
+    """Snapshot of the Stripe settings, read once per process."""
+
+    __slots__ = ("api_key", "payment_mode")
+
+    def __init__(self, api_key: Optional[str], payment_mode: str):
+        """
+        Initialize the snapshot.
+
+        Args:
+            api_key: Secret or restricted API key for the payment mode
+            payment_mode: 'test' or 'live'
+        """
+        self.api_key = api_key
+        self.payment_mode = payment_mode
+
+    @classmethod
+    def load(cls) -> "StripeConfig":
+        """
+        Read the settings from Streamlit secrets, falling back to the environment.
+
+        Returns:
+            StripeConfig: The current settings
+        """
+        # First try to get from Streamlit secrets
+        secrets = get_stripe_secrets()
+        if secrets:
+            payment_mode = secrets.get("PAYMENT_MODE", "test")
+            key_name = "API_KEY_TEST" if payment_mode == "test" else "API_KEY"
+            return cls(secrets.get(key_name), payment_mode)
+
+        # Fallback to environment variables
+        payment_mode = os.getenv("STRIPE_PAYMENT_MODE", "test")
+        key_name = "STRIPE_API_KEY_TEST" if payment_mode == "test" else "STRIPE_API_KEY"
+        return cls(os.getenv(key_name), payment_mode)
+
+    def problems(self) -> List[str]:
+        """
+        Check the settings for mistakes.
+
+        Returns:
+            List[str]: Descriptions of every problem found (empty if valid)
+        """
+        problems = []
+        if self.payment_mode not in ("test", "live"):
+            problems.append(
+                f"payment mode must be 'test' or 'live', not {self.payment_mode!r}")
+
+        if self.api_key:
+            if not self.api_key.startswith(("sk_", "rk_")):
+                problems.append(
+                    "API key must be a secret (sk_) or restricted (rk_) key")
+            elif self.payment_mode in ("test", "live") and \
+                    f"_{self.payment_mode}_" not in self.api_key:
+                problems.append(
+                    f"API key is not a {self.payment_mode} mode key")
+
+            if not STRIPE_AVAILABLE:
+                problems.append(
+                    "the stripe package is not installed (pip install stripe)")
+            elif not hasattr(stripe, "V1Services"):
+                problems.append("stripe>=12.5.0 is required")
+        return problems
+
+
+_lock = threading.Lock()
+_config: Optional[StripeConfig] = None
+_http_client: Optional[httpx.Client] = None
+_stripe_client: Optional[Any] = None
+
+
+def get_stripe_config() -> StripeConfig:
+    """
+    Get the process-wide settings snapshot, reading it on first use.
+
+    Returns:
+        StripeConfig: The settings
+    """
+    global _config
+
+    if _config is None:
+        with _lock:
+            if _config is None:
+                _config = StripeConfig.load()
+    return _config
+
+
+def validate_stripe_config() -> None:
+    """
+    Check the settings snapshot.
+
+    Raises:
+        StripeConfigurationError: If any setting is invalid
+    """
+    problems = get_stripe_config().problems()
+    if problems:
+        raise StripeConfigurationError(
+            "Stripe is misconfigured: " + "; ".join(problems) + ".",
+            {"problems": problems},
+        )
 
 
 def get_stripe_key() -> Optional[str]:
@@ -30,46 +177,194 @@ def get_stripe_key() -> Optional[str]:
     Returns:
         Optional[str]: Stripe API key or None if not configured
     """
-    # First try to get from Streamlit secrets
-    if hasattr(st, "secrets") and "stripe" in st.secrets:
-        # Check if we're in test mode
-        if st.secrets.get("stripe", {}).get("PAYMENT_MODE", "test") == "test":
-            return st.secrets.get("stripe", {}).get("API_KEY_TEST")
-        else:
-            return st.secrets.get("stripe", {}).get("API_KEY")
+    return get_stripe_config().api_key
+
+
+if STRIPE_AVAILABLE:
+    class PooledHTTPClient(stripe.HTTPClient):
+        """Stripe transport that sends requests over a given httpx client."""
+
+        name = "litkit-httpx"
+
+        def __init__(self, client: httpx.Client):
+            """
+            Initialize the transport.
+
+            Args:
+                client: httpx client to send requests with (closed by close())
+            """
+            super().__init__()
+            self.client = client
+
+        def request(
+            self,
+            method: str,
+            url: str,
+            headers: Mapping[str, str],
+            post_data: Any = None
+        ) -> Any:
+            """Send a request and return (body, status, headers)."""
+            try:
+                response = self.client.request(
+                    method, url, headers=headers, content=post_data)
+            except httpx.HTTPError as e:
+                self._handle_request_error(e)
+            return response.content, response.status_code, response.headers
+
+        def request_stream(
+            self,
+            method: str,
+            url: str,
+            headers: Mapping[str, str],
+            post_data: Any = None
+        ) -> Any:
+            """Send a request and return (body iterator, status, headers)."""
+            request = self.client.build_request(
+                method, url, headers=headers, content=post_data)
+            try:
+                response = self.client.send(request, stream=True)
+            except httpx.HTTPError as e:
+                self._handle_request_error(e)
+            return response.iter_bytes(), response.status_code, response.headers
+
+        def close(self) -> None:
+            """Close the httpx client and its connections."""
+            self.client.close()
+
+        def _handle_request_error(self, e: Exception) -> NoReturn:
+            """Raise a network error as a retryable APIConnectionError."""
+            raise stripe.APIConnectionError(
+                "Unexpected error communicating with Stripe "
+                f"(network error: {type(e).__name__}).",
+                should_retry=True,
+            ) from e
+
+
+def _create_http_client() -> httpx.Client:
+    """
+    Create the shared httpx client used for all Stripe requests.
+
+    Returns:
+        httpx.Client: A client backed by a bounded keep-alive connection pool.
+    """
+    limits = httpx.Limits(
+        max_connections=STRIPE_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=STRIPE_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=STRIPE_POOL_KEEPALIVE_EXPIRY,
+    )
+    return httpx.Client(
+        limits=limits,
+        timeout=_request_timeout(),
+        # Verify against Stripe's bundled certificates, like its default clients
+        verify=ssl.create_default_context(cafile=stripe.ca_bundle_path),
+    )
+
+
+def _request_timeout() -> httpx.Timeout:
+    """Timeouts applied to every Stripe request."""
+    return httpx.Timeout(
+        STRIPE_REQUEST_TIMEOUT,
+        connect=STRIPE_CONNECT_TIMEOUT,
+        pool=STRIPE_POOL_TIMEOUT,
+    )
+
+
+def _create_stripe_client(config: StripeConfig) -> Any:
+    """
+    Create the StripeClient that sends requests over the shared pool.
+
+    Args:
+        config: Validated settings with an API key
+
+    Returns:
+        stripe.StripeClient: The client
+    """
+    global _http_client
+
+    # Stripe's own HTTPXClient cannot be given pool limits, so requests go
+    # through a transport over the tuned, shared pool instead
+    _http_client = _create_http_client()
+
+    return stripe.StripeClient(
+        config.api_key,
+        http_client=PooledHTTPClient(_http_client),
+        max_network_retries=STRIPE_MAX_NETWORK_RETRIES,
+    )
+
+
+def get_stripe_client() -> Optional[Any]:
+    """
+    Get the shared StripeClient, creating it on first use.
 
-    # Fallback to environment variables
-    payment_mode = os.getenv("STRIPE_PAYMENT_MODE", "test")
-    if payment_mode == "test":
-        return os.getenv("STRIPE_API_KEY_TEST")
-    else:
-        return os.getenv("STRIPE_API_KEY")
+    Returns:
+        Optional[stripe.StripeClient]: The client, or None if no API key is
+        configured
+
+    Raises:
+        StripeConfigurationError: If an API key is set but the settings are invalid
+    """
+    global _stripe_client
+
+    if _stripe_client is None:
+        config = get_stripe_config()
+        if not config.api_key:
+            return None
+        validate_stripe_config()
+        with _lock:
+            if _stripe_client is None:
+                _stripe_client = _create_stripe_client(config)
+    return _stripe_client
+
+
+def reset_stripe_client() -> None:
+    """
+    Close the shared connection pool and drop the client and settings.
+
+    The next call to get_stripe_client() reads the settings again.
+    """
+    global _config, _http_client, _stripe_client
+
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _stripe_client = None
+        _config = None
 
 
 def initialize_stripe() -> bool:
     """
-    Initialize the Stripe client with the appropriate API key.
+    Make sure the shared Stripe client is available.
 
     Returns:
-        bool: True if Stripe was initialized successfully, False otherwise
+        bool: True if Stripe can be used, False if no API key is configured
+
+    Raises:
+        StripeConfigurationError: If an API key is set but the settings are invalid
     """
-    if not STRIPE_AVAILABLE:
-        print("Warning: Stripe Python package not installed.")
-        print("Please install it with: pip install stripe")
-        return False
+    return get_stripe_client() is not None
 
-    api_key = get_stripe_key()
-    if not api_key:
-        print("Warning: Stripe API key not found in environment variables or Streamlit secrets.")
-        print("Please set STRIPE_API_KEY_TEST or STRIPE_API_KEY in your .env file or Streamlit secrets.")
-        return False
 
-    try:
-        stripe.api_key = api_key
-        return True
-    except Exception as e:
-        print(f"Error initializing Stripe client: {e}")
-        return False
+def get_stripe_upstream() -> Upstream:
+    """
+    Get the resilience guard for Stripe API calls.
+
+    Card declines and invalid or unauthorized requests are the caller's
+    problem, so they never trip the circuit breaker.
+
+    Returns:
+        Upstream: Deadline, retry and circuit breaker guard for Stripe
+    """
+    ignored = ()
+    if STRIPE_AVAILABLE:
+        ignored = (
+            stripe.CardError,
+            stripe.InvalidRequestError,
+            stripe.AuthenticationError,
+            stripe.PermissionError,
+            stripe.IdempotencyError,
+        )
+    return get_upstream("stripe", ignored)
 
 
 def check_stripe_configured() -> bool:
@@ -122,3 +417,4 @@ def get_stripe_setup_instructions() -> str:
     ## Step 4: Set up Webhook
     Instructions for setting up webhooks will be provided separately.
     """
+
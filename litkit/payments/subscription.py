@@ -4,18 +4,10 @@ Stripe subscription management.
 This module provides functions for checking and managing Stripe subscriptions.
 """
 
-import os
 from typing import Dict, Any, Optional, List
 import streamlit as st
-from .stripe_client import check_stripe_configured, initialize_stripe
-
-# Try to import stripe, with graceful fallback if not installed
-try:
-    import stripe
-    STRIPE_AVAILABLE = True
-except ImportError:
-    STRIPE_AVAILABLE = False
-    stripe = None
+from .stripe_client import StripeConfigurationError, get_stripe_client
+from .catalog import get_plan_catalog
 
 
 def get_user_subscription(
@@ -32,7 +24,12 @@ def get_user_subscription(
     Returns:
         Optional[Dict[str, Any]]: Subscription details or None if not found
     """
-    if not check_stripe_configured() or not initialize_stripe():
+    try:
+        client = get_stripe_client()
+    except StripeConfigurationError as e:
+        st.error(str(e))
+        return None
+    if client is None:
         st.error("Stripe is not properly configured.")
         return None
 
@@ -64,40 +61,13 @@ def get_subscription_plans() -> List[Dict[str, Any]]:
     """
     Get available subscription plans.
 
+    Plans come from the Stripe-backed catalog and are served from memory;
+    stale plans are refreshed in the background (see catalog.py).
+
     Returns:
         List[Dict[str, Any]]: List of subscription plans
     """
-    # In a real implementation, this would fetch plans from Stripe
-    # For scaffolding, we'll return placeholder data
-    return [
-        {
-            "id": "basic",
-            "name": "Basic",
-            "description": "Essential features for individuals",
-            "price": "$9.99/month",
-            "features": [
-                "Access to basic features",
-                "Email support",
-                "1 project"
-            ],
-            "price_id": os.getenv("STRIPE_PRICE_ID", "price_placeholder"),
-            "highlighted": False
-        },
-        {
-            "id": "pro",
-            "name": "Professional",
-            "description": "Advanced features for professionals",
-            "price": "$19.99/month",
-            "features": [
-                "Access to all features",
-                "Priority support",
-                "Unlimited projects",
-                "Advanced analytics"
-            ],
-            "price_id": os.getenv("STRIPE_PRO_PRICE_ID", "price_pro_placeholder"),
-            "highlighted": True
-        }
-    ]
+    return get_plan_catalog().get_plans()
 
 
 def add_subscription(
@@ -0,0 +1,170 @@
+"""
+In-process caching utilities for LitKit.
+
+This module provides a bounded, thread-safe TTL cache with read-through
+loading and hit/miss/eviction statistics, shared by every Streamlit session
+in the process.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a fixed time-to-live."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries before the least recently
+                used one is evicted
+            ttl: Seconds an entry stays valid
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        # Bumped on every invalidation so in-flight loads never cache stale data
+        self._version = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value.
+
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing or expired
+
+        Returns:
+            Any: The cached value or the default
+        """
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: Value to cache (None is a valid cached value)
+            ttl: Time-to-live for this entry (defaults to the cache TTL)
+        """
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], T]) -> T:
+        """
+        Get a cached value, calling the loader and caching its result on a miss.
+
+        Exceptions raised by the loader propagate and nothing is cached.
+
+        Args:
+            key: Cache key
+            loader: Function producing the value
+
+        Returns:
+            T: The cached or freshly loaded value
+        """
+        with self._lock:
+            value = self._lookup(key)
+            version = self._version
+        if value is not _MISSING:
+            return value
+
+        value = loader()
+        with self._lock:
+            # Skip caching if invalidated while loading; the value may be stale
+            if version == self._version:
+                self._store(key, value, None)
+        return value
+
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Remove an entry.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            bool: True if an entry was removed
+        """
+        with self._lock:
+            self._version += 1
+            if self._data.pop(key, _MISSING) is _MISSING:
+                return False
+            self._invalidations += 1
+            return True
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._version += 1
+            self._invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict[str, Any]: Size, limits and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        """Insert an entry and evict if over capacity (caller holds the lock)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._evictions += 1
+
+    def _lookup(self, key: Hashable) -> Any:
+        """Find a live entry and update counters (caller holds the lock)."""
+        entry = self._data.get(key)
+        if entry is None:
+            self._misses += 1
+            return _MISSING
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self._expirations += 1
+            self._misses += 1
+            return _MISSING
+
+        self._data.move_to_end(key)
+        self._hits += 1
+        return value
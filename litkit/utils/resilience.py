@@ -0,0 +1,419 @@
+"""
+Resilience utilities for calls to backend services.
+
+Every call to an upstream (Supabase, the direct Postgres pool, Stripe) goes
+through an ``Upstream`` that applies:
+
+- a per-call deadline: the call runs on the upstream's bounded worker pool,
+  so a hung request gives the Streamlit script thread back after ``timeout``
+  seconds instead of blocking it indefinitely. The deadline starts once a
+  worker is free; a call that cannot get a worker within ``timeout`` fails
+  with ``UpstreamBusyError`` and does not count against the breaker
+- jittered exponential retries, only for calls marked idempotent (reads)
+- a circuit breaker that fails fast while the upstream is unhealthy and lets
+  a single trial call through after ``reset_timeout`` seconds
+
+Breaker state transitions are counted, printed, and passed to listeners
+registered with ``add_transition_listener`` so they can be exported as
+metrics.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+from .error_handling import LitKitError
+
+T = TypeVar('T')
+
+# Default deadline for one attempt, in seconds
+UPSTREAM_TIMEOUT = float(os.getenv("LITKIT_UPSTREAM_TIMEOUT", "10"))
+
+# Extra attempts for idempotent calls and the base backoff between them
+UPSTREAM_READ_RETRIES = int(os.getenv("LITKIT_UPSTREAM_READ_RETRIES", "2"))
+UPSTREAM_RETRY_BACKOFF = float(os.getenv("LITKIT_UPSTREAM_RETRY_BACKOFF", "0.2"))
+
+# Consecutive failures that open a breaker, and seconds before a trial call
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LITKIT_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("LITKIT_BREAKER_RESET_TIMEOUT", "30"))
+
+# Worker threads per upstream; bounds how many calls can hang at once.
+# LITKIT_UPSTREAM_WORKERS_<NAME> (e.g. LITKIT_UPSTREAM_WORKERS_STRIPE)
+# overrides it for one upstream.
+UPSTREAM_WORKERS = int(os.getenv("LITKIT_UPSTREAM_WORKERS", "16"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+TransitionListener = Callable[[str, str, str], None]
+
+
+class CircuitOpenError(LitKitError):
+    """Raised when a call is rejected because the upstream's breaker is open."""
+
+    def __init__(self, upstream: str):
+        super().__init__(
+            f"{upstream} is temporarily unavailable, please try again shortly.",
+            {"upstream": upstream},
+        )
+
+
+class DeadlineExceededError(LitKitError):
+    """Raised when a call does not finish within its deadline."""
+
+    def __init__(self, upstream: str, timeout: float):
+        super().__init__(
+            f"{upstream} did not respond within {timeout:g} seconds.",
+            {"upstream": upstream, "timeout": timeout},
+        )
+
+
+class UpstreamBusyError(LitKitError):
+    """Raised when every worker of an upstream stays busy for the whole deadline."""
+
+    def __init__(self, upstream: str, timeout: float):
+        super().__init__(
+            f"{upstream} is busy, please try again shortly.",
+            {"upstream": upstream, "timeout": timeout},
+        )
+
+
+_listeners: List[TransitionListener] = []
+
+
+def add_transition_listener(listener: TransitionListener) -> None:
+    """
+    Register a function called on every breaker state transition.
+
+    Args:
+        listener: Called with (upstream name, old state, new state)
+    """
+    _listeners.append(listener)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open trial state."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT
+    ):
+        """
+        Initialize a closed breaker.
+
+        Args:
+            name: Upstream name, used in metrics and messages
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._rejected = 0
+        self._transitions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state: 'closed', 'open' or 'half_open'."""
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may proceed, moving from open to half-open
+        once the reset timeout has passed.
+
+        Returns:
+            bool: True if the call may proceed
+        """
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._rejected += 1
+                    return False
+                self._transition(HALF_OPEN)
+
+            if self._state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self._rejected += 1
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the breaker if it was half-open."""
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the breaker past the threshold."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or (
+                    self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def release(self) -> None:
+        """End a call that neither succeeded nor failed (e.g. a client error)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _transition(self, state: str) -> None:
+        """Change state and report it (caller holds the lock)."""
+        old, self._state = self._state, state
+        key = f"{old}->{state}"
+        self._transitions[key] = self._transitions.get(key, 0) + 1
+        print(f"Circuit breaker '{self.name}': {old} -> {state}")
+        for listener in list(_listeners):
+            try:
+                listener(self.name, old, state)
+            except Exception as e:
+                print(f"Error in circuit breaker listener: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get breaker metrics.
+
+        Returns:
+            Dict[str, Any]: State, consecutive failures, rejected calls and
+            transition counts keyed by 'old->new'
+        """
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "rejected": self._rejected,
+                "transitions": dict(self._transitions),
+            }
+
+
+class Upstream:
+    """A backend service guarded by a deadline, retries and a breaker."""
+
+    def __init__(
+        self,
+        name: str,
+        timeout: Optional[float] = UPSTREAM_TIMEOUT,
+        read_retries: int = UPSTREAM_READ_RETRIES,
+        ignored_errors: Tuple[Type[BaseException], ...] = (),
+        workers: int = UPSTREAM_WORKERS,
+        is_request_error: Optional[Callable[[BaseException], bool]] = None
+    ):
+        """
+        Initialize the upstream.
+
+        Args:
+            name: Upstream name, e.g. 'supabase' or 'stripe'
+            timeout: Default deadline per attempt in seconds (None for no deadline)
+            read_retries: Extra attempts for idempotent calls
+            ignored_errors: Exceptions caused by the request rather than the
+                upstream's health; they are raised at once and never retried
+                or counted against the breaker
+            workers: Maximum number of calls running at once
+            is_request_error: Further check for an instance of
+                ``ignored_errors``, for error types that also report upstream
+                failures (e.g. HTTP 5xx); only errors it returns True for
+                are ignored
+        """
+        self.name = name
+        self.timeout = timeout
+        self.read_retries = read_retries
+        self.ignored_errors = ignored_errors
+        self.is_request_error = is_request_error
+        self.breaker = CircuitBreaker(name)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=f"litkit-{name}")
+        # Held from submission until the call returns, even after its
+        # deadline, so a submitted call never waits in the executor's queue
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._retries = 0
+        self._timeouts = 0
+        self._failures = 0
+        self._busy = 0
+
+    def call(
+        self,
+        func: Callable[[], T],
+        idempotent: bool = False,
+        timeout: Optional[float] = None
+    ) -> T:
+        """
+        Run a call against the upstream.
+
+        Args:
+            func: Function performing the call, without arguments
+            idempotent: Whether the call may be retried (reads only)
+            timeout: Deadline per attempt (defaults to the upstream's)
+
+        Returns:
+            T: The call's result
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call
+            UpstreamBusyError: If no worker became free within the deadline
+            DeadlineExceededError: If the last attempt timed out
+            Exception: Whatever the last attempt raised
+        """
+        timeout = self.timeout if timeout is None else timeout
+        attempts = 1 + (self.read_retries if idempotent else 0)
+
+        with self._lock:
+            self._calls += 1
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise CircuitOpenError(self.name)
+
+            try:
+                result = self._run(func, timeout)
+            except UpstreamBusyError:
+                # Local saturation says nothing about the upstream's health
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if self._is_ignored(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                with self._lock:
+                    self._failures += 1
+                if attempt == attempts - 1:
+                    raise
+            else:
+                self.breaker.record_success()
+                return result
+
+            # Full jitter keeps retrying sessions from hitting the upstream in sync
+            with self._lock:
+                self._retries += 1
+            time.sleep(random.uniform(0, UPSTREAM_RETRY_BACKOFF * 2 ** attempt))
+
+        raise AssertionError("unreachable")
+
+    def _is_ignored(self, error: BaseException) -> bool:
+        """Check whether an error was caused by the request itself."""
+        if not isinstance(error, self.ignored_errors):
+            return False
+        return self.is_request_error is None or self.is_request_error(error)
+
+    def _run(self, func: Callable[[], T], timeout: Optional[float]) -> T:
+        """Run one attempt, on the worker pool when a deadline applies."""
+        if not timeout:
+            return func()
+
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._busy += 1
+            raise UpstreamBusyError(self.name, timeout)
+        try:
+            future = self._executor.submit(func)
+        except RuntimeError:
+            # The pool refuses work once the interpreter is shutting down,
+            # e.g. for atexit handlers; run without a deadline instead
+            self._slots.release()
+            return func()
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        # A slot guarantees an idle worker, so the deadline covers only the call
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self._timeouts += 1
+            raise DeadlineExceededError(self.name, timeout) from None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get call and breaker metrics.
+
+        Returns:
+            Dict[str, Any]: Call, retry, timeout, failure and busy counts
+            plus the breaker's metrics
+        """
+        with self._lock:
+            stats = {
+                "calls": self._calls,
+                "retries": self._retries,
+                "timeouts": self._timeouts,
+                "failures": self._failures,
+                "busy": self._busy,
+            }
+        stats["breaker"] = self.breaker.stats()
+        return stats
+
+
+_upstreams: Dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(
+    name: str,
+    ignored_errors: Tuple[Type[BaseException], ...] = (),
+    is_request_error: Optional[Callable[[BaseException], bool]] = None
+) -> Upstream:
+    """
+    Get the process-wide guard for an upstream, creating it on first use.
+
+    The worker count is ``LITKIT_UPSTREAM_WORKERS_<NAME>`` if set, otherwise
+    ``LITKIT_UPSTREAM_WORKERS``.
+
+    Args:
+        name: Upstream name
+        ignored_errors: Request errors that must not trip the breaker (only
+            used when the upstream is created)
+        is_request_error: Further check for ``ignored_errors`` (only used when
+            the upstream is created)
+
+    Returns:
+        Upstream: The upstream
+    """
+    upstream = _upstreams.get(name)
+    if upstream is None:
+        with _upstreams_lock:
+            upstream = _upstreams.get(name)
+            if upstream is None:
+                workers = int(os.getenv(
+                    f"LITKIT_UPSTREAM_WORKERS_{name.upper()}", UPSTREAM_WORKERS))
+                upstream = Upstream(
+                    name,
+                    ignored_errors=ignored_errors,
+                    workers=workers,
+                    is_request_error=is_request_error,
+                )
+                _upstreams[name] = upstream
+    return upstream
+
+
+def get_resilience_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get metrics for every upstream.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Metrics keyed by upstream name
+    """
+    with _upstreams_lock:
+        upstreams = dict(_upstreams)
+    return {name: upstream.stats() for name, upstream in upstreams.items()}
@@ -0,0 +1,151 @@
+"""
+Single-flight request coalescing.
+
+When many sessions ask for the same thing at the same moment, only the first
+caller (the leader) runs the lookup; callers arriving while it is in flight
+wait for it and share its result or exception. Nothing is cached once the
+call completes; combine with ``TTLCache`` for that.
+"""
+
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class _Call:
+    """An in-flight call and its outcome."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution."""
+
+    def __init__(self, name: str = ""):
+        """
+        Initialize an empty group.
+
+        Args:
+            name: Name used in statistics
+        """
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._executions = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        """
+        Run ``func`` unless a call with the same key is already in flight,
+        in which case wait for that call and share its outcome.
+
+        Results are shared between callers, so treat them as read-only.
+
+        Args:
+            key: Identity of the call
+            func: Function performing the call
+
+        Returns:
+            T: The call's result
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters.
+
+        Returns:
+            Dict[str, int]: Executions, coalesced calls and calls in flight
+        """
+        with self._lock:
+            return {
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def _default_key(*args: Any, **kwargs: Any) -> Hashable:
+    """Key a call by its arguments."""
+    return (args, tuple(sorted(kwargs.items())))
+
+
+def single_flight(
+    key: Callable[..., Hashable] = _default_key,
+    name: Optional[str] = None
+) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorator coalescing concurrent calls of a function with equal arguments.
+
+    Args:
+        key: Builds the call key from the function's arguments
+        name: Group name in statistics (defaults to the function's qualified name)
+
+    Returns:
+        Decorator for lookup functions
+    """
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        group = SingleFlight(name or f"{func.__module__}.{func.__qualname__}")
+        with _groups_lock:
+            _groups[group.name] = group
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return group.do(
+                key(*args, **kwargs), lambda: func(*args, **kwargs))
+
+        wrapper.single_flight = group
+        return wrapper
+    return decorator
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get coalescing counters for every decorated function.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Counters keyed by group name
+    """
+    with _groups_lock:
+        groups = dict(_groups)
+    return {name: group.stats() for name, group in groups.items()}
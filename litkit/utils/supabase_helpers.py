@@ -8,7 +8,7 @@ import os
 from typing import Dict, Any, Optional
 import json
 import streamlit as st
-from ..auth.client import supabase_client
+from ..auth.client import get_supabase_client
 
 
 def check_supabase_configured() -> bool:
@@ -21,7 +21,7 @@ def check_supabase_configured() -> bool:
     return (
         os.getenv("SUPABASE_URL") is not None and
         os.getenv("SUPABASE_KEY") is not None and
-        supabase_client is not None
+        get_supabase_client() is not None
     )
 
 
@@ -34,7 +34,7 @@ def get_supabase_configuration_status() -> Dict[str, Any]:
     """
     url_configured = os.getenv("SUPABASE_URL") is not None
     key_configured = os.getenv("SUPABASE_KEY") is not None
-    client_initialized = supabase_client is not None
+    client_initialized = get_supabase_client() is not None
 
     return {
         "url_configured": url_configured,
@@ -88,7 +88,8 @@ def create_supabase_tables() -> bool:
     Returns:
         bool: True if successful, False otherwise
     """
-    if not supabase_client:
+    client = get_supabase_client()
+    if not client:
         return False
 
     try:
@@ -0,0 +1,50 @@
+-- Notify running apps when subscriptions or credits change, so their caches
+-- are invalidated immediately instead of waiting for a TTL.
+-- Each change publishes {"table", "op", "user_id"} on the litkit_changes
+-- channel (match LITKIT_CHANGE_CHANNEL if you change it). Notifications are
+-- delivered when the writing transaction commits.
+CREATE OR REPLACE FUNCTION public.notify_litkit_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  affected_user UUID;
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    affected_user := OLD.user_id;
+  ELSE
+    affected_user := NEW.user_id;
+  END IF;
+
+  PERFORM pg_notify(
+    'litkit_changes',
+    json_build_object(
+      'table', TG_TABLE_NAME,
+      'op', TG_OP,
+      'user_id', affected_user
+    )::text
+  );
+
+  -- A row moved to another user: that user's cache is stale too
+  IF TG_OP = 'UPDATE' AND OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+    PERFORM pg_notify(
+      'litkit_changes',
+      json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'user_id', OLD.user_id
+      )::text
+    );
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+DROP TRIGGER IF EXISTS subscriptions_notify_change ON public.subscriptions;
+CREATE TRIGGER subscriptions_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON public.subscriptions
+FOR EACH ROW EXECUTE FUNCTION public.notify_litkit_change();
+DROP TRIGGER IF EXISTS credits_notify_change ON public.credits;
+CREATE TRIGGER credits_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON public.credits
+FOR EACH ROW EXECUTE FUNCTION public.notify_litkit_change();
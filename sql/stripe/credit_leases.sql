@@ -0,0 +1,175 @@
+-- Credit leases: reserve a block of credits in one call, debit locally, and
+-- settle the unused remainder later. Requires credits_table.sql.
+CREATE TABLE IF NOT EXISTS public.credit_leases (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  reserved INTEGER NOT NULL CHECK (reserved > 0),
+  used INTEGER NOT NULL DEFAULT 0 CHECK (used >= 0 AND used <= reserved),
+  status TEXT NOT NULL DEFAULT 'open',
+  -- 'open', 'settled' or 'expired'
+  expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  settled_at TIMESTAMP WITH TIME ZONE
+);
+-- Set up RLS (Row Level Security) policies
+ALTER TABLE public.credit_leases ENABLE ROW LEVEL SECURITY;
+-- Policy to allow users to read only their own leases
+CREATE POLICY "Users can view their own credit leases" ON public.credit_leases FOR
+SELECT USING (auth.uid() = user_id);
+-- Leases are changed only through the functions below
+-- Create indexes for faster lookups
+CREATE INDEX IF NOT EXISTS idx_credit_leases_user_id ON public.credit_leases(user_id);
+CREATE INDEX IF NOT EXISTS idx_credit_leases_open_expires_at ON public.credit_leases(expires_at)
+WHERE status = 'open';
+
+-- Move up to p_amount credits from the balance into a new lease.
+-- Returns no row if the balance is empty.
+CREATE OR REPLACE FUNCTION public.reserve_credits(
+  p_user_id UUID,
+  p_amount INTEGER,
+  p_ttl_seconds INTEGER DEFAULT 900
+)
+RETURNS TABLE (lease_id UUID, lease_reserved INTEGER, lease_expires_at TIMESTAMP WITH TIME ZONE)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_balance INTEGER;
+  v_reserved INTEGER;
+BEGIN
+  IF auth.role() <> 'service_role' AND auth.uid() IS DISTINCT FROM p_user_id THEN
+    RAISE EXCEPTION 'Not allowed to reserve credits for another user'
+      USING ERRCODE = '42501';
+  END IF;
+
+  SELECT amount INTO v_balance
+  FROM public.credits
+  WHERE user_id = p_user_id
+  FOR UPDATE;
+
+  v_reserved := LEAST(COALESCE(v_balance, 0), p_amount);
+  IF v_reserved <= 0 THEN
+    RETURN;
+  END IF;
+
+  UPDATE public.credits
+  SET amount = amount - v_reserved,
+      updated_at = now()
+  WHERE user_id = p_user_id;
+
+  RETURN QUERY
+  INSERT INTO public.credit_leases (user_id, reserved, expires_at)
+  VALUES (p_user_id, v_reserved, now() + make_interval(secs => p_ttl_seconds))
+  RETURNING id, reserved, expires_at;
+END;
+$$;
+
+-- Record how much of an open lease has been used and push back its expiry,
+-- so a crash loses at most the debits since the last checkpoint. Only the
+-- service role may report usage (see the grants below).
+CREATE OR REPLACE FUNCTION public.checkpoint_credit_lease(
+  p_lease_id UUID,
+  p_used INTEGER,
+  p_ttl_seconds INTEGER DEFAULT 900
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE public.credit_leases
+  SET used = GREATEST(used, LEAST(p_used, reserved)),
+      expires_at = now() + make_interval(secs => p_ttl_seconds)
+  WHERE id = p_lease_id
+    AND status = 'open';
+
+  RETURN FOUND;
+END;
+$$;
+
+-- Close an open lease and return its unused credits to the balance.
+-- Returns the new balance, or NULL if the lease is not open. Service role
+-- only: a user settling their own lease at p_used = 0 would get back
+-- everything spent since the last checkpoint.
+CREATE OR REPLACE FUNCTION public.settle_credit_lease(p_lease_id UUID, p_used INTEGER)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_user_id UUID;
+  v_refund INTEGER;
+  v_balance INTEGER;
+BEGIN
+  UPDATE public.credit_leases
+  SET used = GREATEST(used, LEAST(p_used, reserved)),
+      status = 'settled',
+      settled_at = now()
+  WHERE id = p_lease_id
+    AND status = 'open'
+  RETURNING user_id, reserved - used INTO v_user_id, v_refund;
+
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  UPDATE public.credits
+  SET amount = amount + v_refund,
+      updated_at = now()
+  WHERE user_id = v_user_id
+  RETURNING amount INTO v_balance;
+
+  RETURN v_balance;
+END;
+$$;
+
+-- Settle leases whose holder disappeared (crash, lost session) using their
+-- last checkpoint. Schedule it, e.g. with pg_cron:
+--   SELECT cron.schedule('reconcile-credit-leases', '*/5 * * * *',
+--     'SELECT public.reconcile_expired_credit_leases()');
+CREATE OR REPLACE FUNCTION public.reconcile_expired_credit_leases()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_lease RECORD;
+  v_count INTEGER := 0;
+BEGIN
+  FOR v_lease IN
+    SELECT id, user_id, reserved - used AS refund
+    FROM public.credit_leases
+    WHERE status = 'open' AND expires_at < now()
+    FOR UPDATE SKIP LOCKED
+  LOOP
+    UPDATE public.credit_leases
+    SET status = 'expired', settled_at = now()
+    WHERE id = v_lease.id;
+
+    UPDATE public.credits
+    SET amount = amount + v_lease.refund,
+        updated_at = now()
+    WHERE user_id = v_lease.user_id;
+
+    v_count := v_count + 1;
+  END LOOP;
+
+  RETURN v_count;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.reserve_credits(UUID, INTEGER, INTEGER) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION public.checkpoint_credit_lease(UUID, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.settle_credit_lease(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.reconcile_expired_credit_leases() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.reserve_credits(UUID, INTEGER, INTEGER) TO authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.checkpoint_credit_lease(UUID, INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION public.settle_credit_lease(UUID, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION public.reconcile_expired_credit_leases() TO service_role;
+-- Comments for documentation
+COMMENT ON TABLE public.credit_leases IS 'Blocks of credits reserved by a session and debited locally';
+COMMENT ON COLUMN public.credit_leases.used IS 'Credits used as of the last checkpoint or settlement';
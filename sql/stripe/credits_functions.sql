@@ -0,0 +1,57 @@
+-- Atomic credit operations, called through RPC.
+-- Each function is a single statement, so concurrent calls never lose updates
+-- and the caller gets the new balance in one round trip.
+
+-- Add credits to a user's balance, creating the row if needed.
+-- Returns the new balance.
+CREATE OR REPLACE FUNCTION public.add_credits(p_user_id UUID, p_amount INTEGER)
+RETURNS INTEGER
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  INSERT INTO public.credits (user_id, amount)
+  VALUES (p_user_id, p_amount)
+  ON CONFLICT (user_id) DO UPDATE
+    SET amount = public.credits.amount + EXCLUDED.amount,
+        updated_at = now()
+  RETURNING amount;
+$$;
+
+-- Debit credits only if the balance covers the amount.
+-- Returns the new balance, or NULL if there are not enough credits.
+-- Users may only debit their own balance; the service role may debit any.
+CREATE OR REPLACE FUNCTION public.use_credits(p_user_id UUID, p_amount INTEGER)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  new_amount INTEGER;
+BEGIN
+  IF auth.role() <> 'service_role' AND auth.uid() IS DISTINCT FROM p_user_id THEN
+    RAISE EXCEPTION 'Not allowed to use credits for another user'
+      USING ERRCODE = '42501';
+  END IF;
+
+  IF p_amount < 0 THEN
+    RAISE EXCEPTION 'Amount must not be negative' USING ERRCODE = '22023';
+  END IF;
+
+  UPDATE public.credits
+  SET amount = amount - p_amount,
+      updated_at = now()
+  WHERE user_id = p_user_id
+    AND amount >= p_amount
+  RETURNING amount INTO new_amount;
+
+  RETURN new_amount;
+END;
+$$;
+
+-- Only the server (service role) may grant credits
+REVOKE EXECUTE ON FUNCTION public.add_credits(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.add_credits(UUID, INTEGER) TO service_role;
+REVOKE EXECUTE ON FUNCTION public.use_credits(UUID, INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION public.use_credits(UUID, INTEGER) TO authenticated, service_role;
@@ -0,0 +1,21 @@
+-- Create the credits table to store credit balances (one row per user)
+CREATE TABLE IF NOT EXISTS public.credits (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  user_id UUID NOT NULL UNIQUE REFERENCES auth.users(id) ON DELETE CASCADE,
+  amount INTEGER NOT NULL DEFAULT 0 CHECK (amount >= 0),
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+-- Set up RLS (Row Level Security) policies
+ALTER TABLE public.credits ENABLE ROW LEVEL SECURITY;
+-- Policy to allow users to read only their own balance
+CREATE POLICY "Users can view their own credits" ON public.credits FOR
+SELECT USING (auth.uid() = user_id);
+-- Policy to allow users to create their own (empty) balance row
+CREATE POLICY "Users can create their own credits" ON public.credits FOR
+INSERT WITH CHECK (auth.uid() = user_id AND amount = 0);
+-- Balances are changed only through the functions in credits_functions.sql
+-- Comments for documentation
+COMMENT ON TABLE public.credits IS 'Stores credit balances for users';
+COMMENT ON COLUMN public.credits.user_id IS 'References the user in auth.users';
+COMMENT ON COLUMN public.credits.amount IS 'Current number of credits available';
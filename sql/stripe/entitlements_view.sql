@@ -0,0 +1,25 @@
+-- Current entitlements: one row per active subscription that has not ended.
+-- "Is this user entitled to plan X" becomes a single probe of the partial
+-- index below, and many users can be checked with one "user_id IN (...)" query.
+-- On a large live table, run the index statement on its own with
+-- CREATE INDEX CONCURRENTLY to avoid blocking writes.
+CREATE INDEX IF NOT EXISTS idx_subscriptions_active_entitlements ON public.subscriptions(user_id, price_id, current_period_end)
+WHERE status = 'active';
+-- security_invoker keeps the subscriptions RLS policies in force for callers
+-- (PostgreSQL 15+)
+CREATE OR REPLACE VIEW public.entitlements
+WITH (security_invoker = true) AS
+SELECT user_id,
+  price_id AS plan,
+  current_period_end AS active_until
+FROM public.subscriptions
+WHERE status = 'active'
+  AND (
+    current_period_end IS NULL
+    OR current_period_end > now()
+  );
+GRANT SELECT ON public.entitlements TO authenticated, service_role;
+-- Comments for documentation
+COMMENT ON VIEW public.entitlements IS 'Plans each user is currently entitled to, from active subscriptions';
+COMMENT ON COLUMN public.entitlements.plan IS 'Stripe price ID of the subscribed plan';
+COMMENT ON COLUMN public.entitlements.active_until IS 'End of the current period (NULL if open-ended)';
@@ -0,0 +1,35 @@
+-- Payment history reads: keyset pagination and per-currency/status totals.
+-- Composite index so "WHERE user_id = ? AND (created_at, id) < (?, ?)
+-- ORDER BY created_at DESC, id DESC LIMIT n" is a single index range scan,
+-- however deep the page.
+-- On a large live table, run this statement on its own with
+-- CREATE INDEX CONCURRENTLY to avoid blocking writes.
+CREATE INDEX IF NOT EXISTS idx_payments_user_id_created_at_id ON public.payments(user_id, created_at DESC, id DESC);
+-- The single-column index is a prefix of the composite one and is now redundant
+DROP INDEX IF EXISTS public.idx_payments_user_id;
+-- Totals per currency and status, aggregated in the database so billing pages
+-- never load a customer's whole history.
+-- SECURITY INVOKER keeps the payments RLS policies in force for callers.
+CREATE OR REPLACE FUNCTION public.payment_summary(p_user_id UUID)
+RETURNS TABLE (
+  currency TEXT,
+  status TEXT,
+  payment_count BIGINT,
+  total_amount BIGINT
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+SET search_path = public
+AS $$
+  SELECT p.currency,
+    p.status,
+    count(*),
+    coalesce(sum(p.amount), 0)::BIGINT
+  FROM public.payments p
+  WHERE p.user_id = p_user_id
+  GROUP BY p.currency, p.status
+  ORDER BY p.currency, p.status;
+$$;
+REVOKE EXECUTE ON FUNCTION public.payment_summary(UUID) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION public.payment_summary(UUID) TO authenticated, service_role;
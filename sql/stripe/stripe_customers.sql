@@ -0,0 +1,29 @@
+-- Map each user to exactly one Stripe customer, so checkout can pass
+-- customer= instead of letting Stripe create or look up a customer by email
+-- on every purchase.
+CREATE TABLE IF NOT EXISTS public.stripe_customers (
+  user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+  stripe_customer_id TEXT NOT NULL UNIQUE,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+-- Set up RLS (Row Level Security) policies
+ALTER TABLE public.stripe_customers ENABLE ROW LEVEL SECURITY;
+-- Policy to allow users to read only their own mapping
+CREATE POLICY "Users can view their own Stripe customer" ON public.stripe_customers FOR
+SELECT USING (auth.uid() = user_id);
+-- Only the service role writes mappings: a user who could insert one would be
+-- able to point their account at another user's Stripe customer
+DROP POLICY IF EXISTS "Users can create their own Stripe customer" ON public.stripe_customers;
+REVOKE INSERT, UPDATE, DELETE ON public.stripe_customers FROM anon, authenticated;
+-- Backfill customers already known from subscriptions (newest per user)
+INSERT INTO public.stripe_customers (user_id, stripe_customer_id)
+SELECT DISTINCT ON (user_id) user_id,
+  stripe_customer_id
+FROM public.subscriptions
+WHERE stripe_customer_id IS NOT NULL
+ORDER BY user_id,
+  created_at DESC ON CONFLICT DO NOTHING;
+-- Comments for documentation
+COMMENT ON TABLE public.stripe_customers IS 'Stripe customer of each user';
+COMMENT ON COLUMN public.stripe_customers.user_id IS 'References the user in auth.users';
+COMMENT ON COLUMN public.stripe_customers.stripe_customer_id IS 'Stripe customer ID used for all of the user''s checkouts';
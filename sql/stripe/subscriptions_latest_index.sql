@@ -0,0 +1,8 @@
+-- Composite index so "latest subscription for a user" is a single index probe
+-- (WHERE user_id = ? ORDER BY created_at DESC LIMIT 1), however many renewals
+-- the user has accumulated.
+-- On a large live table, run this statement on its own with
+-- CREATE INDEX CONCURRENTLY to avoid blocking writes.
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user_id_created_at ON public.subscriptions(user_id, created_at DESC);
+-- The single-column index is a prefix of the composite one and is now redundant
+DROP INDEX IF EXISTS public.idx_subscriptions_user_id;
@@ -42,7 +42,8 @@ serve(async (request: Request) => {
 
     // Initialize Supabase client
     const supabaseUrl = Deno.env.get('SUPABASE_URL') || ''
-    const supabaseKey = Deno.env.get('SUPABASE_ANON_KEY') || ''
+    // The service role key is required to grant credits through add_credits
+    const supabaseKey = Deno.env.get('SUPABASE_SERVICE_ROLE_KEY') || Deno.env.get('SUPABASE_ANON_KEY') || ''
     const supabase = createClient(supabaseUrl, supabaseKey)
 
     console.log(`Processing webhook event: ${event.type}`)
@@ -52,29 +53,51 @@ serve(async (request: Request) => {
       case 'checkout.session.completed': {
         const session = event.data.object as Stripe.Checkout.Session
         
-        // Get the customer email
-        const customerEmail = session.customer_email
-        if (!customerEmail) {
-          console.error('No customer email in session')
-          return new Response('No customer email in session', { status: 400 })
+        // Checkouts created by LitKit carry the Supabase user ID
+        let userId = session.client_reference_id || session.metadata?.user_id
+
+        // Fall back to looking the user up by email
+        if (!userId) {
+          const customerEmail = session.customer_email
+          if (!customerEmail) {
+            console.error('No user ID or customer email in session')
+            return new Response('No user ID or customer email in session', { status: 400 })
+          }
+
+          const { data: userData, error: userError } = await supabase
+            .from('users')
+            .select('id')
+            .eq('email', customerEmail)
+            .single()
+
+          if (userError || !userData) {
+            console.error(`Error finding user: ${userError?.message || 'User not found'}`)
+            return new Response('User not found', { status: 404 })
+          }
+
+          userId = userData.id
         }
 
-        console.log(`Checkout completed for customer: ${customerEmail}`)
-        
-        // Find the user ID for this email
-        const { data: userData, error: userError } = await supabase
-          .from('users')
-          .select('id')
-          .eq('email', customerEmail)
-          .single()
-        
-        if (userError || !userData) {
-          console.error(`Error finding user: ${userError?.message || 'User not found'}`)
-          return new Response('User not found', { status: 404 })
+        console.log(`Checkout completed for user: ${userId}`)
+
+        // Remember the customer so later checkouts reuse it (keeps an existing mapping)
+        if (session.customer) {
+          const customerId = typeof session.customer === 'string'
+            ? session.customer
+            : session.customer.id
+
+          const { error: customerError } = await supabase
+            .from('stripe_customers')
+            .upsert(
+              { user_id: userId, stripe_customer_id: customerId },
+              { onConflict: 'user_id', ignoreDuplicates: true }
+            )
+
+          if (customerError) {
+            console.error(`Error saving Stripe customer: ${customerError.message}`)
+          }
         }
         
-        const userId = userData.id
-        
         // Handle one-time payment
         if (session.mode === 'payment') {
           // Create payment record
@@ -99,43 +122,13 @@ serve(async (request: Request) => {
             // Calculate credits (example: 1 credit per $1)
             const creditAmount = Math.floor(session.amount_total / 100)
             
-            // Get current credits
-            const { data: creditData, error: creditError } = await supabase
-              .from('credits')
-              .select('amount')
-              .eq('user_id', userId)
-              .single()
-            
-            const currentCredits = creditData?.amount || 0
-            const newCredits = currentCredits + creditAmount
-            
-            // Update or insert credits
-            if (creditData) {
-              // Update existing record
-              const { error: updateError } = await supabase
-                .from('credits')
-                .update({ amount: newCredits, updated_at: new Date().toISOString() })
-                .eq('user_id', userId)
-              
-              if (updateError) {
-                console.error(`Error updating credits: ${updateError.message}`)
-                return new Response('Error updating credits', { status: 500 })
-              }
-            } else {
-              // Insert new record
-              const { error: insertError } = await supabase
-                .from('credits')
-                .insert({
-                  user_id: userId,
-                  amount: creditAmount,
-                  created_at: new Date().toISOString(),
-                  updated_at: new Date().toISOString()
-                })
-              
-              if (insertError) {
-                console.error(`Error inserting credits: ${insertError.message}`)
-                return new Response('Error inserting credits', { status: 500 })
-              }
+            // Add credits atomically (see sql/stripe/credits_functions.sql)
+            const { error: creditError } = await supabase
+              .rpc('add_credits', { p_user_id: userId, p_amount: creditAmount })
+
+            if (creditError) {
+              console.error(`Error adding credits: ${creditError.message}`)
+              return new Response('Error adding credits', { status: 500 })
             }
             
             console.log(`Added ${creditAmount} credits for user ${userId}`)
@@ -0,0 +1,71 @@
+"""
+Shared test configuration.
+
+Module-level settings are read from the environment at import time, so
+placeholder credentials are set here before any litkit module is imported.
+
+Tests that need a real database use the ``postgres_url`` and
+``postgres_backend`` fixtures. They start a throwaway server with the
+``pgserver`` package (or use ``LITKIT_BENCH_DATABASE_URL``, which must point
+at an empty database) and install the sql/stripe schema on it, see
+benchmarks/local_postgres.py. Without either they are skipped.
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "service-role-key")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "benchmarks"))
+
+# sql/stripe files in dependency order
+SCHEMA_FILES = [
+    "subscriptions_table.sql",
+    "subscriptions_latest_index.sql",
+    "entitlements_view.sql",
+    "credits_table.sql",
+    "credits_functions.sql",
+    "credit_leases.sql",
+    "payments_table.sql",
+    "payments_history.sql",
+    "stripe_customers.sql",
+    "change_notifications.sql",
+]
+
+
+@pytest.fixture(scope="session")
+def postgres_url():
+    """Connection string of a database with the LitKit schema."""
+    if not os.getenv("LITKIT_BENCH_DATABASE_URL") and \
+            importlib.util.find_spec("pgserver") is None:
+        pytest.skip("needs pgserver or LITKIT_BENCH_DATABASE_URL")
+
+    import local_postgres
+
+    url = local_postgres.database_url()
+    local_postgres.setup_schema(url, SCHEMA_FILES)
+    return url
+
+
+@pytest.fixture(scope="session")
+def postgres_backend(postgres_url):
+    """A PostgresBackend connected to the test database."""
+    from litkit.database.postgres import PostgresBackend
+
+    backend = PostgresBackend(postgres_url)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def create_users(postgres_url):
+    """Insert users into auth.users and return their IDs."""
+    import local_postgres
+
+    return lambda count=1: local_postgres.create_users(postgres_url, count)
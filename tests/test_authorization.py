@@ -0,0 +1,108 @@
+"""Tests for role and claim based authorization."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from litkit.auth import authorization
+
+
+class MembershipsClient:
+    """Answers memberships queries from a dict, or fails while ``down``."""
+
+    def __init__(self, roles):
+        self.roles = roles
+        self.queries = []
+        self.down = False
+
+    def table(self, name):
+        query = SimpleNamespace(filters={})
+        query.select = lambda columns: query
+
+        def eq(column, value):
+            query.filters[column] = value
+            return query
+
+        def execute():
+            self.queries.append((name, query.filters))
+            if self.down:
+                raise ConnectionError("connection reset")
+            user_id = query.filters["user_id"]
+            return SimpleNamespace(
+                data=[{"role": role} for role in self.roles.get(user_id, [])])
+
+        query.eq = eq
+        query.execute = execute
+        return query
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """A signed-in session whose token claims and database can be set."""
+    state = SimpleNamespace(
+        session_state={"access_token": "token-1"},
+        claims={"sub": "alice"},
+        client=MembershipsClient({"alice": ["editor"]}),
+    )
+    monkeypatch.setattr(authorization, "st", state)
+    monkeypatch.setattr(authorization, "is_authenticated", lambda: True)
+    monkeypatch.setattr(authorization, "get_verified_claims", lambda: state.claims)
+    monkeypatch.setattr(authorization, "get_user", lambda: {"id": "alice"})
+    monkeypatch.setattr(authorization, "get_session_client", lambda: state.client)
+    return state
+
+
+@pytest.mark.parametrize("claims, roles", [
+    ({"user_role": "admin"}, {"admin"}),
+    ({"app_metadata": {"roles": ["admin", "billing"]}}, {"admin", "billing"}),
+    ({"app_metadata": {"role": "viewer"}}, {"viewer"}),
+])
+def test_roles_from_claims(session, claims, roles):
+    session.claims = {"sub": "alice", **claims}
+
+    assert authorization.get_user_roles() == roles
+    assert session.client.queries == []
+
+
+def test_roles_from_memberships(session):
+    assert authorization.get_user_roles() == {"editor"}
+    assert authorization.is_authorized(roles=["editor", "admin"])
+    assert not authorization.is_authorized(roles=["admin"])
+    # One query, then the cached roles
+    assert session.client.queries == [("memberships", {"user_id": "alice"})]
+
+
+def test_claim_requirements(session):
+    session.claims = {"sub": "alice", "app_metadata": {"plan": "pro"}}
+
+    assert authorization.is_authorized(claims={"app_metadata.plan": "pro"})
+    assert not authorization.is_authorized(claims={"app_metadata.plan": "team"})
+    assert not authorization.is_authorized(claims={"missing.path": "pro"})
+
+
+def test_decisions_are_cached_per_token(session):
+    assert authorization.is_authorized(roles=["editor"])
+    session.client.roles = {}
+    assert authorization.is_authorized(roles=["editor"])
+
+    # A new access token starts a new cache
+    session.session_state["access_token"] = "token-2"
+    assert not authorization.is_authorized(roles=["editor"])
+    assert len(session.client.queries) == 2
+
+
+def test_failed_lookup_denies_without_caching(session):
+    session.client.down = True
+    assert not authorization.is_authorized(roles=["editor"])
+    assert authorization.get_user_roles() == frozenset()
+
+    session.client.down = False
+    assert authorization.is_authorized(roles=["editor"])
+    assert authorization.get_user_roles() == {"editor"}
+
+
+def test_unauthenticated_user_has_no_roles(session, monkeypatch):
+    monkeypatch.setattr(authorization, "is_authenticated", lambda: False)
+
+    assert authorization.get_user_roles() == frozenset()
+    assert not authorization.is_authorized()
@@ -0,0 +1,145 @@
+"""Tests for the Stripe plan catalog."""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from litkit.payments import catalog
+
+
+def price(price_id, amount, lookup_key=None, **metadata):
+    """A recurring Price with its Product expanded, as Stripe returns it."""
+    return {
+        "id": price_id, "lookup_key": lookup_key, "unit_amount": amount,
+        "currency": "usd", "recurring": {"interval": "month", "interval_count": 1},
+        "product": {"id": f"prod_{price_id}", "name": price_id.title(),
+                    "active": True, "metadata": metadata},
+    }
+
+
+PLANS = [
+    catalog._plan_from_price(price("price_pro", 1999, "pro_monthly", plan_id="pro")),
+    catalog._plan_from_price(price("price_team", 4999)),
+]
+
+
+class Loader:
+    """Plan loader that counts calls and can fail or block."""
+
+    def __init__(self, plans=PLANS):
+        self.plans = plans
+        self.calls = 0
+        self.error = None
+        self.release = None
+
+    def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error:
+            raise self.error
+        return self.plans
+
+
+def wait_until(condition):
+    for _ in range(100):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return str(tmp_path / "plans.json")
+
+
+def test_plan_fields_come_from_the_price_and_product():
+    pro, team = PLANS
+    assert (pro["id"], pro["price"], pro["lookup_key"]) == ("pro", "$19.99/month", "pro_monthly")
+    # Without plan_id metadata or a lookup_key the price id is the plan id
+    assert team["id"] == "price_team"
+
+
+def test_lookups_by_id_lookup_key_and_price_id(snapshot):
+    plans = catalog.PlanCatalog(snapshot_path=snapshot, loader=Loader())
+    assert plans.refresh()
+
+    pro = plans.get_plan("pro")
+    assert pro["price_id"] == "price_pro"
+    assert plans.get_plan_by_lookup_key("pro_monthly") is pro
+    assert plans.get_plan_by_price_id("price_pro") is pro
+    assert plans.get_plan_by_price_id("price_team")["id"] == "price_team"
+    assert plans.get_plan("basic") is None
+    assert [plan["id"] for plan in plans.get_plans()] == ["pro", "price_team"]
+
+
+def test_stale_plans_are_served_while_refreshing(snapshot):
+    loader = Loader()
+    plans = catalog.PlanCatalog(ttl=60, snapshot_path=snapshot, loader=loader)
+    assert plans.refresh()
+
+    # Fresh: no refresh
+    plans.get_plans()
+    assert loader.calls == 1
+
+    loader.plans = PLANS[:1]
+    loader.release = threading.Event()
+    plans._loaded_at -= 61
+    # Stale: the old plans come back at once and one refresh starts
+    assert len(plans.get_plans()) == 2
+    assert len(plans.get_plans()) == 2
+    wait_until(lambda: loader.calls == 2)
+    assert plans.stats()["refreshing"]
+
+    loader.release.set()
+    wait_until(lambda: not plans.stats()["refreshing"])
+    assert len(plans.get_plans()) == 1
+    assert loader.calls == 2
+
+
+def test_cold_start_serves_the_snapshot(snapshot):
+    assert catalog.PlanCatalog(snapshot_path=snapshot, loader=Loader()).refresh()
+
+    loader = Loader()
+    loader.release = threading.Event()
+    plans = catalog.PlanCatalog(snapshot_path=snapshot, loader=loader)
+    assert plans.stats()["source"] == "snapshot"
+    assert plans.get_plan("pro")["price_id"] == "price_pro"
+    loader.release.set()
+
+
+def test_unreadable_snapshot_falls_back_to_placeholders(snapshot, capsys):
+    with open(snapshot, "w", encoding="utf-8") as broken:
+        broken.write('{"plans": ')
+
+    loader = Loader()
+    loader.release = threading.Event()
+    plans = catalog.PlanCatalog(snapshot_path=snapshot, loader=loader)
+    assert plans.stats()["source"] == "default"
+    assert plans.get_plans() == catalog.DEFAULT_PLANS
+    assert "Error reading plan snapshot" in capsys.readouterr().out
+    loader.release.set()
+
+
+def test_failed_load_keeps_plans_and_retries_soon(snapshot, monkeypatch):
+    monkeypatch.setattr(catalog, "PLAN_CATALOG_RETRY_DELAY", 0.05)
+    loader = Loader()
+    loader.error = RuntimeError("Stripe is down")
+    plans = catalog.PlanCatalog(ttl=300, snapshot_path=snapshot, loader=loader)
+
+    assert not plans.refresh()
+    assert plans.get_plans() == catalog.DEFAULT_PLANS
+    # Still stale, so it is retried after the backoff instead of a whole TTL
+    assert plans.stats()["age"] > 300
+    wait_until(lambda: plans.get_plans() and loader.calls == 2)
+
+    loader.error = None
+    wait_until(lambda: plans.get_plans() and plans.stats()["source"] == "stripe")
+    assert plans.get_plan("pro")
+    wait_until(lambda: os.path.exists(snapshot))
+    with open(snapshot, encoding="utf-8") as saved:
+        assert [plan["id"] for plan in json.load(saved)["plans"]] == ["pro", "price_team"]
@@ -0,0 +1,136 @@
+"""Tests for checkout session reuse."""
+
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+import stripe
+
+from litkit.payments import checkout, stripe_client
+from litkit.utils.cache import TTLCache
+
+
+@pytest.fixture
+def stripe_api(monkeypatch):
+    """Answer checkout requests from a fake Stripe and record them."""
+    # Sessions are open unless a status is queued for the next answer
+    api = SimpleNamespace(requests=[], statuses=[], sessions={})
+
+    def handler(request):
+        api.requests.append(request)
+        assert request.method == "POST"
+        assert request.url.path == "/v1/checkout/sessions"
+        # Stripe answers a reused idempotency key with the first session
+        key = request.headers["Idempotency-Key"]
+        number = api.sessions.setdefault(key, len(api.sessions) + 1)
+        return httpx.Response(200, json={
+            "id": f"cs_{number}", "object": "checkout.session",
+            "url": f"https://checkout.stripe.com/c/cs_{number}",
+            "status": api.statuses.pop(0) if api.statuses else "open",
+            "expires_at": int(time.time()) + 3600})
+
+    client = stripe.StripeClient(
+        "sk_test_123", http_client=stripe_client.PooledHTTPClient(
+            httpx.Client(transport=httpx.MockTransport(handler))))
+    monkeypatch.setattr(checkout, "get_stripe_client", lambda: client)
+    monkeypatch.setattr(checkout, "get_or_create_customer",
+                        lambda user_id, email: f"cus_{user_id}")
+    monkeypatch.setenv("STRIPE_PRICE_ID", "price_1")
+    monkeypatch.setattr(checkout, "_session_cache", TTLCache(maxsize=16, ttl=0))
+    monkeypatch.setattr(checkout, "_generations", TTLCache(maxsize=16, ttl=60))
+    return api
+
+
+def form(request):
+    return {name: values[0] for name, values in parse_qs(request.content.decode()).items()}
+
+
+def test_cached_session_is_reused_without_asking_stripe(stripe_api):
+    first = checkout.create_checkout_session(user_id="alice")
+    again = checkout.create_checkout_session(user_id="alice")
+
+    assert first == again == "https://checkout.stripe.com/c/cs_1"
+    assert len(stripe_api.requests) == 1
+    assert form(stripe_api.requests[0])["customer"] == "cus_alice"
+    assert checkout.get_checkout_session_stats()["hits"] == 1
+
+
+def test_sessions_are_per_user_and_intent(stripe_api):
+    alice = checkout.create_checkout_session(user_id="alice")
+    bob = checkout.create_checkout_session(user_id="bob")
+    credits = checkout.create_checkout_session(user_id="alice", mode="payment")
+
+    assert len({alice, bob, credits}) == 3
+    keys = {request.headers["Idempotency-Key"] for request in stripe_api.requests}
+    assert len(keys) == 3
+
+
+def test_completed_purchase_starts_a_new_generation(stripe_api):
+    first = checkout.create_checkout_session(user_id="alice")
+    # The webhook's subscription write reaches the change listener
+    checkout.invalidate_checkout_sessions("alice")
+    second = checkout.create_checkout_session(user_id="alice")
+
+    assert first != second
+    first_key, second_key = (r.headers["Idempotency-Key"] for r in stripe_api.requests)
+    assert first_key != second_key
+
+
+def test_failed_redirect_replaces_the_session(stripe_api):
+    first = checkout.create_checkout_session(user_id="alice")
+    retried = checkout.create_checkout_session(user_id="alice", retry=True)
+
+    assert retried != first
+    assert checkout.create_checkout_session(user_id="alice") == retried
+    assert len(stripe_api.requests) == 2
+
+
+def test_concurrent_creates_share_an_idempotency_key(stripe_api):
+    checkout.create_checkout_session(user_id="alice")
+    # Another replica has no cached session but derives the same key
+    checkout._session_cache.clear()
+    checkout.create_checkout_session(user_id="alice")
+
+    first, second = stripe_api.requests
+    assert first.headers["Idempotency-Key"] == second.headers["Idempotency-Key"]
+    assert first.headers["Idempotency-Key"].startswith("litkit-checkout-")
+
+
+def test_replayed_completed_session_is_not_returned(stripe_api):
+    # The key replays a session paid since, e.g. on another replica
+    stripe_api.statuses.append("complete")
+    url = checkout.create_checkout_session(user_id="alice")
+
+    # A new generation created a second session, which is the one cached
+    assert url == "https://checkout.stripe.com/c/cs_2"
+    assert checkout.create_checkout_session(user_id="alice") == url
+    assert len(stripe_api.requests) == 2
+
+
+def test_anonymous_checkouts_are_not_cached(stripe_api):
+    checkout.create_checkout_session()
+    checkout.create_checkout_session()
+
+    assert len(stripe_api.requests) == 2
+    # Only the Stripe library's own random keys
+    assert not any(request.headers["Idempotency-Key"].startswith("litkit-")
+                   for request in stripe_api.requests)
+
+
+def test_evicted_generation_clears_cached_sessions(stripe_api, monkeypatch):
+    monkeypatch.setattr(checkout, "_generations", TTLCache(maxsize=1, ttl=60))
+    # Alice pays for the first session
+    stripe_api.statuses.extend(["open", "open", "complete"])
+    checkout.create_checkout_session(user_id="alice")
+    checkout.invalidate_checkout_sessions("alice")
+    checkout.create_checkout_session(user_id="alice")
+    # Bob's purchase evicts Alice's generation, which restarts at 0
+    checkout.invalidate_checkout_sessions("bob")
+
+    # Not the paid session cached at generation 0: Stripe replays it as
+    # complete and the next generation gets the open second session
+    url = checkout.create_checkout_session(user_id="alice")
+    assert url == "https://checkout.stripe.com/c/cs_2"
+    assert len(stripe_api.requests) == 4
@@ -0,0 +1,71 @@
+"""Tests for the shared Supabase connection pool."""
+
+import sys
+
+import httpx
+import pytest
+
+from litkit.auth import client
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A counting client whose requests are answered by a handler."""
+    monkeypatch.setattr(client, "_stats", dict.fromkeys(client._stats, 0))
+    answers = []
+
+    def handler(request):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return httpx.Response(answer)
+
+    http = httpx.Client(transport=client._CountingTransport(httpx.MockTransport(handler)))
+    yield answers, http
+    http.close()
+
+
+def test_requests_are_counted(pool):
+    answers, http = pool
+    answers.extend([200, 404, 503])
+    for _ in range(3):
+        http.get("https://example.supabase.co/rest/v1/profiles")
+
+    stats = client.get_pool_stats()
+    assert (stats["requests"], stats["in_flight"], stats["errors"]) == (3, 0, 1)
+    assert stats["peak_in_flight"] == 1
+
+
+@pytest.mark.parametrize("error", [
+    httpx.ConnectError("connection refused"),
+    httpx.ReadTimeout("timed out"),
+])
+def test_failed_requests_leave_the_pool(pool, error):
+    answers, http = pool
+    answers.append(error)
+    with pytest.raises(type(error)):
+        http.get("https://example.supabase.co/rest/v1/profiles")
+
+    stats = client.get_pool_stats()
+    assert (stats["requests"], stats["in_flight"], stats["errors"]) == (1, 0, 1)
+
+
+def test_stats_report_the_effective_http2_setting(monkeypatch):
+    monkeypatch.setattr(client, "HTTP2_ENABLED", True)
+    # Importing h2 fails as if it were not installed
+    monkeypatch.setitem(sys.modules, "h2", None)
+
+    assert client.get_pool_stats()["http2"] is False
+
+    monkeypatch.setattr(client, "HTTP2_ENABLED", False)
+    assert client.get_pool_stats()["http2"] is False
+
+
+def test_stats_include_connection_counts(monkeypatch):
+    http = client._create_http_client()
+    monkeypatch.setattr(client, "_http_client", http)
+    try:
+        stats = client.get_pool_stats()
+    finally:
+        http.close()
+    assert (stats["open_connections"], stats["idle_connections"]) == (0, 0)
@@ -0,0 +1,165 @@
+"""Tests for credit leases."""
+
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from litkit.database import credit_leases, payments_db, repository
+
+
+@pytest.fixture
+def streamlit(monkeypatch):
+    """Replace Streamlit with a session state dict and recorded messages."""
+    fake = SimpleNamespace(
+        session_state={}, errors=[], warnings=[],
+        error=lambda message: fake.errors.append(message),
+        warning=lambda message: fake.warnings.append(message),
+    )
+    monkeypatch.setattr(credit_leases, "st", fake)
+    monkeypatch.setattr(repository, "st", fake)
+    return fake
+
+
+def test_balance_includes_unused_lease(streamlit, monkeypatch):
+    # The database moved the whole block out of the stored balance
+    monkeypatch.setattr(payments_db, "get_stored_credits", lambda user_id: 70)
+    lease = credit_leases.CreditLease("lease-1", "alice", reserved=30)
+    lease.used = 4
+    streamlit.session_state["credit_lease"] = lease
+
+    assert payments_db.get_user_credits("alice") == 96
+    assert payments_db.get_user_credits("bob") == 70
+
+    lease.settled = True
+    assert payments_db.get_user_credits("alice") == 70
+
+
+def test_reserve_errors_go_through_db_operation(streamlit, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(repository, "get_database_client", lambda: object())
+    monkeypatch.setattr(repository.credits, "rpc", fail)
+
+    assert credit_leases.reserve_credit_lease("alice") is None
+    assert streamlit.errors == ["Error reserving credits: connection reset"]
+
+
+def test_reserve_without_client_warns(streamlit, monkeypatch):
+    monkeypatch.setattr(repository, "get_database_client", lambda: None)
+
+    assert credit_leases.reserve_credit_lease("alice") is None
+    assert streamlit.warnings == ["Supabase client is not configured."]
+
+
+@pytest.fixture
+def database(streamlit, monkeypatch, postgres_backend, create_users):
+    """Run as a fresh user with 100 credits on the test database."""
+    user_id = create_users()[0]
+    as_user = postgres_backend.as_role({"sub": user_id, "role": "authenticated"})
+    monkeypatch.setattr(repository, "get_service_database_client",
+                        lambda: postgres_backend)
+    monkeypatch.setattr(repository, "get_database_client", lambda: as_user)
+    monkeypatch.setattr(repository.credits, "client_factory", lambda: as_user)
+    payments_db.add_credits(user_id, 100)
+
+    def lease_row(lease_id):
+        with postgres_backend.pool.connection() as conn:
+            return conn.execute(
+                "SELECT used, status FROM public.credit_leases WHERE id = %s",
+                (lease_id,)).fetchone()
+
+    def balance():
+        with postgres_backend.pool.connection() as conn:
+            return conn.execute(
+                "SELECT amount FROM public.credits WHERE user_id = %s",
+                (user_id,)).fetchone()["amount"]
+
+    return SimpleNamespace(user_id=user_id, as_user=as_user, backend=postgres_backend,
+                           lease_row=lease_row, balance=balance)
+
+
+def test_reserve_debit_checkpoint_settle(database, streamlit, monkeypatch):
+    user_id = database.user_id
+    for _ in range(10):
+        assert credit_leases.use_leased_credits(user_id, 1, block_size=30)
+    lease = streamlit.session_state["credit_lease"]
+
+    # One reservation moved the block out of the stored balance
+    assert database.balance() == 70
+    assert payments_db.get_user_credits(user_id) == 90
+
+    assert lease.checkpoint()
+    assert database.lease_row(lease.lease_id) == {"used": 10, "status": "open"}
+
+    # Settling does not need the session's token any more
+    monkeypatch.setattr(repository, "get_database_client", lambda: None)
+    lease.try_debit(5)
+    assert credit_leases.settle_session_lease() == 85
+    assert database.lease_row(lease.lease_id) == {"used": 15, "status": "settled"}
+    assert database.balance() == 85
+    assert lease.settle() is None
+
+
+def test_users_cannot_report_lease_usage(database):
+    lease = credit_leases.reserve_credit_lease(database.user_id, 30)
+    lease.try_debit(20)
+    assert lease.checkpoint()
+
+    for function, params in (
+        ("settle_credit_lease", {"p_lease_id": lease.lease_id, "p_used": 0}),
+        ("checkpoint_credit_lease",
+         {"p_lease_id": lease.lease_id, "p_used": 0, "p_ttl_seconds": 900}),
+    ):
+        with pytest.raises(Exception, match="permission denied"):
+            repository.credits.rpc(function, params, client=database.as_user)
+
+    assert lease.settle() == 80
+
+
+def test_expired_lease_is_reconciled_from_its_checkpoint(database):
+    lease = credit_leases.reserve_credit_lease(database.user_id, 30)
+    lease.try_debit(12)
+    assert lease.checkpoint()
+    lease.try_debit(3)
+
+    # The holder disappeared: the lease expires and is reconciled
+    with database.backend.pool.connection() as conn:
+        conn.execute("UPDATE public.credit_leases SET expires_at = now() - interval '1 second'"
+                     " WHERE id = %s", (lease.lease_id,))
+        assert conn.execute(
+            "SELECT public.reconcile_expired_credit_leases() AS count"
+        ).fetchone()["count"] == 1
+
+    # Debits after the last checkpoint are lost to the user's benefit
+    assert database.lease_row(lease.lease_id) == {"used": 12, "status": "expired"}
+    assert database.balance() == 88
+
+    # The holder's late calls find the lease closed
+    assert lease.checkpoint() is False
+    assert lease.settled
+    assert lease.settle() is None
+    assert database.balance() == 88
+
+
+def test_reserve_requires_the_service_role(streamlit, monkeypatch):
+    monkeypatch.setattr(repository, "get_service_database_client", lambda: None)
+    monkeypatch.setattr(repository, "get_database_client", lambda: object())
+
+    assert credit_leases.reserve_credit_lease("alice") is None
+    assert streamlit.warnings == ["Credit leases require SUPABASE_SERVICE_ROLE_KEY."]
+
+
+def test_leases_are_settled_at_exit_after_the_pools_shut_down(database, monkeypatch):
+    lease = credit_leases.reserve_credit_lease(database.user_id, 30)
+    lease.try_debit(4)
+
+    # Interpreter shutdown stops thread pools before atexit handlers run
+    upstream = repository._upstream(database.backend)
+    monkeypatch.setattr(upstream, "_executor", ThreadPoolExecutor(1))
+    upstream._executor.shutdown()
+    credit_leases.settle_all_leases()
+
+    assert database.lease_row(lease.lease_id) == {"used": 4, "status": "settled"}
+    assert database.balance() == 96
@@ -0,0 +1,119 @@
+"""Tests for change notification handling."""
+
+import json
+import time
+
+import pytest
+
+from litkit.database import notifications, payments_db
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Start from an empty handler registry and record calls per table."""
+    monkeypatch.setattr(notifications, "_handlers", {})
+    calls = []
+    for table in ("subscriptions", "credits"):
+        notifications.register_change_handler(
+            table, lambda user_id, table=table: calls.append((table, user_id)))
+    return calls
+
+
+def listener():
+    return notifications.ChangeListener("postgresql://unused")
+
+
+def test_handle_dispatches_to_the_table(handlers):
+    changes = listener()
+    changes._handle(json.dumps(
+        {"table": "credits", "op": "UPDATE", "user_id": "alice"}))
+    # Non-string ids are passed on as strings
+    changes._handle(json.dumps({"table": "subscriptions", "op": "INSERT", "user_id": 7}))
+    # Rows without a user and tables without handlers call nothing
+    changes._handle(json.dumps({"table": "credits", "op": "DELETE", "user_id": None}))
+    changes._handle(json.dumps({"table": "profiles", "user_id": "alice"}))
+
+    assert handlers == [("credits", "alice"), ("subscriptions", "7")]
+    assert changes.stats()["received"] == 4
+    assert changes.stats()["invalid"] == 0
+
+
+@pytest.mark.parametrize("payload", ["", "not json", "null", "[1]", '{"user_id": "alice"}'])
+def test_handle_counts_invalid_payloads(handlers, payload):
+    changes = listener()
+    changes._handle(payload)
+
+    assert handlers == []
+    assert changes.stats() == {
+        "connected": False, "connects": 0, "received": 0, "invalid": 1}
+
+
+def test_dispatch_everything_on_reconnect(handlers):
+    assert notifications._dispatch(None, None) == 2
+    assert sorted(handlers) == [("credits", None), ("subscriptions", None)]
+
+
+def test_failing_handler_does_not_stop_the_others(handlers, capsys):
+    def fail(user_id):
+        raise RuntimeError("cache unavailable")
+
+    notifications._handlers["credits"].insert(0, fail)
+
+    assert notifications._dispatch("credits", "alice") == 2
+    assert handlers == [("credits", "alice")]
+    assert "cache unavailable" in capsys.readouterr().out
+
+
+def test_notification_drops_cached_balance():
+    # payments_db registers its cache invalidation at import time
+    payments_db._credits_cache.set("alice", 10)
+    payments_db._credits_cache.set("bob", 20)
+    try:
+        listener()._handle(json.dumps(
+            {"table": "credits", "op": "UPDATE", "user_id": "alice"}))
+
+        assert payments_db._credits_cache.get("alice") is None
+        assert payments_db._credits_cache.get("bob") == 20
+    finally:
+        payments_db.invalidate_credits_cache()
+
+
+def wait_until(condition):
+    for _ in range(200):
+        if condition():
+            return
+        time.sleep(0.02)
+    raise AssertionError("condition not met")
+
+
+def test_listener_drops_caches_on_database_writes(
+        postgres_url, postgres_backend, create_users, monkeypatch):
+    monkeypatch.setattr(notifications, "POLL_INTERVAL", 0.1)
+    alice, bob = create_users(2)
+    changes = notifications.ChangeListener(postgres_url)
+    changes.start()
+    try:
+        # Connecting clears every cache, so fill them afterwards
+        wait_until(lambda: changes.stats()["connected"])
+        for user_id in (alice, bob):
+            payments_db._credits_cache.set(user_id, 10)
+            payments_db._subscription_cache.set(user_id, f"subscription of {user_id}")
+
+        # A webhook on another replica grants credits and records a subscription
+        postgres_backend.rpc("add_credits", {"p_user_id": alice, "p_amount": 5})
+        with postgres_backend.pool.connection() as conn:
+            conn.execute("INSERT INTO public.subscriptions (user_id, status, price_id)"
+                         " VALUES (%s, 'active', 'price_pro')", (alice,))
+
+        wait_until(lambda: changes.stats()["received"] == 2)
+        assert payments_db._credits_cache.get(alice) is None
+        assert payments_db._subscription_cache.get(alice) is None
+        assert payments_db._credits_cache.get(bob) == 10
+        assert payments_db._subscription_cache.get(bob) == f"subscription of {bob}"
+        assert changes.stats()["connects"] == 1
+    finally:
+        changes.stop()
+        payments_db.invalidate_credits_cache()
+        payments_db.invalidate_subscription_cache()
+
+    assert not changes.stats()["connected"]
@@ -0,0 +1,308 @@
+"""Tests for payment data caching and writes."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from litkit.database import payments_db, repository
+from litkit.database.models import SubscriptionRecord
+from litkit.utils.cache import TTLCache
+from litkit.utils.singleflight import SingleFlight
+
+
+@pytest.fixture
+def identity(monkeypatch):
+    """Set the credentials repository queries appear to run with."""
+    current = {"value": "anon"}
+    monkeypatch.setattr(payments_db.repo, "get_database_identity",
+                        lambda: current["value"])
+    return current
+
+
+def load(cache, user_id, calls):
+    def loader():
+        calls.append(user_id)
+        return 0
+    return payments_db._load_cached(cache, user_id, loader)
+
+
+@pytest.mark.parametrize("who", ["anon", "user:bob"])
+def test_reads_by_other_identities_are_not_cached(identity, who):
+    identity["value"] = who
+    cache, calls = TTLCache(), []
+
+    load(cache, "alice", calls)
+    load(cache, "alice", calls)
+
+    assert calls == ["alice", "alice"]
+    assert len(cache) == 0
+
+
+def test_reads_with_the_users_own_token_are_cached(identity):
+    identity["value"] = "user:alice"
+    cache, calls = TTLCache(), []
+
+    load(cache, "alice", calls)
+    load(cache, "alice", calls)
+
+    assert calls == ["alice"]
+
+
+def test_anon_read_does_not_hide_the_users_own_result(identity):
+    cache, calls = TTLCache(), []
+    load(cache, "alice", calls)
+
+    identity["value"] = "user:alice"
+    load(cache, "alice", calls)
+    load(cache, "alice", calls)
+
+    assert calls == ["alice", "alice"]
+
+
+def test_reads_by_different_identities_are_not_coalesced(monkeypatch):
+    identities = threading.local()
+    monkeypatch.setattr(repository, "get_database_identity",
+                        lambda: identities.value)
+    group = SingleFlight()
+    anon_started = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def read(identity, balance):
+        identities.value = identity
+
+        def query():
+            if identity == "anon":
+                anon_started.set()
+                release.wait(5)
+            return balance
+
+        results[identity] = group.do(repository.identity_key("alice"), query)
+
+    # The user's read arrives while the anon read for the same user is in flight
+    anon = threading.Thread(target=read, args=("anon", 0))
+    anon.start()
+    assert anon_started.wait(5)
+    read("user:alice", 42)
+    release.set()
+    anon.join(5)
+
+    assert results == {"anon": 0, "user:alice": 42}
+    assert group.stats()["coalesced"] == 0
+
+
+def test_stripe_customer_is_saved_with_the_service_role(monkeypatch):
+    service = object()
+    queries = []
+
+    def run(self, query, client=None):
+        queries.append((query.action, client))
+        return [{"stripe_customer_id": "cus_first"}]
+
+    monkeypatch.setattr(repository, "get_service_database_client", lambda: service)
+    monkeypatch.setattr(repository.Repository, "run", run)
+    monkeypatch.setattr(payments_db, "_stripe_customer_cache", TTLCache())
+
+    # Another request mapped the user first; its customer wins
+    assert payments_db.save_stripe_customer_id("alice", "cus_second") == "cus_first"
+    assert queries == [("upsert", service), ("select", service)]
+    assert payments_db._stripe_customer_cache.get("alice") == "cus_first"
+
+
+def test_stripe_customer_is_not_saved_without_the_service_role(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(repository, "st", SimpleNamespace(warning=warnings.append))
+    monkeypatch.setattr(repository, "get_service_database_client", lambda: None)
+
+    assert payments_db.save_stripe_customer_id("alice", "cus_1") is None
+    assert warnings == ["Saving a Stripe customer requires SUPABASE_SERVICE_ROLE_KEY."]
+
+
+@pytest.mark.parametrize("row, active", [
+    ({"status": "active", "current_period_end": "2999-01-01T00:00:00Z"}, True),
+    ({"status": "active", "current_period_end": None}, True),
+    ({"status": "active", "current_period_end": "2000-01-01T00:00:00Z"}, False),
+    ({"status": "canceled", "current_period_end": "2999-01-01T00:00:00Z"}, False),
+    (None, False),
+])
+def test_active_subscription_looks_at_the_latest_subscription(monkeypatch, row, active):
+    record = SubscriptionRecord.from_row(row) if row else None
+    monkeypatch.setattr(payments_db, "get_user_subscription_record",
+                        lambda user_id: record)
+    # An older active subscription in the entitlements view does not count
+    monkeypatch.setattr(payments_db, "is_entitled", lambda user_id, plan=None: True)
+
+    assert payments_db.has_active_subscription("alice") is active
+
+
+@pytest.fixture
+def payment_history(monkeypatch, postgres_backend, create_users):
+    """A user whose payments share created_at values, listed as that user."""
+    user_id = create_users()[0]
+    with postgres_backend.pool.connection() as conn:
+        # Five payments in one second, then two older ones
+        conn.execute("""
+            INSERT INTO public.payments (user_id, amount, currency, status,
+                                         payment_type, created_at)
+            SELECT %s, 100 * g, 'usd', 'succeeded', 'one-time',
+                   CASE WHEN g <= 5 THEN timestamptz '2024-05-01 12:00:00+00'
+                        ELSE timestamptz '2024-04-01 12:00:00+00' - g * interval '1 day' END
+            FROM generate_series(1, 7) g
+            """, (user_id,))
+        newest_first = [str(row["id"]) for row in conn.execute(
+            "SELECT id FROM public.payments WHERE user_id = %s"
+            " ORDER BY created_at DESC, id DESC", (user_id,))]
+
+    as_user = postgres_backend.as_role({"sub": user_id, "role": "authenticated"})
+    monkeypatch.setattr(repository.payments, "client_factory", lambda: as_user)
+    return user_id, newest_first
+
+
+def all_pages(user_id, limit):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = payments_db.list_payments(user_id, cursor, limit=limit)
+        pages.append([row["id"] for row in rows])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4])
+def test_payment_pages_continue_across_equal_created_at(payment_history, limit):
+    user_id, newest_first = payment_history
+
+    pages = all_pages(user_id, limit)
+
+    # Every payment exactly once, in order, however the ties fall on pages
+    assert [payment for page in pages for payment in page] == newest_first
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_last_full_page_has_no_cursor(payment_history):
+    user_id, newest_first = payment_history
+
+    pages = all_pages(user_id, 7)
+
+    assert pages == [newest_first]
+    assert [len(page) for page in all_pages(user_id, 8)] == [7]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    "bm90IGpzb24",                    # "not json"
+    "WzEsIDIsIDNd",                   # [1, 2, 3]
+    "NQ==",                           # 5
+])
+def test_invalid_cursor_is_reported(monkeypatch, cursor):
+    errors = []
+    monkeypatch.setattr(repository, "st", SimpleNamespace(error=errors.append))
+    monkeypatch.setattr(repository.payments, "client_factory", lambda: object())
+
+    assert payments_db.list_payments("alice", cursor) == ([], None)
+    assert errors == ["Error listing payments: Invalid payment history cursor"]
+
+
+@pytest.fixture
+def subscribers(monkeypatch, postgres_backend, create_users):
+    """Users with current, canceled, ended and open-ended subscriptions."""
+    alice, bob, carol, dave = create_users(4)
+    with postgres_backend.pool.connection() as conn, conn.cursor() as cur:
+        cur.executemany("""
+            INSERT INTO public.subscriptions (user_id, status, price_id, current_period_end)
+            VALUES (%s, %s, %s, now() + %s * interval '1 day')
+            """, [
+                (alice, "active", "price_pro", 30),
+                (alice, "canceled", "price_basic", 30),
+                (bob, "active", "price_basic", -1),
+                (carol, "active", "price_pro", None),
+            ])
+
+    identity = {"value": "anon"}
+    monkeypatch.setattr(repository, "get_database_identity", lambda: identity["value"])
+    monkeypatch.setattr(payments_db, "_entitlement_cache", TTLCache())
+
+    def sign_in(user_id):
+        identity["value"] = f"user:{user_id}"
+        client = postgres_backend.as_role({"sub": user_id, "role": "authenticated"})
+        monkeypatch.setattr(repository.entitlements, "client_factory", lambda: client)
+
+    return SimpleNamespace(alice=alice, bob=bob, carol=carol, dave=dave,
+                           sign_in=sign_in, backend=postgres_backend)
+
+
+def test_entitlement_comes_from_active_unexpired_subscriptions(subscribers):
+    for user_id, plans in (
+        (subscribers.alice, {"price_pro"}),
+        (subscribers.bob, set()),
+        (subscribers.carol, {"price_pro"}),
+        (subscribers.dave, set()),
+    ):
+        subscribers.sign_in(user_id)
+        assert payments_db.is_entitled(user_id) is bool(plans)
+        for plan in ("price_pro", "price_basic"):
+            assert payments_db.is_entitled(user_id, plan) is (plan in plans)
+
+
+def test_entitlements_are_cached_until_invalidated(subscribers, monkeypatch):
+    alice = subscribers.alice
+    subscribers.sign_in(alice)
+    assert payments_db.is_entitled(alice, "price_pro")
+
+    with subscribers.backend.pool.connection() as conn:
+        conn.execute("UPDATE public.subscriptions SET status = 'canceled'"
+                     " WHERE user_id = %s", (alice,))
+    assert payments_db.is_entitled(alice, "price_pro")
+
+    # The cached period end is checked on every call
+    later = time.time() + 31 * 86400
+    with monkeypatch.context() as patch:
+        patch.setattr(payments_db.time, "time", lambda: later)
+        assert not payments_db.is_entitled(alice, "price_pro")
+
+    payments_db.invalidate_subscription_cache(alice)
+    subscribers.sign_in(alice)
+    assert not payments_db.is_entitled(alice)
+
+
+def test_other_users_see_no_entitlement_and_cache_nothing(subscribers):
+    alice = subscribers.alice
+    # RLS hides Alice's subscriptions from Bob's session
+    subscribers.sign_in(subscribers.bob)
+    assert not payments_db.is_entitled(alice)
+    assert len(payments_db._entitlement_cache) == 0
+
+    subscribers.sign_in(alice)
+    assert payments_db.is_entitled(alice)
+
+
+def test_entitled_users_are_found_in_chunks(subscribers, monkeypatch):
+    monkeypatch.setattr(repository.entitlements, "client_factory",
+                        lambda: subscribers.backend)
+    ids = [subscribers.alice, subscribers.bob, subscribers.carol,
+           subscribers.dave, subscribers.alice]
+    repository.entitlements.reset_stats()
+
+    assert payments_db.get_entitled_users(ids, chunk_size=2) == {
+        subscribers.alice, subscribers.carol}
+    # Duplicates are dropped before chunking: four ids in two queries
+    assert repository.entitlements.stats()["round_trips"] == 2
+
+    assert payments_db.get_entitled_users(ids, "price_pro") == {
+        subscribers.alice, subscribers.carol}
+    assert payments_db.get_entitled_users(ids, "price_basic") == frozenset()
+    assert payments_db.get_entitled_users([]) == frozenset()
+
+
+def test_entitlement_errors_deny(subscribers, monkeypatch):
+    errors = []
+    monkeypatch.setattr(repository, "st", SimpleNamespace(error=errors.append))
+    # The backend refuses to run user queries as the service role
+    refused = subscribers.backend.as_role({"role": "service_role"})
+    monkeypatch.setattr(repository.entitlements, "client_factory", lambda: refused)
+
+    assert payments_db.is_entitled(subscribers.alice) is False
+    assert payments_db.get_entitled_users([subscribers.alice]) == frozenset()
+    assert [error.split(":")[0] for error in errors] == [
+        "Error checking entitlement", "Error checking entitlements"]
@@ -0,0 +1,156 @@
+"""Tests for the direct Postgres backend."""
+
+import json
+
+import psycopg
+import pytest
+
+from litkit.database import postgres
+from litkit.database.repository import Repository
+
+credits = Repository("credits", columns=("id", "user_id", "amount", "created_at"))
+
+
+def compiled(query):
+    statement, params = postgres.compile_query(query)
+    return statement.as_string(None), params
+
+
+@pytest.mark.parametrize("op, operator", [
+    ("eq", "="), ("neq", "<>"), ("gt", ">"), ("gte", ">="), ("lt", "<"), ("lte", "<="),
+])
+def test_comparison_filters(op, operator):
+    query = credits.select("amount").where("amount", op, 5)
+
+    assert compiled(query) == (
+        f'SELECT "amount" FROM "credits" WHERE "amount" {operator} %s', [5])
+
+
+def test_in_and_is_filters():
+    query = credits.select().in_("user_id", ("a", "b")) \
+        .is_("created_at", None).is_("amount", True).is_("id", False)
+
+    text, params = compiled(query)
+    assert text.endswith(
+        ' WHERE "user_id" = ANY(%s) AND "created_at" IS NULL'
+        ' AND "amount" IS TRUE AND "id" IS FALSE')
+    assert params == [["a", "b"]]
+
+
+def test_keyset_order_and_limit():
+    query = credits.select("*").eq("user_id", "a") \
+        .before(("created_at", "id"), ("2024-01-01", "i9")) \
+        .order("created_at", desc=True).order("id", desc=True).limit(20)
+
+    assert compiled(query) == (
+        'SELECT * FROM "credits" WHERE "user_id" = %s'
+        ' AND ("created_at", "id") < (%s, %s)'
+        ' ORDER BY "created_at" DESC, "id" DESC LIMIT %s',
+        ["a", "2024-01-01", "i9", 20])
+
+    text, params = compiled(credits.select("id").after(("id",), ("i1",)).order("id"))
+    assert text == 'SELECT "id" FROM "credits" WHERE ("id") > (%s) ORDER BY "id" ASC'
+    assert params == ["i1"]
+
+
+def test_identifiers_are_quoted():
+    odd = Repository('my "table"', columns=('select', 'a"b'))
+    query = odd.select(['a"b']).eq("select", 1).order('a"b')
+
+    assert compiled(query)[0] == (
+        'SELECT "a""b" FROM "my ""table""" WHERE "select" = %s ORDER BY "a""b" ASC')
+
+
+def test_writes():
+    insert = credits.insert([{"user_id": "a", "amount": 1}, {"user_id": "b"}])
+    assert compiled(insert) == (
+        'INSERT INTO "credits" ("user_id", "amount")'
+        ' VALUES (%s, %s), (%s, DEFAULT) RETURNING *', ["a", 1, "b"])
+
+    upsert = credits.upsert({"user_id": "a", "amount": 1}, on_conflict="user_id")
+    assert compiled(upsert)[0] == (
+        'INSERT INTO "credits" ("user_id", "amount") VALUES (%s, %s)'
+        ' ON CONFLICT ("user_id") DO UPDATE SET "amount" = EXCLUDED."amount"'
+        ' RETURNING *')
+    ignore = credits.upsert({"user_id": "a"}, on_conflict="user_id",
+                            ignore_duplicates=True)
+    assert ' ON CONFLICT ("user_id") DO NOTHING ' in compiled(ignore)[0]
+
+    # Assignments come before the filters in the parameters
+    update = credits.update({"amount": 3}).eq("user_id", "a")
+    assert compiled(update) == (
+        'UPDATE "credits" SET "amount" = %s WHERE "user_id" = %s RETURNING *',
+        [3, "a"])
+
+    assert compiled(credits.delete().eq("id", "i1")) == (
+        'DELETE FROM "credits" WHERE "id" = %s RETURNING *', ["i1"])
+
+
+@pytest.fixture
+def user(postgres_backend, create_users):
+    """A user with 100 credits and a client running as that user."""
+    user_id = create_users()[0]
+    assert postgres_backend.rpc("add_credits", {"p_user_id": user_id, "p_amount": 100}) == 100
+    return user_id, postgres_backend.as_role({"sub": user_id, "role": "authenticated"})
+
+
+def test_rpc_returns_scalars_and_rows(postgres_backend, user):
+    user_id, as_user = user
+
+    assert as_user.rpc("use_credits", {"p_user_id": user_id, "p_amount": 30}) == 70
+    # A scalar NULL, not a row
+    assert as_user.rpc("use_credits", {"p_user_id": user_id, "p_amount": 1000}) is None
+
+    # Set-returning functions give rows, also when there is only one
+    leases = postgres_backend.rpc("reserve_credits", {"p_user_id": user_id, "p_amount": 20})
+    assert len(leases) == 1
+    assert leases[0]["lease_reserved"] == 20
+    assert isinstance(leases[0]["lease_id"], str)
+    assert isinstance(leases[0]["lease_expires_at"], str)
+    assert as_user.rpc("payment_summary", {"p_user_id": user_id}) == []
+
+
+def test_role_client_runs_under_rls(postgres_backend, user, create_users):
+    user_id, as_user = user
+    other = create_users()[0]
+    postgres_backend.rpc("add_credits", {"p_user_id": other, "p_amount": 5})
+
+    rows = as_user.execute(credits.select(("user_id", "amount")))
+    assert rows == [{"user_id": user_id, "amount": 100}]
+    anon = postgres_backend.as_role({"role": "anon"})
+    assert anon.execute(credits.select("amount")) == []
+
+    with pytest.raises(ValueError):
+        postgres_backend.as_role({"role": "service_role"}).execute(credits.select())
+
+
+def test_role_is_reset_after_each_statement(postgres_url, create_users, monkeypatch):
+    # One connection, so every statement reuses the previous one's session
+    monkeypatch.setattr(postgres, "PG_POOL_MIN_SIZE", 1)
+    monkeypatch.setattr(postgres, "PG_POOL_MAX_SIZE", 1)
+    backend = postgres.PostgresBackend(postgres_url)
+    whoami = postgres.sql.SQL(
+        "SELECT current_user AS role,"
+        " current_setting('request.jwt.claims', true) AS claims")
+
+    def session():
+        row = backend._fetch(whoami, [])[0]
+        return row["role"], json.loads(row["claims"])
+
+    try:
+        owner, claims = session()
+        assert claims == {"role": "service_role"}
+
+        user_id = create_users()[0]
+        as_user = backend.as_role({"sub": user_id, "role": "authenticated"})
+        assert backend._fetch(whoami, [], as_user.claims)[0]["role"] == "authenticated"
+        assert session() == (owner, claims)
+
+        # Debiting another user's credits fails inside the transaction
+        with pytest.raises(psycopg.errors.InsufficientPrivilege):
+            as_user.rpc("use_credits", {"p_user_id": create_users()[0], "p_amount": 1})
+        assert session() == (owner, claims)
+        with backend.pool.connection() as conn:
+            assert conn.info.transaction_status == psycopg.pq.TransactionStatus.IDLE
+    finally:
+        backend.close()
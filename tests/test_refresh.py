@@ -0,0 +1,142 @@
+"""Tests for background token refresh."""
+
+import time
+
+import pytest
+
+from litkit.auth import refresh, session_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, monkeypatch, tmp_path):
+    """Use a fresh session store of each backend."""
+    if request.param == "sqlite":
+        store = session_store.SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    else:
+        store = session_store.MemorySessionStore()
+    monkeypatch.setattr(refresh, "get_session_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = refresh.TokenRefreshScheduler(margin=60, jitter=0, workers=1)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def signed_in(store, session_id="s1", refresh_token="r1", issued_at=None):
+    store.set(session_id, {
+        "access_token": "a1", "refresh_token": refresh_token,
+        "expires_at": time.time() + 3600,
+        "cookie_issued_at": time.time() if issued_at is None else issued_at})
+
+
+def refreshes(monkeypatch, before=None):
+    """Record calls to the token endpoint, which answers with new tokens."""
+    calls = []
+
+    def fake(refresh_token):
+        calls.append(refresh_token)
+        if before:
+            before()
+        return {"access_token": "a2", "refresh_token": "r2",
+                "expires_at": time.time() + 3600}
+
+    monkeypatch.setattr(refresh, "refresh_tokens", fake)
+    return calls
+
+
+def test_update_only_touches_existing_sessions(store):
+    assert not store.update("missing", access_token="a1")
+    assert store.get("missing") is None
+
+    store.set("s1", {"user": "alice"})
+    assert store.update("s1", access_token="a1")
+    assert store.get("s1") == {"user": "alice", "access_token": "a1"}
+
+    store.set("s2", {"user": "bob"}, ttl=-1)
+    assert not store.update("s2", access_token="a1")
+
+
+def test_refresh_runs_margin_before_expiry():
+    scheduler = refresh.TokenRefreshScheduler(margin=120, jitter=60, workers=1)
+    try:
+        now = time.time()
+        deadline = scheduler.schedule("s1", "r1", now + 3600)
+        assert now + 3600 - 180 <= deadline <= now + 3600 - 120
+        # Tokens that are about to expire are refreshed right away
+        assert scheduler.schedule("s1", "r1", now + 10) >= now
+        assert scheduler.pending() == 1
+    finally:
+        scheduler.shutdown()
+
+
+def test_due_refresh_updates_the_store_and_reschedules(store, scheduler, monkeypatch):
+    signed_in(store)
+    calls = refreshes(monkeypatch)
+    scheduler.schedule("s1", "r1", time.time())
+
+    for _ in range(50):
+        if store.get("s1")["refresh_token"] == "r2":
+            break
+        time.sleep(0.05)
+
+    assert calls == ["r1"]
+    assert store.get("s1")["access_token"] == "a2"
+    assert scheduler.pending() == 1
+
+
+def test_sign_out_cancels_the_refresh(store, scheduler, monkeypatch):
+    signed_in(store)
+    calls = refreshes(monkeypatch)
+    scheduler.schedule("s1", "r1", time.time() + 60.2)
+    scheduler.cancel("s1")
+    store.delete("s1")
+
+    time.sleep(0.5)
+    assert calls == []
+    assert scheduler.pending() == 0
+
+
+def test_sign_out_during_refresh_is_not_undone(store, scheduler, monkeypatch):
+    signed_in(store)
+    # The session is signed out while the token request is in flight
+    calls = refreshes(monkeypatch, before=lambda: store.delete("s1"))
+
+    scheduler._refresh("s1", "r1", 0)
+
+    assert calls == ["r1"]
+    assert store.get("s1") is None
+    assert scheduler.pending() == 0
+
+
+def test_refresh_stops_after_the_cookie_max_age(store, scheduler, monkeypatch):
+    monkeypatch.setattr(refresh, "SESSION_COOKIE_MAX_AGE", 3600)
+    signed_in(store, issued_at=time.time() - 3600)
+    calls = refreshes(monkeypatch)
+
+    scheduler._refresh("s1", "r1", 0)
+
+    assert calls == []
+    assert scheduler.pending() == 0
+
+
+def test_session_refreshed_elsewhere_is_rescheduled(store, scheduler, monkeypatch):
+    signed_in(store, refresh_token="r9")
+    calls = refreshes(monkeypatch)
+
+    scheduler._refresh("s1", "r1", 0)
+
+    assert calls == []
+    assert scheduler.pending() == 1
+
+
+def test_failed_refresh_is_retried(store, scheduler, monkeypatch):
+    signed_in(store)
+    monkeypatch.setattr(refresh, "refresh_tokens", lambda token: None)
+    retries = []
+    monkeypatch.setattr(scheduler, "_push", lambda *args: retries.append(args))
+
+    scheduler._refresh("s1", "r1", 0)
+    assert [(session_id, attempt) for session_id, _, _, attempt in retries] == [("s1", 1)]
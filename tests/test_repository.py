@@ -0,0 +1,223 @@
+"""Tests for the repository layer."""
+
+from types import SimpleNamespace
+
+import pytest
+from postgrest.exceptions import APIError
+
+from litkit.database import repository
+from litkit.utils.resilience import Upstream
+
+payments = repository.Repository(
+    "payments",
+    columns=("id", "user_id", "amount", "status", "created_at"),
+    column_sets={"summary": ("id", "amount")},
+)
+
+
+class Builder:
+    """PostgREST request builder that records its calls and returns rows."""
+
+    def __init__(self, calls, rows):
+        self.calls = calls
+        self.rows = rows
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            self.calls.append((method, args, kwargs) if kwargs else (method, *args))
+            return self
+        return call
+
+    def execute(self):
+        if isinstance(self.rows, Exception):
+            raise self.rows
+        return SimpleNamespace(data=self.rows)
+
+
+class Client:
+    """PostgREST client whose queries return ``rows`` (or raise them)."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows) if not isinstance(rows, Exception) else rows
+        self.calls = []
+
+    def table(self, name):
+        self.calls.append(("table", name))
+        return Builder(self.calls, self.rows)
+
+
+@pytest.fixture(autouse=True)
+def upstream(monkeypatch):
+    """Run queries through a private guard so failures trip no shared breaker."""
+    guard = Upstream("test", read_retries=0, ignored_errors=(APIError, ValueError),
+                     is_request_error=repository._is_request_error)
+    monkeypatch.setattr(repository, "_upstream", lambda client: guard)
+    payments.reset_stats()
+
+
+def test_columns_are_checked():
+    assert payments.select().columns == payments.columns
+    assert payments.select("summary").columns == ("id", "amount")
+    assert payments.select("id, status").columns == ("id", "status")
+    assert payments.select("*").columns is None
+
+    with pytest.raises(ValueError, match="Unknown column"):
+        payments.select("id, email")
+    with pytest.raises(ValueError, match="Unknown column"):
+        payments.select().eq("email", "a@example.com")
+    with pytest.raises(ValueError, match="Unknown column"):
+        payments.select().order("email")
+    with pytest.raises(ValueError, match="Unsupported filter operator"):
+        payments.select().where("amount", "like", "1%")
+
+
+def test_query_builds_filters_keyset_order_and_limit():
+    query = payments.select("summary").eq("user_id", "u1").in_("status", ("paid", "open")) \
+        .before(("created_at", "id"), ("2024-01-01", "p9")) \
+        .order("created_at", desc=True).limit(10)
+
+    assert [(f.column, f.op, f.value) for f in query.filters] == [
+        ("user_id", "eq", "u1"), ("status", "in", ["paid", "open"])]
+    assert query.keyset == (("created_at", "id"), ("2024-01-01", "p9"), True)
+    assert query.ordering == [("created_at", True)]
+    assert query.row_limit == 10
+
+
+def test_execute_postgrest_translates_the_query():
+    client = Client([{"id": "p1"}])
+    query = payments.select("summary").eq("user_id", "u1").in_("status", ["paid"]) \
+        .is_("created_at", None).is_("amount", True) \
+        .after(("created_at", "id"), ("t1", "p0")).order("created_at").limit(5)
+
+    assert repository.execute_postgrest(client, query) == [{"id": "p1"}]
+    assert client.calls == [
+        ("table", "payments"),
+        ("select", "id,amount"),
+        ("eq", "user_id", "u1"),
+        ("in_", "status", ["paid"]),
+        ("is_", "created_at", "null"),
+        ("is_", "amount", "true"),
+        ("or_", 'created_at.gt."t1",and(created_at.eq."t1",id.gt."p0")'),
+        ("order", ("created_at",), {"desc": False}),
+        ("limit", 5),
+    ]
+
+
+def test_keyset_filter_breaks_ties_on_the_next_column():
+    # Rows with the same created_at as the last one seen continue by id
+    assert repository._keyset_filter(
+        ("created_at", "id"), ("2024-01-01T00:00:00+00:00", "p5"), descending=True
+    ) == ('created_at.lt."2024-01-01T00:00:00+00:00",'
+          'and(created_at.eq."2024-01-01T00:00:00+00:00",id.lt."p5")')
+
+    assert repository._keyset_filter(("a", "b", "c"), (1, 2, 3)) == (
+        'a.gt."1",and(a.eq."1",b.gt."2"),and(a.eq."1",b.eq."2",c.gt."3")')
+    assert repository._keyset_filter(("id",), ("p1",)) == 'id.gt."p1"'
+
+
+def test_keyset_values_are_quoted():
+    # Commas and parentheses would otherwise split the or-filter
+    assert repository._keyset_filter(("status",), ('a,b) "c" \\d',)) == \
+        'status.gt."a,b) \\"c\\" \\\\d"'
+
+
+def test_first_limits_to_one_row(monkeypatch):
+    client = Client([{"id": "p1"}])
+    monkeypatch.setattr(payments, "client_factory", lambda: client)
+
+    assert payments.select("id").first() == {"id": "p1"}
+    assert ("limit", 1) in client.calls
+
+    client.rows.clear()
+    assert payments.select("id").limit(3).first() is None
+    assert ("limit", 3) in client.calls
+
+
+def test_run_counts_round_trips_rows_and_errors():
+    payments.select().execute(client=Client([{"id": "p1"}, {"id": "p2"}]))
+    with pytest.raises(APIError):
+        payments.select().execute(client=Client(APIError({"code": "42501"})))
+
+    assert payments.stats() == {"round_trips": 2, "rows": 2, "errors": 1}
+
+
+def test_run_without_client_raises(monkeypatch):
+    monkeypatch.setattr(payments, "client_factory", lambda: None)
+
+    with pytest.raises(repository.ClientNotConfiguredError):
+        payments.select().execute()
+
+
+@pytest.mark.parametrize("code, request_error", [
+    ("42501", True),      # RLS or privileges
+    ("23505", True),      # unique violation
+    ("22P02", True),      # invalid input
+    ("P0001", True),      # RAISE EXCEPTION in a function
+    ("PGRST116", True),   # no rows for a single object
+    ("PGRST204", True),   # unknown column
+    ("404", True),
+    (409, True),
+    ("PGRST000", False),  # database connection
+    ("PGRST003", False),  # pool timeout
+    ("PGRSTX00", False),  # internal error
+    ("57014", False),     # statement timeout
+    ("53300", False),     # too many connections
+    ("40001", False),     # serialization failure
+    ("42P17", False),     # infinite recursion in a policy
+    ("502", False),       # a gateway without a JSON body
+    (503, False),
+])
+def test_is_request_error(code, request_error):
+    error = APIError({"code": code, "message": "failed"})
+    assert repository._is_request_error(error) is request_error
+
+
+def test_other_errors_count_as_request_errors():
+    assert repository._is_request_error(ValueError("bad filter"))
+
+
+@pytest.fixture
+def streamlit(monkeypatch):
+    """Replace Streamlit with recorded messages."""
+    fake = SimpleNamespace(errors=[], warnings=[])
+    fake.error = fake.errors.append
+    fake.warning = fake.warnings.append
+    monkeypatch.setattr(repository, "st", fake)
+    return fake
+
+
+def test_db_operation_returns_the_result(streamlit):
+    @repository.db_operation([], "Error listing")
+    def list_rows(user_id):
+        """List rows."""
+        return [user_id]
+
+    assert list_rows("u1") == ["u1"]
+    assert list_rows.__name__ == "list_rows"
+    assert list_rows.__doc__ == "List rows."
+    assert streamlit.errors == streamlit.warnings == []
+
+
+def test_db_operation_reports_errors_and_returns_the_default(streamlit):
+    @repository.db_operation(0, "Error counting")
+    def count():
+        raise RuntimeError("connection reset")
+
+    @repository.db_operation(None, "Error loading")
+    def load():
+        raise repository.ClientNotConfiguredError()
+
+    assert count() == 0
+    assert load() is None
+    assert streamlit.errors == ["Error counting: connection reset"]
+    assert streamlit.warnings == ["Supabase client is not configured."]
+
+
+def test_db_operation_prints_without_ui(streamlit, capsys):
+    @repository.db_operation(False, "Error saving", show_ui=False)
+    def save():
+        raise RuntimeError("timed out")
+
+    assert save() is False
+    assert capsys.readouterr().out == "Error saving: timed out\n"
+    assert streamlit.errors == []
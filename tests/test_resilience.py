@@ -0,0 +1,100 @@
+"""Tests for upstream deadlines and circuit breakers."""
+
+import threading
+import time
+
+import pytest
+from postgrest.exceptions import APIError
+
+from litkit.database import repository
+from litkit.utils.resilience import (
+    CLOSED,
+    OPEN,
+    DeadlineExceededError,
+    Upstream,
+    UpstreamBusyError,
+)
+
+
+def api_error(code):
+    return APIError({"code": code, "message": "failed"})
+
+
+def supabase_upstream():
+    return Upstream(
+        "supabase", read_retries=0,
+        ignored_errors=(APIError, ValueError),
+        is_request_error=repository._is_request_error,
+    )
+
+
+def fail_with(error):
+    def call():
+        raise error
+    return call
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    upstream = supabase_upstream()
+    for code in ("42501", "23505", "P0001", "PGRST116", 404):
+        for _ in range(upstream.breaker.failure_threshold):
+            with pytest.raises(APIError):
+                upstream.call(fail_with(api_error(code)))
+    assert upstream.breaker.state == CLOSED
+    assert upstream.stats()["failures"] == 0
+
+
+@pytest.mark.parametrize("code", ["PGRST000", "PGRST003", "57014", "53300", 502, "503"])
+def test_server_errors_trip_the_breaker(code):
+    upstream = supabase_upstream()
+    for _ in range(upstream.breaker.failure_threshold):
+        with pytest.raises(APIError):
+            upstream.call(fail_with(api_error(code)))
+    assert upstream.breaker.state == OPEN
+
+
+def test_deadline_starts_when_a_worker_is_free():
+    upstream = Upstream("slow", timeout=1, read_retries=0, workers=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+        return "first"
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(upstream.call(hold)))
+    first.start()
+    started.wait(5)
+
+    def second():
+        time.sleep(0.5)
+        return "second"
+
+    # Waits 0.7 s for the worker and runs 0.5 s: within the deadline only
+    # if the wait does not count against it
+    threading.Timer(0.7, release.set).start()
+    assert upstream.call(second) == "second"
+    first.join()
+    assert results == ["first"]
+    assert upstream.stats()["timeouts"] == 0
+
+
+def test_full_pool_is_busy_not_a_breaker_failure():
+    upstream = Upstream("hung", timeout=0.2, read_retries=0, workers=1)
+    release = threading.Event()
+    try:
+        with pytest.raises(DeadlineExceededError):
+            upstream.call(lambda: release.wait(5))
+        # The hung call still holds the only worker
+        for _ in range(upstream.breaker.failure_threshold):
+            with pytest.raises(UpstreamBusyError):
+                upstream.call(lambda: "never runs")
+    finally:
+        release.set()
+
+    stats = upstream.stats()
+    assert stats["busy"] == upstream.breaker.failure_threshold
+    assert stats["breaker"]["consecutive_failures"] == 1
+    assert upstream.breaker.state == CLOSED
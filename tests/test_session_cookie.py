@@ -0,0 +1,48 @@
+"""Tests for the signed session cookie."""
+
+import time
+
+import pytest
+
+from litkit.auth import session_cookie
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(session_cookie, "SESSION_SECRET", "test-secret")
+    monkeypatch.setattr(session_cookie, "SESSION_COOKIE_MAX_AGE", 3600)
+
+
+def test_signed_value_holds_only_the_session_id():
+    value = session_cookie.sign_session_id("abc123")
+    session_id, issued_at, _ = value.split(".")
+    assert session_id == "abc123"
+    assert abs(int(issued_at) - time.time()) < 5
+    assert session_cookie.verify_session_cookie(value) == "abc123"
+
+
+def test_tampered_value_is_rejected():
+    value = session_cookie.sign_session_id("abc123")
+    session_id, issued_at, signature = value.split(".")
+    forged = f"other.{issued_at}.{signature}"
+    assert session_cookie.verify_session_cookie(forged) is None
+
+    # Moving the issue time forward invalidates the signature too
+    extended = f"{session_id}.{int(issued_at) + 3600}.{signature}"
+    assert session_cookie.verify_session_cookie(extended) is None
+
+
+def test_expired_value_is_rejected():
+    value = session_cookie.sign_session_id("abc123", int(time.time()) - 3601)
+    assert session_cookie.verify_session_cookie(value) is None
+
+
+def test_value_from_the_future_is_rejected():
+    value = session_cookie.sign_session_id("abc123", int(time.time()) + 600)
+    assert session_cookie.verify_session_cookie(value) is None
+
+
+def test_value_without_secret_is_rejected(monkeypatch):
+    value = session_cookie.sign_session_id("abc123")
+    monkeypatch.setattr(session_cookie, "SESSION_SECRET", None)
+    assert session_cookie.verify_session_cookie(value) is None
@@ -0,0 +1,97 @@
+"""Tests for the shared Stripe client."""
+
+import httpx
+import pytest
+import stripe
+
+from litkit.payments import checkout, stripe_client, subscription
+
+
+def stripe_over(handler, retries=0):
+    """A StripeClient whose requests are answered by handler."""
+    transport = stripe_client.PooledHTTPClient(
+        httpx.Client(transport=httpx.MockTransport(handler)))
+    return stripe.StripeClient(
+        "sk_test_123", http_client=transport, max_network_retries=retries)
+
+
+def test_requests_go_through_the_given_pool():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"id": "cus_1", "object": "customer"})
+
+    client = stripe_over(handler)
+    customer = client.v1.customers.create(
+        params={"email": "alice@example.com"},
+        options={"idempotency_key": "litkit-customer-alice"})
+
+    assert customer.id == "cus_1"
+    request = requests[0]
+    assert request.url.path == "/v1/customers"
+    assert request.headers["Authorization"] == "Bearer sk_test_123"
+    assert request.headers["Idempotency-Key"] == "litkit-customer-alice"
+    assert request.content == b"email=alice%40example.com"
+
+
+def test_network_errors_are_retryable_connection_errors(monkeypatch):
+    monkeypatch.setattr(stripe.HTTPClient, "_sleep_time_seconds", lambda self, n: 0)
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        raise httpx.ConnectError("connection refused")
+
+    with pytest.raises(stripe.APIConnectionError):
+        stripe_over(handler, retries=2).v1.customers.retrieve("cus_1")
+    assert len(attempts) == 3
+
+
+def test_api_errors_keep_their_status():
+    def handler(request):
+        return httpx.Response(402, json={"error": {
+            "type": "card_error", "code": "card_declined", "message": "Declined"}})
+
+    with pytest.raises(stripe.CardError) as raised:
+        stripe_over(handler).v1.customers.retrieve("cus_1")
+    assert raised.value.http_status == 402
+
+
+def test_settings_fall_back_to_the_environment_without_secrets(monkeypatch):
+    # No secrets.toml exists in the test environment
+    assert stripe_client.get_stripe_secrets() == {}
+
+    monkeypatch.setenv("STRIPE_PAYMENT_MODE", "test")
+    monkeypatch.setenv("STRIPE_API_KEY_TEST", "sk_test_123")
+    monkeypatch.setenv("STRIPE_PRICE_ID", "price_1")
+    config = stripe_client.StripeConfig.load()
+
+    assert (config.api_key, config.payment_mode) == ("sk_test_123", "test")
+    assert config.problems() == []
+    assert checkout.get_checkout_settings()["price_id"] == "price_1"
+
+
+def test_invalid_key_is_reported_on_first_use(monkeypatch):
+    monkeypatch.setattr(stripe_client, "_config",
+                        stripe_client.StripeConfig("sk_live_123", "test"))
+    monkeypatch.setattr(stripe_client, "_stripe_client", None)
+
+    with pytest.raises(stripe_client.StripeConfigurationError) as raised:
+        stripe_client.initialize_stripe()
+    assert raised.value.details == {"problems": ["API key is not a test mode key"]}
+
+
+@pytest.mark.parametrize("call", [
+    lambda: checkout.create_checkout_session(user_id="alice"),
+    lambda: subscription.get_user_subscription("alice"),
+])
+def test_invalid_settings_are_shown_not_raised(monkeypatch, call):
+    errors = []
+    monkeypatch.setattr(stripe_client, "_config",
+                        stripe_client.StripeConfig("sk_live_123", "test"))
+    monkeypatch.setattr(stripe_client, "_stripe_client", None)
+    monkeypatch.setattr(checkout.st, "error", errors.append)
+
+    assert call() is None
+    assert errors == ["Stripe is misconfigured: API key is not a test mode key."]
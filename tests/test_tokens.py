@@ -0,0 +1,128 @@
+"""Tests for local access token verification."""
+
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from litkit.auth import tokens
+
+ISSUER = "https://example.supabase.co/auth/v1"
+
+
+class SigningKey:
+    """An ES256 key pair published in the JWKS under a key id."""
+
+    def __init__(self, kid):
+        self.kid = kid
+        self.private = ec.generate_private_key(ec.SECP256R1())
+
+    def jwk(self):
+        jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(self.private.public_key()))
+        return {**jwk, "kid": self.kid, "alg": "ES256", "use": "sig"}
+
+    def sign(self, **overrides):
+        claims = {"sub": "alice", "aud": "authenticated", "iss": ISSUER,
+                  "exp": int(time.time()) + 3600, **overrides}
+        return jwt.encode(claims, self.private, algorithm="ES256",
+                          headers={"kid": self.kid})
+
+
+@pytest.fixture
+def jwks(monkeypatch):
+    """Serve a JWKS whose keys can be rotated, and count the fetches."""
+    served = {"keys": [SigningKey("key-1")], "fetches": 0, "down": False}
+
+    def handler(request):
+        served["fetches"] += 1
+        if served["down"]:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"keys": [key.jwk() for key in served["keys"]]})
+
+    http = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(tokens, "get_http_client", lambda: http)
+    monkeypatch.setattr(tokens, "SUPABASE_JWT_SECRET", None)
+    monkeypatch.setattr(tokens, "SUPABASE_JWT_ISSUER", ISSUER)
+
+    cache = tokens.JWKSCache("https://example.supabase.co/auth/v1/.well-known/jwks.json")
+    # Refresh only on demand
+    monkeypatch.setattr(cache, "start", lambda: None)
+    monkeypatch.setattr(tokens, "_jwks_cache", cache)
+    yield served
+    http.close()
+
+
+def test_valid_token(jwks):
+    claims = tokens.verify_access_token(jwks["keys"][0].sign())
+    assert (claims["sub"], claims["iss"]) == ("alice", ISSUER)
+
+
+@pytest.mark.parametrize("claims", [
+    {"exp": int(time.time()) - 60},
+    {"aud": "anon"},
+    {"iss": "https://other.supabase.co/auth/v1"},
+])
+def test_invalid_claims_are_rejected(jwks, claims):
+    assert tokens.verify_access_token(jwks["keys"][0].sign(**claims)) is None
+
+
+def test_token_without_issuer_is_rejected(jwks):
+    key = jwks["keys"][0]
+    token = jwt.encode({"sub": "alice", "aud": "authenticated",
+                        "exp": int(time.time()) + 3600},
+                       key.private, algorithm="ES256", headers={"kid": key.kid})
+    assert tokens.verify_access_token(token) is None
+
+
+def test_token_signed_by_another_key_is_rejected(jwks):
+    forged = SigningKey("key-1").sign()
+    assert tokens.verify_access_token(forged) is None
+
+
+def test_unknown_key_id_refreshes_the_key_set(jwks, monkeypatch):
+    monkeypatch.setattr(tokens, "JWKS_MIN_REFRESH_INTERVAL", 0)
+    assert tokens.verify_access_token(jwks["keys"][0].sign())
+    assert jwks["fetches"] == 1
+
+    # The project rotates to a new signing key
+    rotated = SigningKey("key-2")
+    jwks["keys"].append(rotated)
+    assert tokens.verify_access_token(rotated.sign())["sub"] == "alice"
+    assert jwks["fetches"] == 2
+
+
+def test_unknown_key_refreshes_are_rate_limited(jwks):
+    assert tokens.verify_access_token(jwks["keys"][0].sign())
+    # Tokens with made-up key ids cannot make every request fetch the JWKS
+    for _ in range(3):
+        assert tokens.verify_access_token(SigningKey("key-9").sign()) is None
+    assert jwks["fetches"] == 1
+
+
+def test_jwks_fetch_failure_keeps_the_cached_keys(jwks, monkeypatch):
+    token = jwks["keys"][0].sign()
+    assert tokens.verify_access_token(token)
+
+    jwks["down"] = True
+    assert not tokens._jwks_cache.refresh()
+    assert tokens.verify_access_token(token)["sub"] == "alice"
+
+    # Without any cached key nothing verifies
+    monkeypatch.setattr(tokens, "_jwks_cache", tokens.JWKSCache("https://unused"))
+    monkeypatch.setattr(tokens._jwks_cache, "start", lambda: None)
+    assert tokens.verify_access_token(token) is None
+
+
+def test_shared_secret_tokens_check_the_issuer(monkeypatch):
+    monkeypatch.setattr(tokens, "SUPABASE_JWT_SECRET", "x" * 32)
+    monkeypatch.setattr(tokens, "SUPABASE_JWT_ISSUER", ISSUER)
+    claims = {"sub": "alice", "aud": "authenticated", "exp": int(time.time()) + 3600}
+
+    valid = jwt.encode({**claims, "iss": ISSUER}, "x" * 32, algorithm="HS256")
+    foreign = jwt.encode({**claims, "iss": "https://other.example/auth/v1"},
+                         "x" * 32, algorithm="HS256")
+    assert tokens.verify_access_token(valid)["sub"] == "alice"
+    assert tokens.verify_access_token(foreign) is None
@@ -0,0 +1,82 @@
+"""Tests for per-user PostgREST clients sharing one connection pool."""
+
+import base64
+import json
+import time
+
+import httpx
+import pytest
+
+from litkit.auth import user_client
+
+
+def make_token(subject: str, lifetime: float = 3600) -> str:
+    """Build an unsigned JWT with a subject and expiry."""
+    def encode(data):
+        raw = json.dumps(data).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+    header = encode({"alg": "HS256", "typ": "JWT"})
+    payload = encode({"sub": subject, "exp": int(time.time() + lifetime)})
+    return f"{header}.{payload}.signature"
+
+
+@pytest.fixture
+def requests_seen(monkeypatch):
+    """Route every client through one shared, recording httpx client."""
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json=[])
+
+    shared = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(user_client, "get_http_client", lambda: shared)
+    monkeypatch.setattr(user_client, "_service_client", None)
+    with user_client._lock:
+        user_client._clients.clear()
+    yield seen
+    shared.close()
+
+
+def test_interleaved_tokens_send_their_own_authorization(requests_seen):
+    tokens = {"alice": make_token("alice"), "bob": make_token("bob")}
+    clients = {name: user_client.get_user_client(token)
+               for name, token in tokens.items()}
+    service = user_client.get_service_client()
+
+    for i in range(3):
+        for name in ("alice", "bob"):
+            clients[name].table("credits").select("amount") \
+                .eq("user_id", f"{name}-{i}").execute()
+        service.table("credits").select("amount").eq("user_id", f"service-{i}").execute()
+
+    assert len(requests_seen) == 9
+    for request in requests_seen:
+        owner = request.url.params["user_id"].split(".", 1)[1].split("-")[0]
+        expected = user_client.SUPABASE_SERVICE_ROLE_KEY if owner == "service" \
+            else tokens[owner]
+        assert request.headers["Authorization"] == f"Bearer {expected}"
+        assert request.url.path == "/rest/v1/credits"
+
+
+def test_shared_http_client_is_not_modified(requests_seen):
+    shared = user_client.get_http_client()
+    user_client.get_user_client(make_token("alice"))
+    user_client.get_service_client()
+
+    assert "Authorization" not in shared.headers
+    assert str(shared.base_url) == ""
+
+
+def test_expired_token_gets_no_client(requests_seen):
+    assert user_client.get_user_client(make_token("alice", lifetime=-60)) is None
+
+
+def test_evicted_client_is_rebuilt(requests_seen):
+    token = make_token("alice")
+    first = user_client.get_user_client(token)
+    assert user_client.get_user_client(token) is first
+
+    user_client.evict_user_client(token)
+    assert user_client.get_user_client(token) is not first
@@ -0,0 +1,52 @@
+"""Tests for bulk and streaming user APIs."""
+
+import pytest
+
+from litkit.database import repository, users
+
+
+def make_users(start, count):
+    return [{"id": f"user-{i:04d}", "created_at": f"2024-01-01T00:00:{i:02d}Z"}
+            for i in range(start, start + count)]
+
+
+def test_iter_users_raises_after_yielding_earlier_pages(monkeypatch):
+    pages = [make_users(0, 2), make_users(2, 2)]
+
+    def run(query, client=None):
+        if pages:
+            return pages.pop(0)
+        raise RuntimeError("upstream timeout")
+
+    monkeypatch.setattr(repository.users, "run", run)
+
+    seen = []
+    with pytest.raises(RuntimeError, match="upstream timeout"):
+        for user in users.iter_users(page_size=2):
+            seen.append(user["id"])
+
+    assert seen == ["user-0000", "user-0001", "user-0002", "user-0003"]
+
+
+def test_iter_users_pages_from_the_last_row(monkeypatch):
+    queries = []
+    pages = [make_users(0, 2), make_users(2, 1)]
+
+    def run(query, client=None):
+        queries.append(query)
+        return pages.pop(0)
+
+    monkeypatch.setattr(repository.users, "run", run)
+
+    assert [user["id"] for user in users.iter_users(page_size=2)] == \
+        ["user-0000", "user-0001", "user-0002"]
+    assert queries[0].keyset is None
+    assert queries[1].keyset == (
+        ("created_at", "id"), ("2024-01-01T00:00:01Z", "user-0001"), False)
+
+
+def test_iter_users_without_client_raises(monkeypatch):
+    monkeypatch.setattr(repository.users, "client_factory", lambda: None)
+
+    with pytest.raises(repository.ClientNotConfiguredError):
+        list(users.iter_users())
@@ -0,0 +1,143 @@
+"""Tests for the write-behind insert queue."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from litkit.database import repository, write_queue
+
+
+@pytest.fixture
+def database(monkeypatch, postgres_backend, create_users):
+    """Queue payments as a fresh user on the test database."""
+    user_id, other_id = create_users(2)
+    as_user = postgres_backend.as_role({"sub": user_id, "role": "authenticated"})
+    monkeypatch.setattr(repository, "get_service_database_client",
+                        lambda: postgres_backend)
+    monkeypatch.setattr(repository, "get_database_identity", lambda: f"user:{user_id}")
+    monkeypatch.setattr(repository.payments, "client_factory", lambda: as_user)
+
+    def payments():
+        with postgres_backend.pool.connection() as conn:
+            return conn.execute(
+                "SELECT id::text, amount FROM public.payments WHERE user_id = %s "
+                "ORDER BY amount", (user_id,)).fetchall()
+
+    return SimpleNamespace(user_id=user_id, other_id=other_id, payments=payments)
+
+
+@pytest.fixture
+def open_queue(tmp_path):
+    """Start queues that only flush when told to, and close them afterwards."""
+    queues = []
+
+    def start(**kwargs):
+        queue = write_queue.WriteBehindQueue(
+            repository.payments, batch_size=100, flush_interval=60,
+            spill_dir=str(tmp_path), **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield start
+    for queue in queues:
+        queue.close()
+
+
+def payment(user_id, amount):
+    return {"user_id": user_id, "amount": amount, "currency": "usd",
+            "status": "succeeded", "payment_type": "one-time"}
+
+
+def spilled(path):
+    with open(path, encoding="utf-8") as spill:
+        return [json.loads(line) for line in spill]
+
+
+def test_enqueue_and_flush(database, open_queue):
+    queue = open_queue()
+    queued = [queue.enqueue(payment(database.user_id, amount)) for amount in (100, 200)]
+
+    assert database.payments() == []
+    assert [entry["row"] for entry in spilled(queue.spill_path)] == queued
+
+    assert queue.flush()
+    assert database.payments() == [
+        {"id": row["id"], "amount": row["amount"]} for row in queued]
+    assert spilled(queue.spill_path) == []
+    assert queue.stats()["flushed"] == 2
+
+    # A second flush of the same rows does not duplicate them
+    queue._pending = [write_queue._Entry(None, f"user:{database.user_id}", queued[0])]
+    assert queue.flush()
+    assert len(database.payments()) == 2
+
+
+def test_spill_file_is_replayed_on_start(database, open_queue, tmp_path):
+    owned = {"id": "00000000-0000-0000-0000-000000000001",
+             **payment(database.user_id, 300)}
+    foreign = {"id": "00000000-0000-0000-0000-000000000002",
+               **payment(database.user_id, 400)}
+    with open(tmp_path / "payments.jsonl", "w", encoding="utf-8") as spill:
+        spill.write(json.dumps({"owner": f"user:{database.user_id}", "row": owned}) + "\n")
+        # Queued by someone else for this user: not written with the service role
+        spill.write(json.dumps({"owner": f"user:{database.other_id}", "row": foreign}) + "\n")
+        spill.write('{"owner": "user:')
+
+    queue = open_queue()
+    assert queue.stats()["recovered"] == 2
+    assert not queue.flush()
+
+    assert database.payments() == [{"id": owned["id"], "amount": 300}]
+    assert [entry["row"] for entry in spilled(queue.dead_letter_path)] == [foreign]
+    assert spilled(queue.spill_path) == []
+    assert queue.stats()["pending"] == 0
+
+
+def test_rejected_rows_are_retried_then_dead_lettered(database, open_queue):
+    queue = open_queue(max_attempts=2)
+    good = queue.enqueue(payment(database.user_id, 100))
+    # amount is NOT NULL
+    bad = queue.enqueue(payment(database.user_id, None))
+
+    assert not queue.flush()
+    assert [row["amount"] for row in database.payments()] == [100]
+    assert spilled(queue.spill_path) == [
+        {"owner": f"user:{database.user_id}", "attempts": 1, "row": bad}]
+
+    assert not queue.flush()
+    dead = spilled(queue.dead_letter_path)
+    assert [entry["row"] for entry in dead] == [bad]
+    assert "null value" in dead[0]["error"]
+    assert queue.stats()["pending"] == 0
+    assert queue.stats()["dead_lettered"] == 1
+    assert good["id"] == database.payments()[0]["id"]
+
+
+def test_unreachable_database_keeps_rows_queued(database, open_queue, monkeypatch):
+    queue = open_queue(max_attempts=1)
+    row = queue.enqueue(payment(database.user_id, 100))
+
+    def fail(client, entries):
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(queue, "_insert", fail)
+    for _ in range(3):
+        assert not queue.flush()
+    assert spilled(queue.spill_path) == [
+        {"owner": f"user:{database.user_id}", "attempts": 0, "row": row}]
+
+    monkeypatch.undo()
+    assert queue.flush()
+    assert [payment["id"] for payment in database.payments()] == [row["id"]]
+
+
+def test_close_writes_waiting_rows(database, open_queue):
+    queue = open_queue()
+    queue.enqueue(payment(database.user_id, 100))
+
+    assert queue.close()
+    assert len(database.payments()) == 1
+    assert queue.close()
+    with pytest.raises(RuntimeError):
+        queue.enqueue(payment(database.user_id, 200))